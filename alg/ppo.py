@@ -22,14 +22,11 @@
 #
 # largely inspired from https://github.com/vwxyzjn/cleanrl/blob/master/cleanrl/ppo.py
 
+import copy
 import random
 import time
 from collections import deque
 from functools import partial
-import os
-import dgl
-import glob
-import pickle
 
 import gymnasium as gym
 from psp.env.graphgym.async_vector_env import AsyncGraphVectorEnv
@@ -42,9 +39,12 @@ import torchinfo
 import tqdm
 import math
 
-from generic.utils import decode_mask, safe_mean
+from generic.async_validator import AsyncValidator
+from generic.problem_store import ProblemStore
+from generic.utils import PackedMasks, decode_mask, safe_mean
 
 from .logger import Logger, configure_logger, monotony, stability
+from .rollout_storage import RolloutStorage
 
 
 def create_env(env_cls, problem_description, env_specification, i):
@@ -55,6 +55,18 @@ def create_env(env_cls, problem_description, env_specification, i):
     return _init
 
 
+def worker_descriptions(problem_description, env_specification):
+    # env workers map the problems from a file and unpickle the ones they use,
+    # instead of each receiving a copy of all of them, through the problem description
+    # and through the env specification that refers to it
+    env_problem_description = copy.copy(problem_description)
+    env_problem_description.train_psps = ProblemStore(problem_description.train_psps)
+    env_problem_description.test_psps = ProblemStore(problem_description.test_psps)
+    env_specification = copy.copy(env_specification)
+    env_specification.problems = env_problem_description
+    return env_problem_description, env_specification
+
+
 class PPO:
     def __init__(
         self,
@@ -86,10 +98,17 @@ class PPO:
         self.iter_size = training_specification.iter_size
         self.validator = validator
         self.vecenv_type = training_specification.vecenv_type
+        self.graph_transport = training_specification.graph_transport
+        self.pipelined_rollouts = training_specification.pipelined_rollouts
+        self.async_validation = training_specification.async_validation
         self.total_timesteps = training_specification.total_timesteps
         self.validation_freq = training_specification.validation_freq
         self.return_based_scaling = training_specification.return_based_scaling
         self.obs_on_disk = training_specification.store_rollouts_on_disk
+        if self.obs_on_disk is not None or training_specification.rollout_arena:
+            self.rollout_storage = RolloutStorage(self.obs_on_disk)
+        else:
+            self.rollout_storage = None
         self.critic_loss = training_specification.critic_loss
         self.debug_net = training_specification.debug_net
         self.discard_incomplete_trials = discard_incomplete_trials
@@ -117,59 +136,119 @@ class PPO:
             data_device
         )
         action_masks = list()
+        # masks are packed to the nodes of the observations if the agent handles it
+        n_nodes = agent.get_n_nodes if agent.packed_actions else lambda obs: None
 
         if self.discard_incomplete_trials:
             to_keep = [[] for i in range(self.num_envs)]
             to_keep_candidate = [[] for i in range(self.num_envs)]
 
+        # envs are stepped by groups, group g holding the envs group_envs[g] of the
+        # batch: actions of a group are computed while the other groups step
+        env_groups = envs if isinstance(envs, list) else [envs]
+        group_start = np.cumsum([0] + [group.num_envs for group in env_groups])
+        group_envs = [
+            slice(group_start[g], group_start[g + 1]) for g in range(len(env_groups))
+        ]
+        group_obs = [None] * len(env_groups)
+        group_masks = [None] * len(env_groups)
+
+        pipelined = len(env_groups) > 1
+
         # buffer filling
-        o, info = envs.reset()
-        # next obs is a list of dicts
-        next_obs = agent.obs_as_tensor(o)
-        action_mask = decode_mask(info["mask"])
+        if pipelined:
+            for group in env_groups:
+                group.reset_async()
+            resets = [group.reset_wait() for group in env_groups]
+        else:
+            resets = [envs.reset()]
+        for g, (o, info) in enumerate(resets):
+            # next obs is a list of dicts
+            group_obs[g] = agent.obs_as_tensor(o)
+            group_masks[g] = decode_mask(info["mask"], n_nodes(group_obs[g]))
         next_done = torch.zeros(self.num_envs).to(data_device)
 
         self.ep_info_buffer = deque(maxlen=100)
         self.global_step += self.num_envs * self.num_steps
 
-        if self.obs_on_disk is not None:
-            for f in glob.glob(
-                self.obs_on_disk + "/wheatley_dgl_" + str(os.getpid()) + "_*.obs"
-            ) + glob.glob(
-                self.obs_on_disk + "/wheatley_pkl_" + str(os.getpid()) + "_*.obs"
-            ):
-                os.remove(f)
-
-        for step in tqdm.tqdm(range(0, self.num_steps), desc="   collecting rollouts"):
-            if self.obs_on_disk:
-                if agent.graphobs:
-                    for i, o in enumerate(next_obs):
-                        fname = (
-                            self.obs_on_disk
-                            + "/wheatley_dgl_"
-                            + str(os.getpid())
-                            + "_"
-                            + str(step * self.num_envs + i)
-                            + ".obs"
-                        )
-                        dgl.save_graphs(fname, [o])
-                        obs.append(fname)
+        if self.rollout_storage is not None:
+            self.rollout_storage.reset()
+
+        # busy time of the agent and of every env worker
+        agent_time = 0.0
+        env_times = np.zeros(self.num_envs)
+        collection_start = time.perf_counter()
+        for step in tqdm.tqdm(
+            range(0, self.num_steps + 1), desc="   collecting rollouts"
+        ):
+            for g, group in enumerate(env_groups):
+                if step > 0:
+                    if pipelined:
+                        o, reward, done, _, info = group.step_wait()
+                    else:
+                        o, reward, done, _, info = step_result
+                    busy_start = time.perf_counter()
+                    if "final_info" in info:
+                        for ep_info in info["final_info"]:
+                            if (
+                                ep_info is not None
+                            ):  # some episode may be finished and other not
+                                self.ep_info_buffer.append(ep_info["episode"])
+                        # self.ep_info_buffer.extend(
+                        #     [ep_info["episode"] for ep_info in info["final_info"]]
+                        # )
+                    if "step_time" in info:
+                        env_times[group_envs[g]] += info["step_time"]
+
+                    group_obs[g] = agent.obs_as_tensor(o)
+                    group_masks[g] = decode_mask(info["mask"], n_nodes(group_obs[g]))
+                    rewards[step - 1, group_envs[g]] = (
+                        torch.tensor(reward).view(-1, agent.reward_dim).to(data_device)
+                    )
+                    next_done[group_envs[g]] = torch.Tensor(done).to(data_device)
+                    agent_time += time.perf_counter() - busy_start
+                if step == self.num_steps:
+                    continue
+
+                busy_start = time.perf_counter()
+                with torch.no_grad():
+                    action, logprob, _, value = agent.get_action_and_value(
+                        group_obs[g], action_masks=group_masks[g]
+                    )
+                    value = agent.get_value_from_logits(value)
+
+                values[step, group_envs[g]] = value.view(-1, agent.reward_dim)
+                actions[step, group_envs[g]] = action
+                logprobs[step, group_envs[g]] = logprob
+                agent_time += time.perf_counter() - busy_start
+
+                if pipelined:
+                    group.step_async(action.cpu().numpy())
                 else:
-                    list_obs = [dict(zip(next_obs, t)) for t in zip(*next_obs.values())]
-                    for i, o in enumerate(list_obs):
-                        fname = (
-                            self.obs_on_disk
-                            + "/wheatley_pkl_"
-                            + str(os.getpid())
-                            + "_"
-                            + str(step * self.num_envs + i)
-                            + ".obs"
-                        )
-                        pickle.dump(o, open(fname, "wb"))
-                        obs.append(fname)
+                    step_result = group.step(action.cpu().numpy())
+
+            if not pipelined:
+                next_obs, action_mask = group_obs[0], group_masks[0]
+            else:
+                # only graph observations can be split in groups
+                next_obs = sum(group_obs, [])
+                if agent.packed_actions:
+                    action_mask = PackedMasks.cat(group_masks)
+                else:
+                    action_mask = decode_mask(
+                        [m for masks in group_masks for m in masks]
+                    )
+            if step == self.num_steps:
+                break
+
+            if self.rollout_storage is not None:
+                self.rollout_storage.append(next_obs)
             else:
                 obs.append(next_obs)
-            action_masks.append(torch.tensor(action_mask))
+            if agent.packed_actions:
+                action_masks.append(action_mask)
+            else:
+                action_masks.append(torch.tensor(action_mask))
             dones[step] = next_done
 
             if self.discard_incomplete_trials:
@@ -179,33 +258,10 @@ class PPO:
                         to_keep_candidate[i].clear()
                     to_keep_candidate[i].append(step)
 
-            with torch.no_grad():
-                action, logprob, _, value = agent.get_action_and_value(
-                    next_obs, action_masks=action_mask
-                )
-                value = agent.get_value_from_logits(value)
-
-            values[step] = value.view(-1, agent.reward_dim)
-            actions[step] = action
-            logprobs[step] = logprob
-
-            next_obs, reward, done, _, info = envs.step(action.cpu().numpy())
-            action_mask = decode_mask(info["mask"])
-            if "final_info" in info:
-                for ep_info in info["final_info"]:
-                    if (
-                        ep_info is not None
-                    ):  # some episode may be finished and other not
-                        self.ep_info_buffer.append(ep_info["episode"])
-                # self.ep_info_buffer.extend(
-                #     [ep_info["episode"] for ep_info in info["final_info"]]
-                # )
-
-            next_obs = agent.obs_as_tensor(next_obs)
-            rewards[step] = (
-                torch.tensor(reward).view(-1, agent.reward_dim).to(data_device)
-            )
-            next_done = torch.Tensor(done).to(data_device)
+        collection_time = time.perf_counter() - collection_start
+        self.rollout_utilization = {"agent": agent_time / collection_time}
+        if env_times.any():
+            self.rollout_utilization["env"] = env_times.mean() / collection_time
 
         if self.discard_incomplete_trials:
             for i in range(self.num_envs):
@@ -284,26 +340,34 @@ class PPO:
                 )
             returns = advantages + values
 
-        # Pad the action masks
-        max_n_nodes = max(mask.shape[1] for mask in action_masks)
-        action_masks = [
-            torch.concat(
-                (
-                    mask,
-                    torch.zeros(
-                        (mask.shape[0], max_n_nodes - mask.shape[1]),
-                        dtype=torch.bool,
-                        device=data_device,
+        if agent.packed_actions:
+            # masks of step t are at indices t * num_envs to (t + 1) * num_envs
+            b_action_masks = PackedMasks.cat(action_masks)
+        else:
+            # Pad the action masks
+            max_n_nodes = max(mask.shape[1] for mask in action_masks)
+            action_masks = [
+                torch.concat(
+                    (
+                        mask,
+                        torch.zeros(
+                            (mask.shape[0], max_n_nodes - mask.shape[1]),
+                            dtype=torch.bool,
+                            device=data_device,
+                        ),
                     ),
-                ),
-                dim=1,
-            )
-            for mask in action_masks
-        ]
-        action_masks = torch.stack(action_masks, dim=0)
+                    dim=1,
+                )
+                for mask in action_masks
+            ]
+            action_masks = torch.stack(action_masks, dim=0)
+            b_action_masks = action_masks.reshape(-1, max_n_nodes)
 
         # flatten the batch
-        b_obs = agent.rebatch_obs(obs)
+        if self.rollout_storage is not None:
+            b_obs = self.rollout_storage
+        else:
+            b_obs = agent.rebatch_obs(obs)
         b_logprobs = logprobs.reshape(-1)
         if agent.graphobs:
             b_actions = actions.reshape((-1))
@@ -312,13 +376,14 @@ class PPO:
         b_advantages = advantages.reshape(-1, agent.reward_dim)
         b_returns = returns.reshape(-1, agent.reward_dim)
         b_values = values.reshape(-1, agent.reward_dim)
-        b_action_masks = action_masks.reshape(-1, max_n_nodes)
 
         if self.discard_incomplete_trials:
             to_keep_b = [
                 j + i * self.num_steps for i in range(self.num_envs) for j in to_keep[i]
             ]
-            if agent.graphobs or self.obs_on_disk:
+            if self.rollout_storage is not None:
+                bobs_tokeep = b_obs.subset(to_keep_b)
+            elif agent.graphobs:
                 bobs_tokeep = list(b_obs[i] for i in to_keep_b)
             else:
                 bobs_tokeep = self.keep_only(b_obs, to_keep_b)
@@ -343,6 +408,53 @@ class PPO:
             sigma,
         )
 
+    def record_validation(self, update=None):
+        # update is the one the validated agent was taken at, if validations are
+        # asynchronous
+        if update is not None:
+            self.logger.record("validation/update", update)
+        # Statistics from the agent validator.
+        self.logger.record(
+            "validation/ppo_makespan",
+            self.validator.makespans[-1],
+        )
+        self.logger.record(
+            "validation/random_makepsan",
+            self.validator.random_makespans[-1],
+        )
+        for custom_agent in self.validator.custom_agents:
+            name = custom_agent.rule
+            self.logger.record(
+                f"validation/{name}",
+                self.validator.custom_makespans[name][-1],
+            )
+        # OR-Tools makespans are nan while their solutions are pending
+        for ortools_strategy in self.validator.ortools_strategies:
+            if not np.isnan(self.validator.ortools_makespans[ortools_strategy][-1]):
+                self.logger.record(
+                    f"validation/ortools_{ortools_strategy}_makespan",
+                    self.validator.ortools_makespans[ortools_strategy][-1],
+                )
+        ortools_makespan = self.validator.ortools_makespans[
+            self.validator.default_ortools_strategy
+        ][-1]
+        if np.isnan(ortools_makespan):
+            return
+        self.logger.record(
+            "validation/ratio_to_ortools",
+            self.validator.makespans[-1] / ortools_makespan,
+        )
+        self.logger.record(
+            "validation/dist_to_ortools",
+            self.validator.makespans[-1] - ortools_makespan,
+        )
+        for custom_agent in self.validator.custom_agents:
+            name = custom_agent.rule
+            self.logger.record(
+                f"validation/{name}_ratio_to_ortools",
+                self.validator.custom_makespans[name][-1] / ortools_makespan,
+            )
+
     def pb_ids(self, problem_description):
         if not hasattr(problem_description, "train_psps"):
             return list(range(self.num_envs))  # simple env id
@@ -366,15 +478,26 @@ class PPO:
     ) -> float:
         # env setup
         batch_size = self.num_envs * self.num_steps
+        if self.pipelined_rollouts and (
+            self.vecenv_type != "graphgym" or not agent.graphobs or self.num_envs < 2
+        ):
+            raise Exception(
+                "pipelined rollouts need graphgym vecenv, graph observations and at least 2 envs"
+            )
         classVecEnv = gym.vector.AsyncVectorEnv
         print("creating environments")
         pbs_per_env = self.pb_ids(problem_description)
+        env_problem_description = problem_description
+        if self.vecenv_type != "dummy" and hasattr(problem_description, "train_psps"):
+            env_problem_description, env_specification = worker_descriptions(
+                problem_description, env_specification
+            )
         if self.vecenv_type == "dummy":
             envs = gym.vector.SyncVectorEnv(
                 [
                     create_env(
                         self.env_cls,
-                        problem_description,
+                        env_problem_description,
                         env_specification,
                         pbs_per_env[i],
                     )
@@ -387,7 +510,7 @@ class PPO:
                 [
                     create_env(
                         self.env_cls,
-                        problem_description,
+                        env_problem_description,
                         env_specification,
                         pbs_per_env[i],
                     )
@@ -398,23 +521,40 @@ class PPO:
                 copy=False,
             )
         elif self.vecenv_type == "graphgym":
-            envs = AsyncGraphVectorEnv(
-                [
-                    create_env(
-                        self.env_cls,
-                        problem_description,
-                        env_specification,
-                        pbs_per_env[i],
-                    )
-                    for i in range(self.num_envs)
-                ],
-                # spwan helps when observation space is huge
-                # and also with torch in subprocesses
-                context="spawn",
-                copy=False,
-                shared_memory=True,
-                disk=True,
-            )
+            env_fns = [
+                create_env(
+                    self.env_cls,
+                    env_problem_description,
+                    env_specification,
+                    pbs_per_env[i],
+                )
+                for i in range(self.num_envs)
+            ]
+            if self.pipelined_rollouts:
+                # two halves of the envs, one stepping while the agent acts on the
+                # other
+                env_groups = [
+                    env_fns[: self.num_envs // 2],
+                    env_fns[self.num_envs // 2 :],
+                ]
+            else:
+                env_groups = [env_fns]
+            envs = [
+                AsyncGraphVectorEnv(
+                    group_fns,
+                    # spwan helps when observation space is huge
+                    # and also with torch in subprocesses
+                    context="spawn",
+                    # observations are kept in the rollout, so they cannot be views of
+                    # the shared memory buffers
+                    copy=self.graph_transport == "tensor",
+                    shared_memory=True,
+                    transport=self.graph_transport,
+                )
+                for group_fns in env_groups
+            ]
+            if not self.pipelined_rollouts:
+                envs = envs[0]
 
         print("... done creating environments")
 
@@ -452,6 +592,12 @@ class PPO:
             agent.to(rollout_agent_device)
             self.validator.validate(agent, self)
             print("... done initial validation")
+        if self.async_validation and self.validator is not None:
+            # started after the initial validation, the process gets a copy of the
+            # validator with it
+            async_validator = AsyncValidator(self.validator, agent)
+        else:
+            async_validator = None
         start_time = time.time()
         num_updates = self.total_timesteps // batch_size
 
@@ -708,6 +854,13 @@ class PPO:
                         safe_mean([ep_info["l"] for ep_info in self.ep_info_buffer]),
                     )
                 self.logger.record("time/fps", fps)
+                self.logger.record(
+                    "rollout/agent_utilization", self.rollout_utilization["agent"]
+                )
+                if "env" in self.rollout_utilization:
+                    self.logger.record(
+                        "rollout/env_utilization", self.rollout_utilization["env"]
+                    )
                 self.logger.record(
                     "time/dps",
                     int(
@@ -725,12 +878,18 @@ class PPO:
                 self.logger.record(
                     "time/total_timesteps", self.global_step, exclude="tensorboard"
                 )
+                rwpe_cache = getattr(agent, "rwpe_cache", None)
+                if rwpe_cache is not None:
+                    for k, v in rwpe_cache.stats().items():
+                        self.logger.record("rwpe_cache/" + k, v)
 
                 ratio_to_ortools = np.array(self.validator.makespans) / np.array(
                     self.validator.ortools_makespans[
                         self.validator.default_ortools_strategy
                     ]
                 )
+                # validations with pending OR-Tools solutions are left out
+                ratio_to_ortools = ratio_to_ortools[~np.isnan(ratio_to_ortools)]
                 self.logger.record("train/ratio_monotony", monotony(ratio_to_ortools))
                 self.logger.record("train/ratio_stability", stability(ratio_to_ortools))
                 if self.debug_net:
@@ -744,53 +903,36 @@ class PPO:
                 and iteration % self.validation_freq == 0
                 and self.validator is not None
             ):
-                self.validator.validate(agent, self)
-
-                # Statistics from the agent validator.
-                self.logger.record(
-                    "validation/ppo_makespan",
-                    self.validator.makespans[-1],
-                )
-                for ortools_strategy in self.validator.ortools_strategies:
-                    self.logger.record(
-                        f"validation/ortools_{ortools_strategy}_makespan",
-                        self.validator.ortools_makespans[ortools_strategy][-1],
-                    )
-                self.logger.record(
-                    "validation/random_makepsan",
-                    self.validator.random_makespans[-1],
-                )
-                self.logger.record(
-                    "validation/ratio_to_ortools",
-                    self.validator.makespans[-1]
-                    / self.validator.ortools_makespans[
-                        self.validator.default_ortools_strategy
-                    ][-1],
-                )
-                self.logger.record(
-                    "validation/dist_to_ortools",
-                    self.validator.makespans[-1]
-                    - self.validator.ortools_makespans[
-                        self.validator.default_ortools_strategy
-                    ][-1],
-                )
-                for custom_agent in self.validator.custom_agents:
-                    name = custom_agent.rule
-                    self.logger.record(
-                        f"validation/{name}",
-                        self.validator.custom_makespans[name][-1],
-                    )
-                    self.logger.record(
-                        f"validation/{name}_ratio_to_ortools",
-                        self.validator.custom_makespans[name][-1]
-                        / self.validator.ortools_makespans[
-                            self.validator.default_ortools_strategy
-                        ][-1],
-                    )
+                if async_validator is not None:
+                    if not async_validator.submit(iteration, agent, self):
+                        print("previous validation still pending, validation skipped")
+                else:
+                    self.validator.validate(agent, self)
+                    self.record_validation()
+            if async_validator is not None:
+                # the logger keeps the last validation if several are done
+                validated_updates = async_validator.poll()
+                if validated_updates:
+                    self.record_validation(validated_updates[-1])
 
             self.logger.dump(step=self.global_step)
 
-        envs.close()
+        if async_validator is not None:
+            validated_updates = async_validator.close()
+            if validated_updates:
+                self.record_validation(validated_updates[-1])
+            self.logger.dump(step=self.global_step)
+        for group in envs if isinstance(envs, list) else [envs]:
+            group.close()
+        if env_problem_description is not problem_description:
+            env_problem_description.train_psps.close()
+            env_problem_description.test_psps.close()
+        self.validator.close()
+        if self.rollout_storage is not None:
+            self.rollout_storage.close()
+        rwpe_cache = getattr(agent, "rwpe_cache", None)
+        if rwpe_cache is not None:
+            rwpe_cache.close()
 
         ppo_makespans = np.array(self.validator.makespans)
         ortools_makespans = np.array(
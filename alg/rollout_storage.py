@@ -0,0 +1,198 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+# largely inspired from https://github.com/vwxyzjn/cleanrl/blob/master/cleanrl/ppo.py
+
+
+import math
+import os
+import tempfile
+
+import dgl
+import numpy as np
+import torch
+
+from psp.env.graphgym.graph_tensors import (
+    GraphBuilder,
+    graph_counts,
+    graph_schema,
+    graph_tensors,
+)
+
+
+class Column:
+    """
+    Growable flat buffer of a single dtype, in RAM or memory mapped from a file.
+    """
+
+    def __init__(self, dtype, fname=None, capacity=1 << 16):
+        self.dtype = dtype
+        self.np_dtype = torch.empty(0, dtype=dtype).numpy().dtype
+        self.fname = fname
+        self.size = 0
+        self.capacity = 0
+        self.data = None
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        if self.fname is None:
+            data = torch.empty(capacity, dtype=self.dtype)
+            if self.data is not None:
+                data[: self.size] = self.data[: self.size]
+        else:
+            # extend the file, its content is kept by the new mapping
+            with open(self.fname, "ab") as f:
+                f.truncate(capacity * self.np_dtype.itemsize)
+            data = torch.from_numpy(
+                np.memmap(self.fname, dtype=self.np_dtype, mode="r+", shape=(capacity,))
+            )
+        self.data = data
+        self.capacity = capacity
+
+    def append(self, tensor):
+        n = tensor.numel()
+        if self.size + n > self.capacity:
+            self.grow(max(self.size + n, 2 * self.capacity))
+        offset = self.size
+        self.data[offset : offset + n] = tensor.reshape(-1)
+        self.size += n
+        return offset
+
+    def get(self, offset, shape):
+        return self.data[offset : offset + math.prod(shape)].view(shape)
+
+    def close(self):
+        self.data = None
+        if self.fname is not None and os.path.exists(self.fname):
+            os.remove(self.fname)
+
+
+class RolloutStorage:
+    """
+    Observations of a rollout appended to contiguous columns (one per graph tensor or
+    observation key and dtype), in RAM or in memory mapped files of directory, with
+    per sample offsets. Samples are rebuilt from views of the columns, graphs with the
+    same fast path as the shared memory transport of the graphgym vector env.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.columns = {}
+        self.builders = {}
+        # per sample: ("graph", schema, counts, offsets) or ("dict", keys, dtypes,
+        # offsets, shapes)
+        self.samples = []
+
+    def reset(self):
+        # buffers and files are kept for next rollout
+        self.samples = []
+        for column in self.columns.values():
+            column.size = 0
+
+    def __len__(self):
+        return len(self.samples)
+
+    def column(self, name, dtype):
+        key = (name, dtype)
+        if key not in self.columns:
+            fname = None
+            if self.directory is not None:
+                # pid in the prefix for the interrupt handler of train_psp
+                fd, fname = tempfile.mkstemp(
+                    prefix="wheatley_rollout_" + str(os.getpid()) + "_",
+                    suffix=".bin",
+                    dir=self.directory,
+                )
+                os.close(fd)
+            self.columns[key] = Column(dtype, fname)
+        return self.columns[key]
+
+    def append_graph(self, g):
+        schema = graph_schema(g)
+        if schema not in self.builders:
+            self.builders[schema] = GraphBuilder(schema)
+        counts = graph_counts(g, schema)
+        names = self.tensor_names(schema)
+        offsets = [
+            self.column(name, tensor.dtype).append(tensor)
+            for name, tensor in zip(names, graph_tensors(g, schema, counts))
+        ]
+        self.samples.append(("graph", schema, counts, offsets))
+
+    def append_dict(self, obs):
+        keys = tuple(obs.keys())
+        dtypes = [obs[k].dtype for k in keys]
+        offsets = [self.column(k, obs[k].dtype).append(obs[k]) for k in keys]
+        shapes = [tuple(obs[k].shape) for k in keys]
+        self.samples.append(("dict", keys, dtypes, offsets, shapes))
+
+    def append(self, obs):
+        # a step of observations: list of graphs or dict batched over envs
+        if isinstance(obs, list):
+            for g in obs:
+                self.append_graph(g)
+        else:
+            for t in zip(*obs.values()):
+                self.append_dict(dict(zip(obs, t)))
+
+    @staticmethod
+    def tensor_names(schema):
+        _, _, _, ndata, edata = schema
+        return (
+            [("ids",)]
+            + [("n", ntype, key) for ntype, key, _, _ in ndata]
+            + [("e", etype, key) for etype, key, _, _ in edata]
+        )
+
+    def get_sample(self, i):
+        sample = self.samples[i]
+        if sample[0] == "graph":
+            _, schema, counts, offsets = sample
+            builder = self.builders[schema]
+            tensors = [
+                self.columns[(name, dtype)].get(offset, shape)
+                for name, (dtype, shape), offset in zip(
+                    self.tensor_names(schema), builder.shapes(counts), offsets
+                )
+            ]
+            return builder.build(counts, tensors)
+        _, keys, dtypes, offsets, shapes = sample
+        return {
+            k: self.columns[(k, dtype)].get(offset, shape)
+            for k, dtype, offset, shape in zip(keys, dtypes, offsets, shapes)
+        }
+
+    def get(self, indices):
+        return [self.get_sample(i) for i in indices]
+
+    def subset(self, indices):
+        storage = RolloutStorage(self.directory)
+        storage.columns = self.columns
+        storage.builders = self.builders
+        storage.samples = [self.samples[i] for i in indices]
+        return storage
+
+    def close(self):
+        for column in self.columns.values():
+            column.close()
+        self.columns = {}
+        self.samples = []
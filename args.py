@@ -84,7 +84,19 @@ def argument_parser() -> argparse.ArgumentParser:
         "--store_rollouts_on_disk",
         default=None,
         type=str,
-        help="location for rollout on disk store rollouts on disk (graphgym only ATM)",
+        help="directory of the memory mapped rollout storage (rollouts in RAM otherwise)",
+    )
+    parser.add_argument(
+        "--rollout_arena",
+        default=False,
+        action="store_true",
+        help="store rollouts in RAM in contiguous buffers instead of lists of observations",
+    )
+    parser.add_argument(
+        "--pipelined_rollouts",
+        default=False,
+        action="store_true",
+        help="collect rollouts with two groups of graphgym envs, computing the actions of one group while the other steps",
     )
     parser.add_argument(
         "--exp_name_appendix", type=str, help="Appendix for the name of the experience"
@@ -96,6 +108,13 @@ def argument_parser() -> argparse.ArgumentParser:
         choices=["subproc", "dummy", "graphgym"],
         help="Use SubprocEnv or DummyVecEnv in SB3",
     )
+    parser.add_argument(
+        "--graph_transport",
+        type=str,
+        default="tensor",
+        choices=["tensor", "disk", "pickle", "delta"],
+        help="how graphgym workers send observations: shared memory tensors, dgl files, pickles or deltas with the previous observation through pipes",
+    )
 
     # =================================================TRAINING SPECIFICATION====================================================
     parser.add_argument(
@@ -231,12 +250,36 @@ def argument_parser() -> argparse.ArgumentParser:
         default=3,
         help="Max compute time for ortools (in seconds)",
     )
+    parser.add_argument(
+        "--n_ortools_workers",
+        type=int,
+        default=0,
+        help="Number of worker processes computing OR-Tools solutions in background (computed when needed if 0)",
+    )
+    parser.add_argument(
+        "--ortools_cache_dir",
+        type=str,
+        default=None,
+        help="Directory of OR-Tools solutions, that can be shared by experiments (experiment path if None)",
+    )
     parser.add_argument(
         "--validation_batch_size",
         type=int,
         default=0,
         help="Batch size for predictions of actions during validation",
     )
+    parser.add_argument(
+        "--n_validation_workers",
+        type=int,
+        default=0,
+        help="Number of worker processes running the validation envs (validation envs run in the main process if 0)",
+    )
+    parser.add_argument(
+        "--async_validation",
+        default=False,
+        action="store_true",
+        help="Run validations in a separate process while training continues",
+    )
 
     # =================================================TESTING SPECIFICATION====================================================
     parser.add_argument(
@@ -448,6 +491,13 @@ def argument_parser() -> argparse.ArgumentParser:
         help="take into account resource precedence edges",
     )
 
+    parser.add_argument(
+        "--resource_model",
+        default="flowGraph",
+        choices=["flowGraph", "timelineTree"],
+        help="resource model used to compute start dates and resource precedences",
+    )
+
     parser.add_argument(
         "--remove_old_resource_info",
         default=False,
@@ -566,6 +616,18 @@ def argument_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="enable rwpe cache",
     )
+    parser.add_argument(
+        "--rwpe_cache_size",
+        type=int,
+        default=10000,
+        help="max number of graphs in the rwpe cache (least recently used evicted first)",
+    )
+    parser.add_argument(
+        "--share_rwpe_cache",
+        default=False,
+        action="store_true",
+        help="keep the rwpe cache in a manager process shared with worker processes",
+    )
 
     parser.add_argument(
         "--two_hot",
@@ -701,6 +763,13 @@ def argument_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Fix affectations and durations",
     )
+    parser.add_argument(
+        "--graph_backend",
+        type=str,
+        default="networkx",
+        choices=["networkx", "array"],
+        help="JSSP precedence graph storage: networkx or preallocated numpy adjacency arrays (faster)",
+    )
     parser.add_argument(
         "--max_edges_upper_bound_factor",
         type=int,
@@ -809,6 +878,18 @@ def argument_parser() -> argparse.ArgumentParser:
     )
     parser.add_argument("--train_dir", type=str, default=None, help="psp train dir")
     parser.add_argument("--test_dir", type=str, default=None, help="psp test dir")
+    parser.add_argument(
+        "--instance_cache_dir",
+        type=str,
+        default=None,
+        help="Directory of parsed problems, reused when the problem files are unchanged (no cache if None)",
+    )
+    parser.add_argument(
+        "--n_loader_workers",
+        type=int,
+        default=0,
+        help="Number of worker processes parsing the problems of --train_dir / --test_dir",
+    )
     parser.add_argument(
         "--train_test_split",
         type=float,
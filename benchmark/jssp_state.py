@@ -0,0 +1,128 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+# Micro benchmark of the JSSP env State, playing random episodes on Taillard instances
+# and timing hard resets (State creation, pre features computation).
+# From the repository root:
+#   python3 benchmark/jssp_state.py --instances "instances/taillard/ta4*.txt"
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(".")
+
+from jssp.description import Description  # noqa E402
+from jssp.env.env import Env  # noqa E402
+from jssp.env.env_specification import EnvSpecification  # noqa E402
+from jssp.env.precedence_graph import GRAPH_BACKENDS  # noqa E402
+from jssp.utils.loaders import load_taillard_problem  # noqa E402
+
+
+def make_env(affectations, durations, graph_backend, features):
+    n_j, n_m = affectations.shape
+    env_specification = EnvSpecification(
+        max_n_jobs=n_j,
+        max_n_machines=n_m,
+        normalize_input=True,
+        input_list=list(features),
+        insertion_mode="no_forced_insertion",
+        max_edges_factor=4,
+        sample_n_jobs=-1,
+        chunk_n_jobs=-1,
+        observe_conflicts_as_cliques=False,
+        observe_real_duration_when_affect=False,
+        do_not_observe_updated_bounds=False,
+        graph_backend=graph_backend,
+    )
+    problem_description = Description(
+        transition_model_config="simple",
+        reward_model_config="Sparse",
+        deterministic=True,
+        fixed=True,
+        seed=0,
+        affectations=affectations,
+        durations=durations,
+    )
+    return Env(problem_description, env_specification)
+
+
+def bench_steps(env, n_episodes, seed):
+    rng = np.random.default_rng(seed)
+    n_steps = 0
+    elapsed = 0.0
+    for _ in range(n_episodes):
+        env.reset(soft=True)
+        done = False
+        while not done:
+            action = rng.choice(np.flatnonzero(env.action_masks()))
+            start = time.perf_counter()
+            _, _, done, _, _ = env.step(action)
+            elapsed += time.perf_counter() - start
+            n_steps += 1
+    return n_steps / elapsed
+
+
+def bench_resets(env, n_resets):
+    start = time.perf_counter()
+    for _ in range(n_resets):
+        env.reset(soft=False)
+    return n_resets / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSSP State micro benchmark")
+    parser.add_argument(
+        "--instances",
+        type=str,
+        default="instances/taillard/ta4[1-3].txt",
+        help="glob of Taillard instance files",
+    )
+    parser.add_argument("--n_episodes", type=int, default=2)
+    parser.add_argument("--n_resets", type=int, default=20)
+    parser.add_argument(
+        "--graph_backends", nargs="+", default=GRAPH_BACKENDS, choices=GRAPH_BACKENDS
+    )
+    parser.add_argument("--features", nargs="*", default=["duration"])
+    args = parser.parse_args()
+
+    print("instance\tsize\tbackend\tsteps/s\tresets/s")
+    for problem_file in sorted(glob.glob(args.instances)):
+        n_j, n_m, affectations, durations = load_taillard_problem(problem_file)
+        name = os.path.basename(problem_file).replace(".txt", "")
+        for graph_backend in args.graph_backends:
+            env = make_env(affectations, durations, graph_backend, args.features)
+            fps = bench_steps(env, args.n_episodes, seed=0)
+            rps = bench_resets(env, args.n_resets)
+            print(f"{name}\t{n_j}x{n_m}\t{graph_backend}\t{fps:.1f}\t{rps:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+# Scaling of ResourceFlowGraph with the resource capacity: random activities each
+# asking for a fraction of the capacity, scheduled as soon as available.
+# From the repository root:
+#   python3 benchmark/resource_flowgraph.py --capacities 10 100 1000
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(".")
+
+from psp.utils.resource_flowgraph import ResourceFlowGraph  # noqa E402
+
+
+def bench_consume(capacity, n_activities, seed):
+    rng = np.random.default_rng(seed)
+    # same normalization as the PSP states: levels in [0, 1], one unit per capacity
+    resource = ResourceFlowGraph(1.0, unit_val=1.0 / capacity, renewable=True)
+    levels = rng.integers(1, capacity // 2 + 2, size=n_activities) / capacity
+    durations = rng.integers(1, 20, size=n_activities)
+    start_time = time.perf_counter()
+    for i in range(n_activities):
+        start = resource.availability(levels[i])
+        resource.consume(i + 1, levels[i], start, start + durations[i])
+    elapsed = time.perf_counter() - start_time
+    return n_activities / elapsed, len(resource.edges)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ResourceFlowGraph capacity scaling")
+    parser.add_argument(
+        "--capacities", type=int, nargs="+", default=[10, 100, 1000, 10000]
+    )
+    parser.add_argument("--n_activities", type=int, default=2000)
+    args = parser.parse_args()
+
+    print("capacity\tactivities/s\tflow edges")
+    for capacity in args.capacities:
+        aps, n_edges = bench_consume(capacity, args.n_activities, seed=0)
+        print(f"{capacity}\t{aps:.1f}\t{n_edges}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+# Scaling of the timeline resource models with the number of scheduled activities:
+# random activities each asking for a fraction of the capacity, scheduled as soon as
+# available after the previous ones.
+# From the repository root:
+#   python3 benchmark/resource_timeline.py --n_activities 1000 10000
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(".")
+
+from psp.utils.resource_timeline import ResourceTimeline  # noqa E402
+from psp.utils.resource_timeline_tree import ResourceTimelineTree  # noqa E402
+
+RESOURCE_MODELS = {"timeline": ResourceTimeline, "timelineTree": ResourceTimelineTree}
+
+
+def bench_consume(model, capacity, n_activities, seed):
+    rng = np.random.default_rng(seed)
+    resource = RESOURCE_MODELS[model](capacity, allow_before_last=False)
+    levels = rng.integers(1, capacity + 1, size=n_activities).tolist()
+    durations = rng.integers(1, 20, size=n_activities).tolist()
+    start_time = time.perf_counter()
+    for i in range(n_activities):
+        start = resource.availability(levels[i])[0]
+        resource.consume(i + 1, levels[i], start, start + durations[i])
+    elapsed = time.perf_counter() - start_time
+    return n_activities / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Timeline resource models scaling")
+    parser.add_argument(
+        "--models", nargs="+", default=list(RESOURCE_MODELS), choices=RESOURCE_MODELS
+    )
+    parser.add_argument("--capacity", type=int, default=10)
+    parser.add_argument(
+        "--n_activities", type=int, nargs="+", default=[100, 1000, 10000]
+    )
+    args = parser.parse_args()
+
+    print("model\tactivities\tactivities/s")
+    for n_activities in args.n_activities:
+        for model in args.models:
+            aps = bench_consume(model, args.capacity, n_activities, seed=0)
+            print(f"{model}\t{n_activities}\t{aps:.1f}")
+
+
+if __name__ == "__main__":
+    main()
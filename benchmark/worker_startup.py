@@ -0,0 +1,94 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+# Import time and memory of env workers: every spawned worker imports the env modules
+# in a fresh interpreter. Each module is imported in new processes, reporting the
+# import time, the max RSS and the rendering / analytics modules that got loaded.
+# From the repository root:
+#   python3 benchmark/worker_startup.py --repeats 5
+
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ["cv2", "matplotlib", "plotly", "pandas", "networkx", "scipy"]
+
+CHILD = """
+import json, resource, sys, time
+sys.path.append(".")
+import torch
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "time": elapsed,
+    "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [m for m in {heavy} if m in sys.modules],
+}}))
+"""
+
+
+def bench_import(module, repeats):
+    times, rss = [], []
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(result["time"])
+        rss.append(result["rss"])
+    return min(times), min(rss), result["loaded"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Env worker startup cost")
+    parser.add_argument(
+        "--modules",
+        nargs="+",
+        default=[
+            "psp.env.graphgym.async_vector_env",
+            "psp.env.genv",
+            "psp.env.env",
+            "jssp.env.env",
+        ],
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    # torch is imported before timing, every worker needs it anyway
+    print("module\timport s\tmax RSS MB\tloaded")
+    for module in args.modules:
+        elapsed, rss, loaded = bench_import(module, args.repeats)
+        print(f"{module}\t{elapsed:.2f}\t{rss:.0f}\t{','.join(loaded)}")
+
+
+if __name__ == "__main__":
+    main()
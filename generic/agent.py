@@ -29,6 +29,9 @@ import torch
 import math
 from torch.distributions.categorical import Categorical
 
+from generic.ragged_categorical import RaggedCategorical
+from generic.utils import PackedMasks
+
 
 def symlog(x):
     return torch.sign(x) * torch.log(1 + torch.abs(x))
@@ -88,6 +91,9 @@ def hl_gauss_to_probs(x, B):
 
 
 class Agent(torch.nn.Module):
+    # whether actions can be computed from packed masks, see get_n_nodes
+    packed_actions = False
+
     def __init__(
         self,
         env_specification,
@@ -155,19 +161,21 @@ class Agent(torch.nn.Module):
 
     def save(self, path):
         """Saving an agent corresponds to saving his model and a few args to specify how the model is working"""
-        device = next(self.gnn.parameters()).device
-        self.to(torch.device("cpu"))
-        torch.save(
-            {
-                "env_specification": self.env_specification,
-                "agent_specification": self.agent_specification,
-                "gnn": self.gnn.state_dict(),
-                "value_net": self.value_net.state_dict(),
-                "action_net": self.action_net.state_dict(),
-            },
-            path,
-        )
-        self.to(device)
+        torch.save(self.checkpoint(), path)
+
+    def checkpoint(self):
+        """What save writes, with copies of the weights on cpu"""
+
+        def cpu_copy(state_dict):
+            return {k: v.detach().cpu().clone() for k, v in state_dict.items()}
+
+        return {
+            "env_specification": self.env_specification,
+            "agent_specification": self.agent_specification,
+            "gnn": cpu_copy(self.gnn.state_dict()),
+            "value_net": cpu_copy(self.value_net.state_dict()),
+            "action_net": cpu_copy(self.action_net.state_dict()),
+        }
 
     @classmethod
     def load(cls, path):
@@ -189,6 +197,10 @@ class Agent(torch.nn.Module):
     def get_action_and_value(
         self, x, action=None, action_masks=None, deterministic=False
     ):
+        if isinstance(action_masks, PackedMasks):
+            return self._get_packed_action_and_value(
+                x, action, action_masks, deterministic
+            )
         features = self.gnn(x)
         value = self.value_net(features[:, 0, features.shape[2] // 2 :])
         logits = self.action_net(features).squeeze(-1)
@@ -218,6 +230,21 @@ class Agent(torch.nn.Module):
             entropy = distrib.entropy()
         return action, distrib.log_prob(action), entropy, value
 
+    def _get_packed_action_and_value(self, x, action, action_masks, deterministic):
+        # actions over the nodes of the graphs only, without padding to max_n_nodes
+        features = self.gnn(x, packed=True)
+        value = self.value_net(features.graph_embedding)
+        logits = self.action_net(features.features).squeeze(-1)
+        distrib = RaggedCategorical(
+            logits, features.n_nodes, action_masks.values.to(logits.device)
+        )
+        if action is None:
+            if deterministic == False:
+                action = distrib.sample()
+            else:
+                action = distrib.mode()
+        return action, distrib.log_prob(action), distrib.entropy(), value
+
     def get_action_probs_and_value(self, x, action_masks):
         features = self.gnn(x)
         value = self.value_net(features[:, 0, features.shape[2] // 2 :])
@@ -243,6 +270,10 @@ class Agent(torch.nn.Module):
 
     def predict(self, observation, deterministic, action_masks):
         with torch.no_grad():
+            if isinstance(action_masks, PackedMasks):
+                return self._get_packed_action_and_value(
+                    observation, None, action_masks, deterministic
+                )[0]
             features = self.gnn(observation)
             logits = self.action_net(features)
             if action_masks is not None:
@@ -73,6 +73,8 @@ class AgentSpecification:
         hl_gauss,
         reward_weights,
         sgformer,
+        rwpe_cache_size=10000,
+        share_rwpe_cache=False,
     ):
         self.n_features = n_features
         self.gconv_type = gconv_type
@@ -113,6 +115,8 @@ class AgentSpecification:
         self.rwpe_k = rwpe_k
         self.rwpe_h = rwpe_h
         self.cache_rwpe = cache_rwpe
+        self.rwpe_cache_size = rwpe_cache_size
+        self.share_rwpe_cache = share_rwpe_cache
         self.two_hot = two_hot
         self.symlog = symlog
         self.hl_gauss = hl_gauss
@@ -201,6 +205,8 @@ class AgentSpecification:
                 f"RWPE k:                           {self.rwpe_k}\n"
                 f"RWPE h:                           {self.rwpe_h}\n"
                 f"RWPE cache:                       {self.cache_rwpe}\n"
+                f"RWPE cache size:                  {self.rwpe_cache_size}\n"
+                f"Share RWPE cache:                 {self.share_rwpe_cache}\n"
                 f"two hot encoding:                 {self.two_hot}\n"
                 f"symlog critic:                    {self.symlog}\n"
                 f"hl gauss encoding:                {self.hl_gauss}\n"
@@ -26,6 +26,7 @@
 
 import copy
 import csv
+import io
 import os
 import pickle
 import sys
@@ -38,6 +39,7 @@ import tqdm
 import visdom
 from PIL import Image
 
+from generic.ortools_store import OrToolsStore, content_key
 from generic.random_agent import RandomAgent
 from generic.utils import decode_mask, safe_mean
 from jssp.description import Description as JSSPDescription
@@ -46,7 +48,8 @@ from jssp.models.custom_agent import CustomAgent
 from jssp.utils.ortools import get_ortools_makespan as get_ortools_makespan_jssp
 from psp.env.env import Env as PSPEnv
 from psp.env.genv import GEnv
-from psp.utils.ortools import get_ortools_makespan_psp
+from psp.env.graphgym.validation_vector_env import AsyncValidationVectorEnv
+from psp.utils.ortools import get_ortools_durations_psp, get_ortools_makespan_psp
 
 
 class AgentValidator:
@@ -91,11 +94,8 @@ class AgentValidator:
         self.n_validation_env = training_specification.n_validation_env
         self.fixed_validation = training_specification.fixed_validation
         self.fixed_random_validation = training_specification.fixed_random_validation
-        self.vis = visdom.Visdom(
-            env=training_specification.display_env,
-            log_to_filename="/dev/null",
-            offline=disable_visdom,
-        )
+        self.display_env = training_specification.display_env
+        self.disable_visdom = disable_visdom
         self.path = training_specification.path
         # self.ortools_strategies = [training_specification.ortools_strategy, "realistic"]
         self.ortools_strategies = training_specification.ortools_strategy
@@ -191,31 +191,55 @@ class AgentValidator:
         self.variances = {}
 
         self.batch_size = training_specification.validation_batch_size
+        self.n_validation_workers = training_specification.n_validation_workers
+        self.graph_transport = training_specification.graph_transport
+        self.validation_vecenv = None
+
+        self.ortools_cache_dir = (
+            training_specification.ortools_cache_dir
+            if training_specification.ortools_cache_dir is not None
+            else self.path
+        )
+        self.n_ortools_workers = training_specification.n_ortools_workers
+        self._open()
+        # validation indices and keys of OR-Tools mean makespans waiting for solutions
+        self.pending_ortools_makespans = []
+        # (validation index, agent checkpoint, optimizer state, cactus png) of
+        # validations to compare to the best one when their OR-Tools makespans are
+        # available
+        self.pending_best_models = []
 
         # Compute OR-Tools solutions once if validations are fixed
         if self.fixed_validation:
-            self.fixed_ortools = {
+            self.fixed_ortools_keys = {
                 ortools_strategy: [] for ortools_strategy in self.ortools_strategies
             }
             for i in tqdm.tqdm(
                 range(self.n_validation_env), desc="Computing fixed OR-Tools solutions"
             ):
                 for ortools_strategy in self.ortools_strategies:
-                    self.fixed_ortools[ortools_strategy].append(
-                        self._get_ortools_makespan(i, ortools_strategy)
+                    self.fixed_ortools_keys[ortools_strategy].append(
+                        self._submit_ortools(i, ortools_strategy)
                     )
 
-            print(
-                f"   optimal solutions ({self.default_ortools_strategy}):",
-                sum(
-                    [
-                        res[2]
-                        for res in self.fixed_ortools[self.default_ortools_strategy]
-                    ]
-                ),
-                " / ",
-                self.n_validation_env,
-            )
+            if self.ortools_store.n_pending() > 0:
+                print(
+                    f"   {self.ortools_store.n_pending()} OR-Tools solutions computed in background"
+                )
+            else:
+                print(
+                    f"   optimal solutions ({self.default_ortools_strategy}):",
+                    sum(
+                        [
+                            self.ortools_store.get(key)[2]
+                            for key in self.fixed_ortools_keys[
+                                self.default_ortools_strategy
+                            ]
+                        ]
+                    ),
+                    " / ",
+                    self.n_validation_env,
+                )
 
             self.fixed_custom_solutions = dict()
             for agent in self.custom_agents:
@@ -246,6 +270,30 @@ class AgentValidator:
                     makespans.append(self._get_random_makespan(i))
                 self.fixed_random.append(sum(makespans) / len(makespans))
 
+    def _open(self):
+        self.vis = visdom.Visdom(
+            env=self.display_env,
+            log_to_filename="/dev/null",
+            offline=self.disable_visdom,
+        )
+        self.ortools_store = OrToolsStore(
+            self.ortools_cache_dir, self.n_ortools_workers
+        )
+
+    def __getstate__(self):
+        # the visdom client and the worker processes stay in this process, a copy of
+        # the validator opens its own
+        state = self.__dict__.copy()
+        del state["vis"]
+        del state["ortools_store"]
+        state["validation_vecenv"] = None
+        state["current_scatter_fig"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
     def validate(self, agent, alg):
         self._evaluate_agent(agent)
         self._visdom_metrics(agent, alg)
@@ -258,42 +306,103 @@ class AgentValidator:
         #     / np.array(self.ortools_makespans[-4 : len(self.ortools_makespans)])
         # )
 
-        cur_ratio = (
-            self.makespans[-1]
-            / self.ortools_makespans[self.default_ortools_strategy][-1]
-        )
+        ortools_makespan = self.ortools_makespans[self.default_ortools_strategy][-1]
+        if np.isnan(ortools_makespan):
+            # OR-Tools solutions are pending: decided on backfill, on copies of the
+            # agent and optimizer states and of the figure of this validation
+            cactus = None
+            if self.current_scatter_fig is not None:
+                cactus = io.BytesIO()
+                self.current_scatter_fig.savefig(cactus, format="png")
+                cactus = cactus.getvalue()
+            self.pending_best_models.append(
+                (
+                    len(self.makespans) - 1,
+                    agent.checkpoint(),
+                    copy.deepcopy(alg.optimizer.state_dict()),
+                    cactus,
+                )
+            )
+            return
+        cur_ratio = self.makespans[-1] / ortools_makespan
         if cur_ratio <= self.makespan_ratio:
-            print("Saving agent", self.path + "agent.pkl")
-            agent.save(self.path + "agent.pkl")
-            torch.save(alg.optimizer.state_dict(), self.path + "optimizer.pkl")
-            self.save_state(self.path + "validator.pkl")
-
-            self.makespan_ratio = cur_ratio
-            print(f"Current ratio : {cur_ratio:.3f}")
-
+            self._save_best_model(
+                cur_ratio, agent.checkpoint(), alg.optimizer.state_dict()
+            )
             print(f"Saving the figure {self.path + 'best-ortools-ppo-cactus.png'}")
             self.current_scatter_fig.savefig(self.path + "best-ortools-ppo-cactus.png")
 
-    def _get_ortools_makespan(self, i: int, ortools_strategy: str):
-        save_path = self._ortools_solution_path(i, ortools_strategy)
+    def _save_best_model(self, ratio, checkpoint, optimizer_state):
+        print("Saving agent", self.path + "agent.pkl")
+        torch.save(checkpoint, self.path + "agent.pkl")
+        torch.save(optimizer_state, self.path + "optimizer.pkl")
+        self.save_state(self.path + "validator.pkl")
+
+        self.makespan_ratio = ratio
+        print(f"Current ratio : {ratio:.3f}")
+
+    def _save_pending_best_models(self):
+        pending = []
+        for k, checkpoint, optimizer_state, cactus in self.pending_best_models:
+            ortools_makespan = self.ortools_makespans[self.default_ortools_strategy][k]
+            if np.isnan(ortools_makespan):
+                pending.append((k, checkpoint, optimizer_state, cactus))
+                continue
+            ratio = self.makespans[k] / ortools_makespan
+            if ratio <= self.makespan_ratio:
+                self._save_best_model(ratio, checkpoint, optimizer_state)
+                if cactus is not None:
+                    with open(self.path + "best-ortools-ppo-cactus.png", "wb") as f:
+                        f.write(cactus)
+        self.pending_best_models = pending
+
+    def _ortools_key(self, i: int, ortools_strategy: str) -> str:
+        env = self.validation_envs[i]
         if self.psp:
-            problem = self.validation_envs[i].problem
+            problem = env.problem
+            if not isinstance(problem, dict):
+                problem = (
+                    problem.n_modes_per_job,
+                    problem.successors,
+                    problem.durations,
+                    problem.resource_cons,
+                    problem.resource_availabilities,
+                    problem.n_renewable_resources,
+                    problem.n_nonrenewable_resources,
+                    problem.n_doubly_constrained_resources,
+                    problem.res_cal,
+                    problem.cals,
+                    problem.due_dates,
+                )
+            content = (
+                problem,
+                get_ortools_durations_psp(env, ortools_strategy),
+                env.state.all_duration_real(),
+            )
         else:
-            problem = self.validation_envs[i].state
-
-        previous_ortools_solution = self._ortools_read_solution(save_path, problem)
-        if previous_ortools_solution is not None:
-            return previous_ortools_solution
+            content = (env.state.affectations, env.state.original_durations)
+        return content_key(
+            content,
+            ortools_strategy,
+            self.max_time_ortools,
+            self.scaling_constant_ortools,
+        )
 
+    def _submit_ortools(self, i: int, ortools_strategy: str) -> str:
+        key = self._ortools_key(i, ortools_strategy)
         if self.psp:
-            makespan, schedule, optimal = get_ortools_makespan_psp(
+            self.ortools_store.submit(
+                key,
+                get_ortools_makespan_psp,
                 self.validation_envs[i],
                 self.max_time_ortools,
                 self.scaling_constant_ortools,
                 ortools_strategy,
             )
         else:
-            makespan, schedule, optimal = get_ortools_makespan_jssp(
+            self.ortools_store.submit(
+                key,
+                get_ortools_makespan_jssp,
                 self.validation_envs[i].state.affectations,
                 self.validation_envs[i].state.original_durations,
                 self.env_specification.n_features,
@@ -301,39 +410,25 @@ class AgentValidator:
                 self.scaling_constant_ortools,
                 ortools_strategy,
             )
+        return key
 
-        self._ortools_save_solution(save_path, problem, (makespan, schedule, optimal))
-        return makespan, schedule, optimal
-
-    def _ortools_solution_path(self, i: int, ortools_strategy: str) -> str:
-        return os.path.join(self.path, f"ortools_{ortools_strategy}_{i}.pkl")
-
-    def _ortools_save_solution(self, file_path, problem, ortools_solution):
-        with open(file_path, "wb") as f:
-            pickle.dump((problem, ortools_solution), f)
-
-    def _ortools_read_solution(self, file_path, current_problem):
-        """Returns the solution if the file exists and if the instance is the same
-        as the current problem. Returns None otherwise.
-        """
-        if not os.path.exists(file_path):
-            return
-
-        with open(file_path, "rb") as f:
-            saved_problem, ortools_solution = pickle.load(f)
-
-        if self.psp and current_problem == saved_problem:
-            return ortools_solution
+    def _get_ortools_makespan(self, i: int, ortools_strategy: str):
+        return self.ortools_store.get(
+            self._submit_ortools(i, ortools_strategy), wait=True
+        )
 
-        if (
-            not self.psp
-            and np.all(current_problem.affectations == current_problem.affectations)
-            and np.all(current_problem.durations == saved_problem.durations)
-            and np.all(
-                current_problem.original_durations == saved_problem.original_durations
+    def _backfill_ortools_makespans(self):
+        pending = []
+        for k, ortools_strategy, keys in self.pending_ortools_makespans:
+            solutions = [self.ortools_store.get(key) for key in keys]
+            if any(solution is None for solution in solutions):
+                pending.append((k, ortools_strategy, keys))
+                continue
+            self.ortools_makespans[ortools_strategy][k] = sum(
+                solution[0] / self.n_validation_env for solution in solutions
             )
-        ):
-            return ortools_solution
+        self.pending_ortools_makespans = pending
+        self._save_pending_best_models()
 
     def _get_random_makespan(self, i):
         sol = self.random_agent.predict(self.validation_envs[i])
@@ -393,41 +488,50 @@ class AgentValidator:
         custom_mean_makespan = {agent.rule: 0 for agent in self.custom_agents}
         start_eval = time.time()
 
-        if self.batch_size != 0:
+        if self.n_validation_workers > 0:
+            print("parallel batched predicts...")
+            vecenv = self._validation_vecenv()
+            self._batched_episodes(
+                agent,
+                vecenv.reset_envs(soft=self.fixed_validation),
+                vecenv.step_envs,
+            )
+            # the envs of the workers are the ones that ran the episodes
+            self.validation_envs = vecenv.get_envs()
+            print("...done")
+        elif self.batch_size != 0:
             print("batched predicts...")
-            # batch inference
-            envs = self.validation_envs
-            all_rdata = [env.reset(soft=self.fixed_validation) for env in envs]
-            all_obs = [
-                agent.obs_as_tensor_add_batch_dim(rdata[0]) for rdata in all_rdata
+            all_rdata = [
+                env.reset(soft=self.fixed_validation) for env in self.validation_envs
             ]
-            all_masks = decode_mask([rdata[1]["mask"] for rdata in all_rdata])
-            while envs:
-                all_obs = agent.rebatch_obs(all_obs)
-                all_actions = []
-                for i in range(0, len(envs), self.batch_size):
-                    bs = min(self.batch_size, len(envs) - i)
-                    actions = agent.predict(
-                        agent.get_obs(all_obs, list(range(i, i + bs))),
-                        action_masks=all_masks[i : i + bs],
-                        deterministic=True,
-                    )
-                    all_actions += list(actions)
-                all_obs = []
-                all_masks = []
-                todo_envs = []
-                for env, action in zip(envs, all_actions):
-                    obs, _, done, _, info = env.step(action.long().item())
-                    if done:
-                        continue
-                    all_obs.append(agent.obs_as_tensor_add_batch_dim(obs))
-                    todo_envs.append(env)
-                    all_masks.append(decode_mask(info["mask"]))
-                envs = todo_envs
+            self._batched_episodes(
+                agent,
+                (
+                    [rdata[0] for rdata in all_rdata],
+                    [rdata[1]["mask"] for rdata in all_rdata],
+                ),
+                self._step_validation_envs,
+            )
             print("...done")
 
+        if self.fixed_validation:
+            ortools_keys = self.fixed_ortools_keys
+        else:
+            # solutions of all the envs are submitted before their evaluation, to be
+            # computed in parallel by the OR-Tools workers
+            ortools_keys = {
+                ortools_strategy: [
+                    self._submit_ortools(i, ortools_strategy)
+                    for i in range(self.n_validation_env)
+                ]
+                for ortools_strategy in self.ortools_strategies
+            }
+        n_ortools_solutions = {
+            ortools_strategy: 0 for ortools_strategy in self.ortools_strategies
+        }
+
         for i in tqdm.tqdm(range(self.n_validation_env), desc="   evaluating         "):
-            if self.batch_size == 0:
+            if self.batch_size == 0 and self.n_validation_workers == 0:
                 obs, info = self.validation_envs[i].reset(soft=self.fixed_validation)
                 done = False
                 while not done:
@@ -472,18 +576,14 @@ class AgentValidator:
                     self.gantt_rl_img = self.validation_envs[i].render_fail()
 
             for ortools_strategy in self.ortools_strategies:
-                if self.fixed_validation:
-                    (
-                        or_tools_makespan,
-                        or_tools_schedule,
-                        optimal,
-                    ) = self.fixed_ortools[ortools_strategy][i]
-                else:
-                    (
-                        or_tools_makespan,
-                        or_tools_schedule,
-                        optimal,
-                    ) = self._get_ortools_makespan(i, ortools_strategy)
+                ortools_solution = self.ortools_store.get(
+                    ortools_keys[ortools_strategy][i]
+                )
+                if ortools_solution is None:
+                    # still being computed in background
+                    continue
+                or_tools_makespan, or_tools_schedule, optimal = ortools_solution
+                n_ortools_solutions[ortools_strategy] += 1
 
                 if ortools_strategy == self.averagistic_ortools_strategy:
                     self.last_ortools_makespans[i] = or_tools_makespan
@@ -539,7 +639,22 @@ class AgentValidator:
         print("--- mean_makespan=", mean_makespan, " ---")
         print("--- eval time=", time.time() - start_eval, "  ---")
         self.makespans.append(mean_makespan)
+        self._backfill_ortools_makespans()
         for ortools_strategy in self.ortools_strategies:
+            if n_ortools_solutions[ortools_strategy] < self.n_validation_env:
+                # filled when all solutions are available
+                print(
+                    f"--- {self.n_validation_env - n_ortools_solutions[ortools_strategy]} "
+                    f"OR-Tools {ortools_strategy} solutions pending ---"
+                )
+                self.pending_ortools_makespans.append(
+                    (
+                        len(self.ortools_makespans[ortools_strategy]),
+                        ortools_strategy,
+                        ortools_keys[ortools_strategy],
+                    )
+                )
+                ortools_mean_makespan[ortools_strategy] = float("nan")
             self.ortools_makespans[ortools_strategy].append(
                 ortools_mean_makespan[ortools_strategy]
             )
@@ -549,6 +664,61 @@ class AgentValidator:
                 custom_mean_makespan[custom_agent.rule]
             )
 
+    def _batched_episodes(self, agent, reset_data, step):
+        # runs the episodes of all validation envs, predicting the actions of the
+        # envs that are not done by batches of validation_batch_size
+        indices = list(range(self.n_validation_env))
+        all_obs, all_masks = reset_data
+        batch_size = self.batch_size if self.batch_size != 0 else 1
+        while indices:
+            if self.graphobs:
+                all_obs = [agent.obs_as_tensor_add_batch_dim(obs) for obs in all_obs]
+            else:
+                all_obs = agent.rebatch_obs(
+                    [agent.obs_as_tensor_add_batch_dim(obs) for obs in all_obs]
+                )
+            all_masks = decode_mask(
+                all_masks, agent.get_n_nodes(all_obs) if agent.packed_actions else None
+            )
+            all_actions = []
+            for i in range(0, len(indices), batch_size):
+                bs = min(batch_size, len(indices) - i)
+                actions = agent.predict(
+                    agent.get_obs(all_obs, list(range(i, i + bs))),
+                    action_masks=all_masks[i : i + bs],
+                    deterministic=True,
+                )
+                all_actions += [action.long().item() for action in actions]
+            indices, all_obs, all_masks = step(indices, all_actions)
+
+    def _step_validation_envs(self, indices, actions):
+        todo, all_obs, all_masks = [], [], []
+        for i, action in zip(indices, actions):
+            obs, _, done, _, info = self.validation_envs[i].step(action)
+            if done:
+                continue
+            todo.append(i)
+            all_obs.append(obs)
+            all_masks.append(info["mask"])
+        return todo, all_obs, all_masks
+
+    def _validation_vecenv(self):
+        if self.validation_vecenv is None:
+            self.validation_vecenv = AsyncValidationVectorEnv(
+                self.validation_envs,
+                self.n_validation_workers,
+                shared_memory=self.graphobs,
+                transport=self.graph_transport,
+            )
+        return self.validation_vecenv
+
+    def close(self):
+        if self.validation_vecenv is not None:
+            self.validation_vecenv.close()
+            self.validation_vecenv = None
+        self.ortools_store.close()
+        self._backfill_ortools_makespans()
+
     def _visdom_metrics(self, agent, alg):
         commandline = " ".join(sys.argv)
         html = f"""
@@ -0,0 +1,180 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import copy
+import multiprocessing
+import multiprocessing.util
+import queue
+from collections import deque
+
+
+class OptimizerSnapshot:
+    def __init__(self, optimizer):
+        # copied, the optimizer state is updated in place by the next updates
+        self._state_dict = copy.deepcopy(optimizer.state_dict())
+
+    def state_dict(self):
+        return self._state_dict
+
+
+class LoggerSnapshot:
+    def __init__(self, logger):
+        self.name_to_value = dict(logger.name_to_value)
+
+
+class AlgSnapshot:
+    """Training state of a PPO read by AgentValidator.validate."""
+
+    def __init__(self, alg):
+        self.global_step = alg.global_step
+        self.start_time = alg.start_time
+        self.n_epochs = alg.n_epochs
+        self.num_envs = alg.num_envs
+        self.num_steps = alg.num_steps
+        self.ent_coef = alg.ent_coef
+        self.vf_coef = alg.vf_coef
+        self.logger = LoggerSnapshot(alg.logger)
+        self.ep_info_buffer = deque(alg.ep_info_buffer)
+        self.optimizer = OptimizerSnapshot(alg.optimizer)
+
+
+def _results(validator):
+    return {
+        "makespan": validator.makespans[-1],
+        "ortools_makespans": {
+            ortools_strategy: makespans[-1]
+            for ortools_strategy, makespans in validator.ortools_makespans.items()
+        },
+        "random_makespan": validator.random_makespans[-1],
+        "custom_makespans": {
+            rule: makespans[-1]
+            for rule, makespans in validator.custom_makespans.items()
+        },
+    }
+
+
+def _history(validator):
+    return {
+        "makespans": validator.makespans,
+        "ortools_makespans": validator.ortools_makespans,
+        "random_makespans": validator.random_makespans,
+        "custom_makespans": validator.custom_makespans,
+    }
+
+
+def _worker(validator, agent, snapshots, results):
+    agent.to(validator.device)
+    while True:
+        snapshot = snapshots.get()
+        if snapshot is None:
+            break
+        update, state_dict, alg = snapshot
+        agent.load_state_dict(state_dict)
+        validator.validate(agent, alg)
+        results.put(("validation", update, _results(validator)))
+    # OR-Tools makespans still pending are filled on close
+    validator.close()
+    results.put(("closed", None, _history(validator)))
+
+
+class AsyncValidator:
+    """
+    Runs the validations of a validator in a separate process, on a copy of the
+    validator and of the agent. Every validation gets a snapshot of the agent weights
+    through a queue of max_pending snapshots: validations submitted while the queue is
+    full are skipped. Results are merged into the validator of this process when
+    polled, with the update their snapshot was taken at.
+    """
+
+    def __init__(self, validator, agent, max_pending=1):
+        self.validator = validator
+        context = multiprocessing.get_context("spawn")
+        self.snapshots = context.Queue(max_pending)
+        self.results = context.Queue()
+        # the agent is copied: pickling moves the parameters of the tensors it sends to
+        # shared memory, which would let the worker load its snapshots into the
+        # weights being trained
+        self.process = context.Process(
+            target=_worker,
+            args=(validator, copy.deepcopy(agent), self.snapshots, self.results),
+        )
+        self.process.start()
+        # not a daemon, as the validator starts its own workers: terminated on exit
+        # if training fails before closing
+        multiprocessing.util.Finalize(self, self.process.terminate, exitpriority=0)
+
+    def submit(self, update, agent, alg):
+        # weights are cloned, the queue pickles them in a background thread
+        state_dict = {
+            k: v.detach().clone().cpu() for k, v in agent.state_dict().items()
+        }
+        try:
+            self.snapshots.put_nowait((update, state_dict, AlgSnapshot(alg)))
+        except queue.Full:
+            return False
+        return True
+
+    def poll(self):
+        # updates of the validations done since the last poll
+        done = []
+        while True:
+            try:
+                message = self.results.get_nowait()
+            except queue.Empty:
+                return done
+            done.append(self._merge(message))
+
+    def close(self):
+        # waits for the submitted validations, returns their updates
+        self.snapshots.put(None)
+        done = []
+        while True:
+            try:
+                message = self.results.get(timeout=1)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    raise Exception("validation process exited before closing")
+                continue
+            if message[0] == "closed":
+                break
+            done.append(self._merge(message))
+        # the history of the worker has every validation, with OR-Tools makespans
+        # that were pending
+        for name, history in message[2].items():
+            setattr(self.validator, name, history)
+        self.process.join()
+        return done
+
+    def _merge(self, message):
+        _, update, results = message
+        self.validator.makespans.append(results["makespan"])
+        for ortools_strategy, makespan in results["ortools_makespans"].items():
+            self.validator.ortools_makespans[ortools_strategy].append(makespan)
+        self.validator.random_makespans.append(results["random_makespan"])
+        for rule, makespan in results["custom_makespans"].items():
+            self.validator.custom_makespans[rule].append(makespan)
+        return update
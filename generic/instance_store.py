@@ -0,0 +1,233 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+# Parsed instances stored in one binary file each: a json header describing the
+# parsed value, followed by its numpy arrays, memory mapped on load. Nested lists of
+# numbers or strings are stored as flat arrays and offsets.
+
+import json
+import multiprocessing
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from generic.ortools_store import content_key
+
+MAGIC = b"WHTINST1"
+# bump when parsers change, so that stale entries are parsed again
+FORMAT_VERSION = 1
+ALIGN = 64
+
+
+def fingerprint(problem_file, parse, *params):
+    with open(problem_file, "rb") as f:
+        data = np.frombuffer(f.read(), dtype=np.uint8)
+    return content_key(
+        FORMAT_VERSION, parse.__module__, parse.__qualname__, list(params), data
+    )
+
+
+def _leaf_kind(x):
+    if isinstance(x, bool):
+        return None
+    if isinstance(x, int):
+        return "int"
+    if isinstance(x, float):
+        return "float"
+    if isinstance(x, str):
+        return "str"
+    return None
+
+
+def _ragged_kind(x):
+    # (depth, leaf kind) if x is a list of lists ... of leaves of a single kind, None
+    # otherwise. Empty lists match any depth and kind.
+    depth, kind = None, None
+    for v in x:
+        if isinstance(v, list):
+            sub = _ragged_kind(v)
+            if sub is None:
+                return None
+            v_depth, v_kind = sub
+            if v_depth is not None:
+                v_depth += 1
+        else:
+            v_depth, v_kind = 1, _leaf_kind(v)
+            if v_kind is None:
+                return None
+        if v_depth is not None:
+            if depth is not None and depth != v_depth:
+                return None
+            depth = v_depth
+        if v_kind is not None:
+            if kind is not None and kind != v_kind:
+                return None
+            kind = v_kind
+    return depth, kind
+
+
+def _flatten(x, depth):
+    offsets = []
+    for _ in range(depth - 1):
+        offsets.append(np.cumsum([0] + [len(v) for v in x], dtype=np.int64))
+        x = [w for v in x for w in v]
+    return offsets, x
+
+
+def _encode(value, arrays):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return {"v": value}
+    if isinstance(value, np.ndarray):
+        arrays.append(value)
+        return {"a": len(arrays) - 1}
+    if isinstance(value, list):
+        ragged = _ragged_kind(value)
+        if ragged is not None and ragged[0] is not None and ragged[1] is not None:
+            depth, kind = ragged
+            offsets, flat = _flatten(value, depth)
+            dtype = {"int": np.int64, "float": np.float64, "str": str}[kind]
+            first = len(arrays)
+            arrays.extend(offsets + [np.array(flat, dtype=dtype)])
+            return {"r": list(range(first, len(arrays)))}
+        return {"l": [_encode(v, arrays) for v in value]}
+    if isinstance(value, tuple):
+        return {"t": [_encode(v, arrays) for v in value]}
+    if isinstance(value, dict):
+        return {"d": [[k, _encode(v, arrays)] for k, v in value.items()]}
+    raise Exception(f"instance value type {type(value)} not recognized")
+
+
+def _unflatten(offsets, values):
+    x = values.tolist()
+    for o in reversed(offsets):
+        o = o.tolist()
+        x = [x[o[i] : o[i + 1]] for i in range(len(o) - 1)]
+    return x
+
+
+def _decode(spec, arrays):
+    if "v" in spec:
+        return spec["v"]
+    if "a" in spec:
+        return arrays[spec["a"]]
+    if "r" in spec:
+        ids = spec["r"]
+        return _unflatten([arrays[i] for i in ids[:-1]], arrays[ids[-1]])
+    if "l" in spec:
+        return [_decode(s, arrays) for s in spec["l"]]
+    if "t" in spec:
+        return tuple(_decode(s, arrays) for s in spec["t"])
+    return {k: _decode(s, arrays) for k, s in spec["d"]}
+
+
+def save_instance(path, value):
+    arrays = []
+    spec = _encode(value, arrays)
+    arrays = [np.ascontiguousarray(a) for a in arrays]
+    offset = 0
+    layout = []
+    for a in arrays:
+        layout.append([a.dtype.str, list(a.shape), offset])
+        offset += -(-a.nbytes // ALIGN) * ALIGN
+    header = json.dumps({"value": spec, "arrays": layout}).encode()
+    start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+    # written to a temporary file then renamed, as concurrent loaders can share the
+    # directory
+    tmp = path + f".{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for a, (_, _, a_offset) in zip(arrays, layout):
+            f.seek(start + a_offset)
+            f.write(a.tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+
+
+def load_instance(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise Exception(f"instance file {path} not recognized")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+    start = -(-(len(MAGIC) + 8 + header_len) // ALIGN) * ALIGN
+    # one copy-on-write mapping of the file: arrays can be modified in memory, the
+    # file is unchanged. Nested lists are decoded to python lists, the mapping is only
+    # kept by the arrays of the value.
+    data = np.memmap(path, dtype=np.uint8, mode="c")
+    arrays = [
+        np.ndarray(tuple(shape), dtype=dtype, buffer=data, offset=start + offset)
+        for dtype, shape, offset in header["arrays"]
+    ]
+    return _decode(header["value"], arrays)
+
+
+def _parse_and_save(path, problem_file, parse, params):
+    save_instance(path, parse(problem_file, *params))
+
+
+class InstanceStore:
+    """
+    Instances parsed by parse(problem_file, *params), stored in directory by
+    fingerprint of the source file, parse function and params. Missing instances are
+    parsed on load, in n_workers processes if n_workers > 0.
+    """
+
+    def __init__(self, directory, n_workers=0):
+        self.directory = directory
+        self.n_workers = n_workers
+
+    def path(self, problem_file, parse, *params):
+        key = fingerprint(problem_file, parse, *params)
+        return os.path.join(self.directory, f"instance_{key}.bin")
+
+    def load(self, problem_file, parse, *params):
+        return self.load_all([problem_file], parse, *params)[0]
+
+    def load_all(self, problem_files, parse, *params):
+        os.makedirs(self.directory, exist_ok=True)
+        paths = [self.path(f, parse, *params) for f in problem_files]
+        missing = [
+            (path, f)
+            for path, f in dict(zip(paths, problem_files)).items()
+            if not os.path.exists(path)
+        ]
+        if self.n_workers > 0 and len(missing) > 1:
+            with ProcessPoolExecutor(
+                self.n_workers, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                futures = [
+                    executor.submit(_parse_and_save, path, f, parse, params)
+                    for path, f in missing
+                ]
+                for future in futures:
+                    future.result()
+        else:
+            for path, f in missing:
+                _parse_and_save(path, f, parse, params)
+        return [load_instance(path) for path in paths]
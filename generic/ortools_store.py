@@ -0,0 +1,139 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+import hashlib
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+
+
+def _update_digest(h, value):
+    if isinstance(value, torch.Tensor):
+        value = value.numpy()
+    if isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        h.update(str((value.dtype.str, value.shape)).encode())
+        h.update(value.tobytes())
+    elif isinstance(value, (tuple, list)):
+        h.update(f"{type(value).__name__}{len(value)}".encode())
+        for v in value:
+            _update_digest(h, v)
+    else:
+        h.update(pickle.dumps(value, protocol=4))
+
+
+def content_key(*values):
+    """Hex digest of nested tuples / lists of arrays, tensors and picklable values."""
+    h = hashlib.blake2b(digest_size=20)
+    for value in values:
+        _update_digest(h, value)
+    return h.hexdigest()
+
+
+def _path(directory, key):
+    return os.path.join(directory, f"ortools_{key}.pkl")
+
+
+def _save(directory, key, solution):
+    os.makedirs(directory, exist_ok=True)
+    # written to a temporary file then renamed, as concurrent experiments can share
+    # the directory
+    tmp = _path(directory, key) + f".{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(solution, f)
+    os.replace(tmp, _path(directory, key))
+
+
+def _solve_and_save(directory, key, solve, args):
+    solution = solve(*pickle.loads(args))
+    _save(directory, key, solution)
+    return solution
+
+
+class OrToolsStore:
+    """
+    OR-Tools solutions stored by content key, in one pickle file per key in
+    directory. Solutions are computed on call to submit if n_workers is 0, in
+    n_workers background processes otherwise.
+    """
+
+    def __init__(self, directory, n_workers=0):
+        self.directory = directory
+        self.n_workers = n_workers
+        self.solutions = {}
+        self.futures = {}
+        self.executor = None
+        if n_workers > 0:
+            self.executor = ProcessPoolExecutor(
+                n_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def get(self, key, wait=False):
+        # solution of key if it is available (or when it is if wait), None otherwise
+        if key in self.solutions:
+            return self.solutions[key]
+        future = self.futures.get(key)
+        if future is not None:
+            if not wait and not future.done():
+                return None
+            self.solutions[key] = future.result()
+            del self.futures[key]
+        elif os.path.exists(_path(self.directory, key)):
+            with open(_path(self.directory, key), "rb") as f:
+                self.solutions[key] = pickle.load(f)
+        return self.solutions.get(key)
+
+    def submit(self, key, solve, *args):
+        if self.get(key) is not None or key in self.futures:
+            return
+        # solvers work on a copy of the arguments (e.g. they replay solutions on env
+        # states), pickled now as the caller can modify them (e.g. step the env) before
+        # the executor sends them to a worker
+        args = pickle.dumps(args)
+        if self.executor is None:
+            self.solutions[key] = _solve_and_save(self.directory, key, solve, args)
+        else:
+            self.futures[key] = self.executor.submit(
+                _solve_and_save, self.directory, key, solve, args
+            )
+
+    def wait(self):
+        for key in list(self.futures):
+            self.get(key, wait=True)
+
+    def n_pending(self):
+        return len(self.futures)
+
+    def close(self, wait=True):
+        if self.executor is not None:
+            if wait:
+                self.wait()
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,92 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+import mmap
+import os
+import pickle
+import tempfile
+import weakref
+
+import numpy as np
+
+
+class ProblemStore:
+    """
+    Read-only sequence of problems, pickled one after the other in a file that is
+    memory mapped. Pickling a store only sends the file name and the offsets of the
+    problems: processes unpickling it map the same file, and unpickle a problem when
+    it is accessed. The file is removed when the store that created it is closed or
+    garbage collected.
+    """
+
+    def __init__(self, problems, directory=None):
+        fd, self.path = tempfile.mkstemp(
+            prefix="wheatley_problems_", suffix=".bin", dir=directory
+        )
+        offsets = [0]
+        with os.fdopen(fd, "wb") as f:
+            for problem in problems:
+                data = pickle.dumps(problem, protocol=pickle.HIGHEST_PROTOCOL)
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.data = None
+        self.finalizer = weakref.finalize(self, os.remove, self.path)
+        self.map()
+
+    def map(self):
+        if self.offsets[-1] == 0:
+            self.data = b""
+            return
+        with open(self.path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __getstate__(self):
+        return {"path": self.path, "offsets": self.offsets}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self.offsets = state["offsets"]
+        self.finalizer = None
+        # mapped right away, the file stays readable if its creator removes it
+        self.map()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("problem index out of range")
+        return pickle.loads(self.data[self.offsets[i] : self.offsets[i + 1]])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def close(self):
+        if self.finalizer is not None:
+            self.finalizer()
@@ -0,0 +1,91 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+import torch
+
+
+class RaggedCategorical:
+    """
+    Categorical distributions over the segments of a packed logits tensor,
+    segment i being logits[offsets[i] : offsets[i] + lengths[i]] (e.g. the nodes of
+    graph i of a batch). Actions are indices inside their segment. Masked out
+    logits get a zero probability.
+    """
+
+    def __init__(self, logits, lengths, mask=None):
+        self.lengths = lengths.to(logits.device)
+        self.n = len(self.lengths)
+        self.offsets = torch.cumsum(self.lengths, 0) - self.lengths
+        self.segment_ids = torch.repeat_interleave(
+            torch.arange(self.n, device=logits.device), self.lengths
+        )
+        self.mask = mask
+        if mask is not None:
+            HUGE_NEG = torch.tensor(-1e12, dtype=logits.dtype, device=logits.device)
+            logits = torch.where(mask, logits, HUGE_NEG)
+        # segment log softmax
+        logits = (
+            logits - self._segment_reduce(logits.detach(), "amax")[self.segment_ids]
+        )
+        log_norm = torch.log(self._segment_reduce(logits.exp(), "sum"))
+        self.logits = logits - log_norm[self.segment_ids]
+
+    def _segment_reduce(self, values, reduce):
+        return torch.zeros(
+            self.n, dtype=values.dtype, device=values.device
+        ).scatter_reduce(0, self.segment_ids, values, reduce, include_self=False)
+
+    def _segment_argmax(self, values):
+        # first index of the max of each segment
+        positions = torch.arange(len(values), device=values.device)
+        is_max = values == self._segment_reduce(values, "amax")[self.segment_ids]
+        first = self._segment_reduce(
+            torch.where(is_max, positions, len(values)), "amin"
+        )
+        return first - self.offsets
+
+    @property
+    def probs(self):
+        return self.logits.exp()
+
+    def sample(self):
+        # Gumbel-max trick
+        with torch.no_grad():
+            noise = torch.empty_like(self.logits).exponential_().log()
+            return self._segment_argmax(self.logits - noise)
+
+    def mode(self):
+        return self._segment_argmax(self.logits.detach())
+
+    def log_prob(self, action):
+        return self.logits[self.offsets + action.long().to(self.offsets.device)]
+
+    def entropy(self):
+        p_log_p = self.logits * self.probs
+        if self.mask is not None:
+            p_log_p = torch.where(self.mask, p_log_p, 0.0)
+        return -self._segment_reduce(p_log_p, "sum")
@@ -0,0 +1,38 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+# Rendering helpers, imported by the envs when they render: workers do not pay for
+# importing opencv and plotting libraries.
+
+import cv2
+import numpy as np
+import torch
+
+
+def png_to_tensor(png):
+    # (channels, height, width) uint8 tensor of png bytes
+    npimg = np.frombuffer(png, dtype="uint8")
+    cvimg = cv2.imdecode(npimg, cv2.IMREAD_UNCHANGED)
+    return torch.from_numpy(np.transpose(cvimg, (2, 0, 1)))
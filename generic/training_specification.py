@@ -70,6 +70,13 @@ class TrainingSpecification:
         critic_loss,
         debug_net,
         display_gantt,
+        graph_transport="tensor",
+        rollout_arena=False,
+        pipelined_rollouts=False,
+        n_validation_workers=0,
+        async_validation=False,
+        n_ortools_workers=0,
+        ortools_cache_dir=None,
     ):
         self.lr = lr
         self.fe_lr = fe_lr
@@ -78,6 +85,8 @@ class TrainingSpecification:
         self.fixed_validation = fixed_validation
         self.fixed_random_validation = fixed_random_validation
         self.validation_batch_size = validation_batch_size
+        self.n_validation_workers = n_validation_workers
+        self.async_validation = async_validation
         self.validation_freq = validation_freq
         self.display_env = display_env
         self.path = path
@@ -85,6 +94,8 @@ class TrainingSpecification:
         self.ortools_strategy = ortools_strategy
         self.max_time_ortools = max_time_ortools
         self.scaling_constant_ortools = scaling_constant_ortools
+        self.n_ortools_workers = n_ortools_workers
+        self.ortools_cache_dir = ortools_cache_dir
         self.vecenv_type = vecenv_type
         self.validate_on_total_data = validate_on_total_data
         self.optimizer = optimizer
@@ -103,6 +114,9 @@ class TrainingSpecification:
         self.critic_loss = critic_loss
         self.debug_net = debug_net
         self.display_gantt = display_gantt
+        self.graph_transport = graph_transport
+        self.rollout_arena = rollout_arena
+        self.pipelined_rollouts = pipelined_rollouts
 
         if optimizer.lower() == "adam":
             self.optimizer_class = torch.optim.Adam
@@ -130,7 +144,10 @@ class TrainingSpecification:
             f"Number of timesteps (total)       {self.total_timesteps}\n"
             f"Validation frequency:             {self.validation_freq}\n"
             f"Episodes per validation session:  {self.n_validation_env}\n"
+            f"Validation workers:               {self.n_validation_workers}\n"
+            f"Async validation:                 {self.async_validation}\n"
             f"Validate on total data:           {self.validate_on_total_data}\n"
+            f"OR-Tools workers:                 {self.n_ortools_workers}\n"
             f"Optimizer:                        {self.optimizer}\n"
             f"N workers:                        {self.n_workers}\n"
             f"Discount factor (gamma):          {self.gamma}\n"
@@ -150,5 +167,8 @@ class TrainingSpecification:
             f"RPO smoothing:                    {self.rpo_smoothing_param}\n"
             f"Return-based scaling:             {self.return_based_scaling}\n"
             f"Store rollouts on disk:           {self.store_rollouts_on_disk}\n"
+            f"Graph transport:                  {self.graph_transport}\n"
+            f"Rollout arena:                    {self.rollout_arena}\n"
+            f"Pipelined rollouts:               {self.pipelined_rollouts}\n"
             f"Critic loss:                      {self.critic_loss}\n"
         )
@@ -34,12 +34,59 @@ import numpy as np
 import torch
 
 
-def decode_mask(info_mask):
+class PackedMasks:
+    """Action masks of different lengths, concatenated in a single boolean tensor.
+
+    Mask i is values[offsets[i] : offsets[i] + lengths[i]].
+    """
+
+    def __init__(self, values, lengths):
+        self.values = values
+        self.lengths = lengths
+        self.offsets = torch.cumsum(lengths, 0) - lengths
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, indices):
+        if isinstance(indices, slice):
+            indices = range(len(self))[indices]
+        indices = torch.as_tensor(indices, dtype=torch.int64).reshape(-1)
+        lengths = self.lengths[indices]
+        # shift from the position of the values in the new masks to their position
+        # in self.values, for every value
+        shift = torch.repeat_interleave(
+            self.offsets[indices] - (torch.cumsum(lengths, 0) - lengths), lengths
+        )
+        positions = torch.arange(len(shift)) + shift
+        return PackedMasks(self.values[positions], lengths)
+
+    @staticmethod
+    def cat(packed_masks):
+        return PackedMasks(
+            torch.cat([m.values for m in packed_masks]),
+            torch.cat([m.lengths for m in packed_masks]),
+        )
+
+
+def decode_mask(info_mask, n_nodes=None):
     """Add padding to the given list of masks.
 
     The padding is set to False, which means that this extra pad
     is masked as well.
+    If n_nodes is given, masks are instead cut to the number of nodes of their
+    observation and packed.
     """
+    if n_nodes is not None:
+        return PackedMasks(
+            torch.cat(
+                [
+                    torch.as_tensor(mask_[:n], dtype=torch.bool)
+                    for mask_, n in zip(info_mask, n_nodes)
+                ]
+            ),
+            torch.as_tensor(n_nodes, dtype=torch.int64),
+        )
     max_size = max(len(mask_) for mask_ in info_mask)
     info_mask = [
         np.concatenate(
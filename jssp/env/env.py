@@ -70,15 +70,6 @@ class Env(gym.Env):
             * (2 if self.env_specification.add_boolean else 1)
         )
 
-        if self.observe_conflicts_as_cliques:
-            n_conflict_edges = (
-                2
-                * sum(range(self.env_specification.max_n_jobs))
-                * self.env_specification.max_n_machines
-            )
-
-            shape_conflict_edges = (2, n_conflict_edges)
-
         if self.env_specification.max_edges_factor > 0:
             shape = (
                 2,
@@ -106,17 +97,13 @@ class Env(gym.Env):
                         shape=shape,
                         dtype=np.int64,
                     ),
-                    "n_conflict_edges": Discrete(n_conflict_edges),
-                    "conflicts_edges": Box(
-                        low=0,
-                        high=self.env_specification.max_n_nodes,
-                        shape=(2, n_conflict_edges),
-                        dtype=np.int64,
+                    "n_conflict_members": Discrete(
+                        self.env_specification.max_n_nodes + 1
                     ),
-                    "conflicts_edges_machineid": Box(
+                    "conflicts_cliques": Box(
                         low=0,
-                        high=self.env_specification.max_n_machines,
-                        shape=(2, n_conflict_edges),
+                        high=self.env_specification.max_n_nodes,
+                        shape=(2, self.env_specification.max_n_nodes),
                         dtype=np.int64,
                     ),
                 }
@@ -268,6 +255,7 @@ class Env(gym.Env):
             self.deterministic,
             feature_list=self.env_specification.input_list,
             observe_conflicts_as_cliques=self.observe_conflicts_as_cliques,
+            graph_backend=self.env_specification.graph_backend,
         )
 
     def _create_transition_model(self):
@@ -349,8 +337,7 @@ class Env(gym.Env):
             (
                 features,
                 edge_index,
-                conflicts_edges,
-                conflicts_edges_machineid,
+                conflicts_cliques,
             ) = self.state.to_features_and_edge_index(
                 self.env_specification.normalize_input,
                 self.env_specification.input_list,
@@ -368,8 +355,7 @@ class Env(gym.Env):
                 self.n_machines,
                 features,
                 edge_index,
-                conflicts_edges,
-                conflicts_edges_machineid,
+                conflicts_cliques,
                 self.env_specification.max_n_jobs,
                 self.env_specification.max_n_machines,
                 self.env_specification.max_edges_factor,
@@ -392,7 +378,6 @@ class Env(gym.Env):
                 features,
                 edge_index,
                 None,
-                None,
                 self.env_specification.max_n_jobs,
                 self.env_specification.max_n_machines,
                 self.env_specification.max_edges_factor,
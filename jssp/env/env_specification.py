@@ -39,6 +39,7 @@ class EnvSpecification:
         observe_conflicts_as_cliques,
         observe_real_duration_when_affect,
         do_not_observe_updated_bounds,
+        graph_backend="networkx",
     ):
         self.max_n_jobs = max_n_jobs
         self.max_n_machines = max_n_machines
@@ -61,6 +62,7 @@ class EnvSpecification:
         self.observe_conflicts_as_cliques = observe_conflicts_as_cliques
         self.observe_real_duration_when_affect = observe_real_duration_when_affect
         self.do_not_observe_updated_bounds = do_not_observe_updated_bounds
+        self.graph_backend = graph_backend
 
     def get_n_features(self):
         # 4 for task completion times, 1 for is_affected, max_n_machines for mandatory one_hot_machine_id
@@ -87,6 +89,7 @@ class EnvSpecification:
             f"Insertion mode:                     {self.insertion_mode.lower().title().replace('_', ' ')}\n"
             f"Observe real duration when affect:  {self.observe_real_duration_when_affect}\n"
             f"Do not observe tct:                 {self.do_not_observe_updated_bounds}\n"
+            f"Precedence graph backend:           {self.graph_backend}\n"
             f"List of features:\n - Task Completion Times\n - Machine Id"
         )
         print(" - " + "\n - ".join(print_input_list) + "\n")
@@ -35,8 +35,7 @@ class EnvObservation:
         n_machines,
         features,
         edge_index,
-        conflicts_edges,
-        conflicts_edges_machineid,
+        conflicts_cliques,
         max_n_jobs,
         max_n_machines,
         max_edges_factor,
@@ -48,7 +47,7 @@ class EnvObservation:
         if features.is_cuda:
             raise Exception("Please provide a cpu observation")
 
-        if conflicts_edges is None:
+        if conflicts_cliques is None:
             self.observe_conflicts_as_cliques = False
         else:
             self.observe_conflicts_as_cliques = True
@@ -68,9 +67,9 @@ class EnvObservation:
         self.edge_index = edge_index
 
         if self.observe_conflicts_as_cliques:
-            self.conflicts_edges = conflicts_edges
-            self.n_conflict_edges = conflicts_edges.shape[1]
-            self.conflicts_edges_machineid = conflicts_edges_machineid
+            # tasks grouped by machine, edges are built on the agent side
+            self.conflicts_cliques = conflicts_cliques
+            self.n_conflict_members = conflicts_cliques.shape[1]
 
         assert self.n_nodes == self.features.shape[0]
 
@@ -93,16 +92,8 @@ class EnvObservation:
         edge_index[:, 0 : self.get_n_edges()] = self.edge_index
 
         if self.observe_conflicts_as_cliques:
-            conflicts_edges = torch.empty(
-                (2, 2 * sum(range(self.max_n_jobs)) * self.max_n_machines)
-            )
-            conflicts_edges[:, 0 : self.conflicts_edges.shape[1]] = self.conflicts_edges
-            conflicts_edges_machineid = torch.empty(
-                (2, 2 * sum(range(self.max_n_jobs)) * self.max_n_machines)
-            )
-            conflicts_edges_machineid[
-                :, : self.conflicts_edges_machineid.shape[0]
-            ] = self.conflicts_edges_machineid.unsqueeze(0)
+            conflicts_cliques = np.zeros((2, self.max_n_nodes))
+            conflicts_cliques[:, 0 : self.n_conflict_members] = self.conflicts_cliques
 
             return {
                 "n_jobs": self.n_jobs,
@@ -111,11 +102,8 @@ class EnvObservation:
                 "n_edges": self.n_edges,
                 "features": features.numpy(),
                 "edge_index": edge_index.astype("int64"),
-                "n_conflict_edges": self.n_conflict_edges,
-                "conflicts_edges": conflicts_edges.numpy().astype("int64"),
-                "conflicts_edges_machineid": conflicts_edges_machineid.numpy().astype(
-                    "int64"
-                ),
+                "n_conflict_members": self.n_conflict_members,
+                "conflicts_cliques": conflicts_cliques.astype("int64"),
             }
         else:
             return {
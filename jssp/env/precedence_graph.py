@@ -0,0 +1,218 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+import numpy as np
+
+GRAPH_BACKENDS = ["networkx", "array"]
+
+
+class ArrayPrecedenceGraph:
+    """
+    Precedence graph stored as numpy adjacency rows, a drop-in replacement for the
+    subset of networkx.DiGraph used by the JSSP State.
+
+    Every node owns a row of fixed capacity in self.succ and self.pred (ELL layout, ie
+    CSR with constant row stride), filled from the left and padded with -1. In a job
+    shop schedule every task has at most one job successor and one machine successor,
+    so the default capacity of 2 per row holds the whole disjunctive graph without
+    reallocation ; rows are doubled if a caller ever goes beyond.
+
+    Edges added after construction are also logged in insertion order into a
+    preallocated [edge_capacity, 2] buffer, so that the State can build its edge_index
+    without going through python lists.
+    """
+
+    def __init__(self, n_nodes, edges=None, max_degree=2, edge_capacity=None):
+        self.n_nodes = n_nodes
+        self.succ = np.full((n_nodes, max_degree), -1, dtype=np.int64)
+        self.pred = np.full((n_nodes, max_degree), -1, dtype=np.int64)
+        self.n_succ = np.zeros(n_nodes, dtype=np.int64)
+        self.n_pred = np.zeros(n_nodes, dtype=np.int64)
+        if edges is not None:
+            self.add_edges_from(edges)
+        if edge_capacity is None:
+            edge_capacity = n_nodes
+        self.edge_log = np.empty((max(edge_capacity, 1), 2), dtype=np.int64)
+        self.n_logged_edges = 0
+
+    @property
+    def nodes(self):
+        return range(self.n_nodes)
+
+    def number_of_edges(self):
+        return int(self.n_succ.sum())
+
+    def successors(self, node):
+        return self.succ[node, : self.n_succ[node]].tolist()
+
+    def predecessors(self, node):
+        return self.pred[node, : self.n_pred[node]].tolist()
+
+    def has_edge(self, first, second):
+        return second in self.successors(first)
+
+    def _grow(self):
+        width = self.succ.shape[1]
+        pad = np.full((self.n_nodes, width), -1, dtype=np.int64)
+        self.succ = np.concatenate([self.succ, pad], axis=1)
+        self.pred = np.concatenate([self.pred, pad], axis=1)
+
+    def add_edges_from(self, edges):
+        # not logged, these are the initial edges of the graph
+        edges = np.unique(np.asarray(edges, dtype=np.int64).reshape(-1, 2), axis=0)
+        if self.number_of_edges() > 0:
+            for first, second in edges:
+                self._add_adjacency(first, second)
+            return
+        # empty graph (State.reset): fill all rows at once
+        self.n_succ[:] = np.bincount(edges[:, 0], minlength=self.n_nodes)
+        self.n_pred[:] = np.bincount(edges[:, 1], minlength=self.n_nodes)
+        while max(self.n_succ.max(initial=0), self.n_pred.max(initial=0)) > (
+            self.succ.shape[1]
+        ):
+            self._grow()
+        self._fill_rows(self.succ, self.n_succ, edges[:, 0], edges[:, 1])
+        self._fill_rows(self.pred, self.n_pred, edges[:, 1], edges[:, 0])
+
+    @staticmethod
+    def _fill_rows(rows, counts, keys, values):
+        order = np.argsort(keys, kind="stable")
+        keys, values = keys[order], values[order]
+        starts = np.cumsum(counts) - counts
+        rows[keys, np.arange(keys.shape[0]) - starts[keys]] = values
+
+    def add_edge(self, first, second):
+        if self.n_logged_edges == self.edge_log.shape[0]:
+            self.edge_log = np.concatenate(
+                [self.edge_log, np.empty_like(self.edge_log)]
+            )
+        self.edge_log[self.n_logged_edges] = (first, second)
+        self.n_logged_edges += 1
+        self._add_adjacency(first, second)
+
+    def _add_adjacency(self, first, second):
+        if self.has_edge(first, second):
+            return
+        if (
+            self.n_succ[first] == self.succ.shape[1]
+            or self.n_pred[second] == self.pred.shape[1]
+        ):
+            self._grow()
+        self.succ[first, self.n_succ[first]] = second
+        self.n_succ[first] += 1
+        self.pred[second, self.n_pred[second]] = first
+        self.n_pred[second] += 1
+
+    @staticmethod
+    def _remove_from_row(rows, counts, node, value):
+        n = counts[node]
+        pos = np.flatnonzero(rows[node, :n] == value)
+        if pos.size == 0:
+            raise KeyError(f"edge involving {value} not in graph")
+        # swap with last used slot to keep the row packed
+        rows[node, pos[0]] = rows[node, n - 1]
+        rows[node, n - 1] = -1
+        counts[node] -= 1
+
+    def remove_edge(self, first, second):
+        self._remove_from_row(self.succ, self.n_succ, first, second)
+        self._remove_from_row(self.pred, self.n_pred, second, first)
+        log = self.edge_log[: self.n_logged_edges]
+        pos = np.flatnonzero((log[:, 0] == first) & (log[:, 1] == second))
+        if pos.size > 0:
+            # keep insertion order of the remaining edges
+            log[pos[0] : -1] = log[pos[0] + 1 :].copy()
+            self.n_logged_edges -= 1
+
+    def logged_edges(self):
+        """
+        Returns a [n_edges, 2] view of the edges added since construction, in
+        insertion order.
+        """
+        return self.edge_log[: self.n_logged_edges]
+
+    def _bfs(self, node, target=None):
+        # walks the graph one whole BFS level at a time ; seen has an extra always
+        # True slot so that -1 paddings of the rows are filtered out with seen nodes
+        seen = np.zeros(self.n_nodes + 1, dtype=bool)
+        seen[-1] = True
+        frontier = self.succ[node, : self.n_succ[node]]
+        while frontier.size > 0:
+            seen[frontier] = True
+            if target is not None and seen[target]:
+                break
+            frontier = self.succ[frontier].ravel()
+            frontier = frontier[~seen[frontier]]
+            if frontier.size > self.n_nodes:
+                # several paths can reach a node within the same level
+                frontier = np.unique(frontier)
+        return seen[:-1]
+
+    def descendants(self, node):
+        """
+        Returns the set of nodes reachable from node.
+        """
+        return set(np.flatnonzero(self._bfs(node)).tolist())
+
+    def has_path(self, source, target):
+        if source == target:
+            return True
+        return bool(self._bfs(source, target)[target])
+
+    def topological_levels(self, root=None):
+        """
+        Yields arrays of nodes, every node coming after all of its predecessors. If root
+        is given, only root and its descendants are visited, otherwise the whole graph.
+        """
+        if root is None:
+            in_cone = np.ones(self.n_nodes + 1, dtype=bool)
+            frontier = np.flatnonzero(self.n_pred == 0)
+        else:
+            in_cone = np.zeros(self.n_nodes + 1, dtype=bool)
+            in_cone[:-1] = self._bfs(root)
+            in_cone[root] = True
+            frontier = np.array([root], dtype=np.int64)
+        # last slot stands for -1 paddings, never part of the explored subgraph
+        in_cone[-1] = False
+        # number of predecessors not yet yielded, restricted to the explored subgraph
+        n_waiting = in_cone[self.pred].sum(axis=1)
+        while frontier.size > 0:
+            yield frontier
+            succ = self.succ[frontier].ravel()
+            succ = succ[in_cone[succ]]
+            n_waiting -= np.bincount(succ, minlength=self.n_nodes)
+            frontier = succ[n_waiting[succ] == 0]
+            if frontier.size > 1:
+                # nodes with several predecessors in the previous level
+                frontier = np.unique(frontier)
+
+    def to_edge_array(self):
+        """
+        Returns all edges as a [n_edges, 2] array, rows ordered by source node.
+        """
+        src = np.repeat(np.arange(self.n_nodes), self.n_succ)
+        mask = np.arange(self.succ.shape[1])[None, :] < self.n_succ[:, None]
+        return np.stack([src, self.succ[mask]], axis=1)
@@ -29,17 +29,14 @@ from copy import deepcopy
 from pathlib import Path
 from queue import PriorityQueue
 
-import cv2
-import matplotlib.pyplot as plt
 import networkx as nx
 import numpy as np
-import pandas as pd
-import plotly.figure_factory as ff
 import torch
 
+from jssp.env.precedence_graph import GRAPH_BACKENDS, ArrayPrecedenceGraph
 from jssp.solution import Solution
 from jssp.utils.utils import (
-    compute_conflicts_cliques,
+    compact_conflicts_cliques,
     job_and_task_to_node,
     node_to_job_and_task,
 )
@@ -56,6 +53,7 @@ class State:
         deterministic=True,
         feature_list=[],
         observe_conflicts_as_cliques=False,
+        graph_backend="networkx",
     ):
         self.affectations = affectations
         self.original_durations = durations.copy()
@@ -67,10 +65,6 @@ class State:
         self.max_n_jobs = max_n_jobs
         self.max_n_machines = max_n_machines
 
-        # no more one hot due to perf issues when adding conflcits as cliques
-        self.not_one_hot_machine_id = np.zeros((max_n_machines, max_n_machines))
-        for i in range(max_n_machines):
-            self.not_one_hot_machine_id[i][:] = i
         self.one_hot_machine_id = np.zeros((max_n_machines, max_n_machines))
         for i in range(max_n_machines):
             self.one_hot_machine_id[i][i] = 1
@@ -79,6 +73,9 @@ class State:
 
         self.colors = self.generate_colors()
 
+        if graph_backend not in GRAPH_BACKENDS:
+            raise Exception(f"Graph backend {graph_backend} not recognized")
+        self.graph_backend = graph_backend
         self.graph = None
 
         # cache
@@ -168,31 +165,18 @@ class State:
 
     # no more one hot due to perf issues when adding conflcits as cliques
     def set_not_one_hot_machine_id(self):
-        self.features[:, 6 : 6 + self.max_n_machines] = (
-            torch.zeros(self.max_n_machines) - 1
+        # machine id repeated on all columns, -1 for missing tasks
+        self.features[:, 6 : 6 + self.max_n_machines] = torch.as_tensor(
+            self.affectations.reshape(-1, 1), dtype=torch.float
         )
-        for job_id in range(self.n_jobs):
-            for task_id in range(self.n_machines):
-                machine_id = self.affectations[job_id, task_id]
-                node_id = job_and_task_to_node(job_id, task_id, self.n_machines)
-                if machine_id != -1:
-                    self.features[
-                        node_id, 6 : 6 + self.max_n_machines
-                    ] = torch.as_tensor(self.not_one_hot_machine_id[machine_id])
 
     def set_one_hot_machine_id(self):
-        for job_id in range(self.n_jobs):
-            for task_id in range(self.n_machines):
-                machine_id = self.affectations[job_id, task_id]
-                node_id = job_and_task_to_node(job_id, task_id, self.n_machines)
-                if machine_id == -1:
-                    self.features[node_id, 6 : 6 + self.max_n_machines] = torch.zeros(
-                        self.max_n_machines
-                    )
-                else:
-                    self.features[
-                        node_id, 6 : 6 + self.max_n_machines
-                    ] = torch.as_tensor(self.one_hot_machine_id[machine_id])
+        machine_ids = self.affectations.reshape(-1)
+        one_hot_machine_id = self.one_hot_machine_id[machine_ids]
+        one_hot_machine_id[machine_ids == -1] = 0
+        self.features[:, 6 : 6 + self.max_n_machines] = torch.as_tensor(
+            one_hot_machine_id
+        )
 
     def reset_durations(self):
         self.durations = self.original_durations.copy()
@@ -226,8 +210,15 @@ class State:
             for job_index in range(self.n_jobs)
         ]
 
-        self.graph = nx.DiGraph(self.edges)
-        self.numpy_edges = np.array(self.edges)
+        if self.graph_backend == "array":
+            self.graph = ArrayPrecedenceGraph(
+                self.n_nodes,
+                self.edges,
+                edge_capacity=self.max_n_jobs * self.max_n_machines,
+            )
+        else:
+            self.graph = nx.DiGraph(self.edges)
+        self.numpy_edges = np.array(self.edges, dtype=np.int64).reshape(-1, 2)
         self.edges = []
 
         self.reset_durations()
@@ -240,27 +231,20 @@ class State:
         self.compute_pre_features()
 
     def compute_conflicts_cliques(self):
-        (
-            self.conflicts_edges,
-            self.conflicts_edges_machineid,
-        ) = compute_conflicts_cliques(self.features[:, 6].long())
+        # cliques only depend on affectations, they are computed once per problem
+        self.conflicts_cliques = compact_conflicts_cliques(self.features[:, 6].long())
 
     def compute_pre_features(self):
         self.total_job_time = np.sum(
             np.where(self.original_durations < 0, 0, self.original_durations), axis=1
         )
-        for job_id in range(self.n_jobs):
-            if (self.durations[job_id, :, 0] == -1).any():
-                self.total_job_time[job_id, 0] = -1
+        self.total_job_time[(self.durations[:, :, 0] == -1).any(axis=1), 0] = -1
         self.total_job_time = torch.as_tensor(self.total_job_time, dtype=torch.float)
 
         of = self.features_offset["selectable"]
         self.features[:, of[0] : of[1]] = 0
-        for j in range(self.n_jobs):
-            if self.affectations[j, 0] != -1:
-                self.features[
-                    job_and_task_to_node(j, 0, self.n_machines), of[0] : of[1]
-                ] = 1
+        first_nodes = np.flatnonzero(self.affectations[:, 0] != -1) * self.n_machines
+        self.features[first_nodes, of[0] : of[1]] = 1
 
         if "total_job_time" in self.features_offset:
             tjtof = self.features_offset["total_job_time"]
@@ -269,40 +253,23 @@ class State:
             ).reshape((self.n_jobs * self.max_n_machines, 4))
             self.features[:, tjtof[0] : tjtof[1]] = torch.as_tensor(bc)
 
-        self.total_machine_time = torch.zeros((self.n_machines, 4))
-        for job_id in range(self.n_jobs):
-            for task_id in range(self.n_machines):
-                if self.affectations[job_id, task_id] != -1:
-                    if (
-                        self.total_machine_time[self.affectations[job_id, task_id]][0]
-                        == -1
-                        or self.durations[job_id, task_id][0] == -1
-                    ):
-                        self.total_machine_time[
-                            self.affectations[job_id, task_id]
-                        ] += self.durations[job_id, task_id]
-                        self.total_machine_time[self.affectations[job_id, task_id]][
-                            0
-                        ] = -1
-                    else:
-                        self.total_machine_time[
-                            self.affectations[job_id, task_id]
-                        ] += self.durations[job_id, task_id]
-
-        self.total_machine_time_job_task = torch.zeros(
-            (self.n_jobs, self.n_machines, 4)
-        )
-        for job_id in range(self.n_jobs):
-            for task_id in range(self.n_machines):
-                self.total_machine_time_job_task[
-                    job_id, task_id
-                ] = self.total_machine_time[self.affectations[job_id, task_id]]
-                if "total_machine_time" in self.features_offset:
-                    tmtof = self.features_offset["total_machine_time"]
-                    self.features[
-                        job_and_task_to_node(job_id, task_id, self.n_machines),
-                        tmtof[0] : tmtof[1],
-                    ] = self.total_machine_time[self.affectations[job_id, task_id]]
+        # scatter add of durations per machine, tasks taken in (job, task) order
+        is_task = self.affectations != -1
+        machine_ids = self.affectations[is_task]
+        total_machine_time = np.zeros((self.n_machines, 4), dtype=np.float32)
+        np.add.at(total_machine_time, machine_ids, self.durations[is_task])
+        # real total is unknown if one of the real durations is unknown
+        total_machine_time[machine_ids[self.durations[is_task][:, 0] == -1], 0] = -1
+        self.total_machine_time = torch.as_tensor(total_machine_time)
+
+        # missing tasks (machine -1) get the values of the last machine
+        affectations = torch.as_tensor(self.affectations, dtype=torch.long)
+        self.total_machine_time_job_task = self.total_machine_time[affectations]
+        if "total_machine_time" in self.features_offset:
+            tmtof = self.features_offset["total_machine_time"]
+            self.features[
+                :, tmtof[0] : tmtof[1]
+            ] = self.total_machine_time_job_task.reshape(-1, 4)
 
         self.job_completion_time = torch.zeros((self.n_jobs, 4))
 
@@ -319,30 +286,17 @@ class State:
 
         self.machine_completion_time = torch.zeros((self.n_machines, 4))
 
-        self.machine_completion_time_job_task = torch.zeros(
-            (self.n_jobs, self.n_machines, 4)
-        )
-        for job_id in range(self.n_jobs):
-            for task_id in range(self.n_machines):
-                self.machine_completion_time_job_task[
-                    job_id, task_id
-                ] = self.machine_completion_time[self.affectations[job_id, task_id]]
-                if "machine_completion_percentage" in self.features_offset:
-                    mcpof = self.features_offset["machine_completion_percentage"]
-                    result = (
-                        self.machine_completion_time_job_task[job_id, task_id]
-                        / self.total_machine_time_job_task[job_id, task_id]
-                    )
-                    result[result != result] = 0
-                    self.features[
-                        job_and_task_to_node(job_id, task_id, self.n_machines),
-                        mcpof[0] : mcpof[1],
-                    ] = result
-                    if self.total_machine_time_job_task[job_id, task_id][0] < 0:
-                        self.features[
-                            job_and_task_to_node(job_id, task_id, self.n_machines),
-                            mcpof[0],
-                        ] = -1
+        self.machine_completion_time_job_task = self.machine_completion_time[
+            affectations
+        ]
+        if "machine_completion_percentage" in self.features_offset:
+            mcpof = self.features_offset["machine_completion_percentage"]
+            result = (
+                self.machine_completion_time_job_task / self.total_machine_time_job_task
+            ).reshape(-1, 4)
+            result[result != result] = 0
+            result[self.total_machine_time_job_task.reshape(-1, 4)[:, 0] < 0, 0] = -1
+            self.features[:, mcpof[0] : mcpof[1]] = result
 
         if "mopnr" in self.features_offset:
             mopnr = np.sum(self.affectations != -1, axis=1)
@@ -470,7 +424,11 @@ class State:
 
         features = self.normalize_features(normalize_input)
 
-        if not self.edges:
+        if self.graph_backend == "array":
+            edge_index = np.transpose(
+                np.concatenate([self.numpy_edges, self.graph.logged_edges()])
+            )
+        elif not self.edges:
             edge_index = np.transpose(self.numpy_edges)
         else:
             edge_index = np.transpose(
@@ -478,12 +436,7 @@ class State:
             )
 
         if self.observe_conflicts_as_cliques:
-            return (
-                features,
-                edge_index,
-                self.conflicts_edges,
-                self.conflicts_edges_machineid,
-            )
+            return features, edge_index, self.conflicts_cliques
         return features, edge_index
 
     def observe_real_duration(
@@ -545,6 +498,11 @@ class State:
         return new_completion_time
 
     def update_completion_times_from_sinks(self):
+        if self.graph_backend == "array":
+            self.propagate_completion_times(
+                self.graph.topological_levels(), sources_from_durations=True
+            )
+            return
         sinks = []
         nodes = list(self.graph.nodes)
         for n in nodes:
@@ -562,6 +520,9 @@ class State:
             self.update_completion_times_from(sink)
 
     def update_completion_times_in_order(self):
+        if self.graph_backend == "array":
+            self.propagate_completion_times(self.graph.topological_levels())
+            return
         priority_queue = PriorityQueue()
         nodes = list(self.graph.nodes)
         for n in nodes:
@@ -569,7 +530,7 @@ class State:
             if not predecessors:
                 priority_queue.put((0, n))
         while not priority_queue.empty():
-            (distance, cur_node_id) = priority_queue.get()
+            distance, cur_node_id = priority_queue.get()
             predecessors = list(self.graph.predecessors(cur_node_id))
 
             if len(predecessors) == 0:
@@ -607,11 +568,19 @@ class State:
         successors, ordered by their distance to the original node, choosing each time
         the max completion time of predecessors as starting time
         """
+        if self.graph_backend == "array":
+            if rec:
+                levels = self.graph.topological_levels(node_id)
+            else:
+                levels = [np.array([node_id])]
+            self.propagate_completion_times(levels, only_if_updated=True)
+            return
+
         priority_queue = PriorityQueue()
         priority_queue.put((0, node_id))
 
         while not priority_queue.empty():
-            (distance, cur_node_id) = priority_queue.get()
+            distance, cur_node_id = priority_queue.get()
             predecessors = list(self.graph.predecessors(cur_node_id))
 
             if len(predecessors) == 0:
@@ -652,21 +621,90 @@ class State:
                 for successor in self.graph.successors(cur_node_id):
                     priority_queue.put((distance + 1, successor))
 
+    def propagate_completion_times(
+        self, levels, only_if_updated=False, sources_from_durations=False
+    ):
+        """
+        Vectorized version of the above updates for the array graph backend : levels
+        yields arrays of nodes in topological order (see
+        ArrayPrecedenceGraph.topological_levels), all nodes of a level are updated at
+        once from their predecessors.
+        If only_if_updated, nodes after the first level are only recomputed if one of
+        their predecessors changed, as update_completion_times does.
+        If sources_from_durations, nodes without predecessors get their durations as
+        completion times, as update_completion_times_from_sinks does.
+        """
+        features = self.features.numpy()
+        if "duration" in self.features_offset:
+            dof = self.features_offset["duration"]
+            durations = features[:, dof[0] : dof[1]]
+        else:
+            durations = self.durations.reshape(-1, 4)
+        is_observed = self.is_observed.reshape(-1)
+        # last row stands for -1 paddings of predecessor rows, never the max
+        tct = np.full((self.n_nodes + 1, 4), -np.inf, dtype=features.dtype)
+        tct[:-1] = features[:, 1:5]
+        updated = np.zeros(self.n_nodes + 1, dtype=bool)
+        # number of edges going out of updated nodes towards nodes not yet visited
+        n_pending = 0
+
+        for i, nodes in enumerate(levels):
+            preds = self.graph.pred[nodes]
+            if only_if_updated and i > 0:
+                todo = updated[preds]
+                n_pending -= todo.sum()
+                todo = todo.any(axis=1)
+                nodes, preds = nodes[todo], preds[todo]
+            tct_pred = tct[preds]
+            # max of predecessors for each features (real, min, max and mode)
+            max_tct_pred = tct_pred.max(axis=1)
+            # predecessor rows are packed from the left
+            sources = preds[:, 0] < 0
+            max_tct_pred[sources] = 0
+            # if one of the predecessors has an undefined end time, real is undefined
+            max_tct_pred[(tct_pred == -1).any(axis=(1, 2)), 0] = -1
+
+            new_tct = max_tct_pred + durations[nodes].astype(tct.dtype)
+            # if there is any uncertainty, we remove the real duration value
+            new_tct[(max_tct_pred[:, 0] == -1) | (is_observed[nodes] == 0), 0] = -1
+            if sources_from_durations:
+                new_tct[sources] = durations[nodes[sources]]
+
+            if only_if_updated:
+                changed = (new_tct != tct[nodes]).any(axis=1)
+                updated[nodes] = changed
+                n_pending += self.graph.n_succ[nodes[changed]].sum()
+                tct[nodes] = new_tct
+                if n_pending == 0:
+                    # nothing left to propagate in the rest of the cone
+                    break
+            else:
+                tct[nodes] = new_tct
+
+        features[:, 1:5] = tct[:-1]
+
     def set_precedency(self, first_node_id, second_node_id, do_update=True):
         """
         Check if possible to add an edge between first_node and second_node. Then add it
         and updates all other attributes of the State related to the graph.
         """
         # First check that second_node is not scheduled before first node
-        nodes_after_second_node = nx.algorithms.descendants(self.graph, second_node_id)
-        if first_node_id in nodes_after_second_node:
-            return False
+        if self.graph_backend == "array":
+            if self.graph.has_path(second_node_id, first_node_id):
+                return False
+        else:
+            nodes_after_second_node = nx.algorithms.descendants(
+                self.graph, second_node_id
+            )
+            if first_node_id in nodes_after_second_node:
+                return False
         # Also check that first and second node ids are not the same
         if first_node_id == second_node_id:
             return False
         # Then add the node into the graph
         self.graph.add_edge(first_node_id, second_node_id)
-        self.edges.append((first_node_id, second_node_id))
+        if self.graph_backend == "networkx":
+            self.edges.append((first_node_id, second_node_id))
 
         # Finally update the task starting times
         if do_update:
@@ -675,7 +713,8 @@ class State:
 
     def remove_precedency(self, first_node_id, second_node_id):
         self.graph.remove_edge(first_node_id, second_node_id)
-        self.edges.remove((first_node_id, second_node_id))
+        if self.graph_backend == "networkx":
+            self.edges.remove((first_node_id, second_node_id))
         return True
 
     def node_same_job(self, jid):
@@ -988,30 +1027,11 @@ class State:
                 dict_op["Resource"] = "Machine {}".format(self.affectations[job][i])
                 df.append(dict_op)
                 i += 1
-        fig = None
-        if len(df) > 0:
-            df = pd.DataFrame(df)
-            fig = ff.create_gantt(
-                df,
-                index_col="Resource",
-                colors=self.colors,
-                show_colorbar=True,
-                group_tasks=True,
-            )
-            if fig is not None:
-                fig.update_yaxes(
-                    autorange="reversed"
-                )  # otherwise tasks are listed from the bottom
-                figimg = fig.to_image(format="png")
-                npimg = np.fromstring(figimg, dtype="uint8")
-                cvimg = cv2.imdecode(npimg, cv2.IMREAD_UNCHANGED)
-                npimg = np.transpose(cvimg, (2, 0, 1))
-                torchimg = torch.from_numpy(npimg)
-                return torchimg
-            else:
-                return None
-        else:
+        if len(df) == 0:
             return None
+        from jssp.utils.render import render_gantt
+
+        return render_gantt(df, self.colors)
 
     def display(self, fname="state.png"):
         print("affectation\n", self.affectations)
@@ -1064,6 +1084,7 @@ class State:
         deterministic=True,
         feature_list=[],
         observe_conflicts_as_cliques=False,
+        graph_backend="networkx",
     ) -> "State":
         """Create a state from an instance file.
         The instance file must be a numpy file (.npz) containing the tuple
@@ -1079,5 +1100,6 @@ class State:
                 deterministic,
                 feature_list,
                 observe_conflicts_as_cliques,
+                graph_backend,
             )
         return state
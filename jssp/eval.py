@@ -30,6 +30,7 @@ def load_agent(args: argparse.Namespace, path: str) -> Agent:
         and args.precompute_cliques,
         observe_real_duration_when_affect=args.observe_duration_when_affect,
         do_not_observe_updated_bounds=args.do_not_observe_updated_bounds,
+        graph_backend=args.graph_backend,
     )
     agent_specification = AgentSpecification(
         n_features=env_specification.n_features,
@@ -191,6 +192,7 @@ def eval_on_instances(agent: Agent, instances: dict, args: argparse.Namespace) -
                 deterministic=problem_description.deterministic,
                 feature_list=env_specification.input_list,
                 observe_conflicts_as_cliques=env_specification.observe_conflicts_as_cliques,
+                graph_backend=env_specification.graph_backend,
             )
             validation_envs.append(env)
 
@@ -28,13 +28,21 @@ import torch
 from generic.tokengt.utils import get_laplacian_pe_simple
 from jssp.utils.utils import (
     compute_conflicts_cliques,
+    expand_conflicts_cliques,
     put_back_one_hot_encoding_unbatched,
 )
 import dgl
+import hashlib
 import time
+from collections import OrderedDict
 
 
 class AgentObservation:
+    # conflict edges by cliques digest, cliques being the same for all the
+    # observations of a problem
+    conflicts_cliques_cache = OrderedDict()
+    conflicts_cliques_cache_size = 1000
+
     def __init__(self, graphs, glist=False):
         self.graphs = graphs
         self.glist = glist
@@ -77,6 +85,19 @@ class AgentObservation:
 
         return torch.max(machine_one_hot, dim=1)
 
+    @classmethod
+    def expand_conflicts_cliques(cls, cliques):
+        key = hashlib.blake2b(cliques.numpy().tobytes(), digest_size=16).digest()
+        expanded = cls.conflicts_cliques_cache.get(key)
+        if expanded is None:
+            expanded = expand_conflicts_cliques(cliques)
+            cls.conflicts_cliques_cache[key] = expanded
+            while len(cls.conflicts_cliques_cache) > cls.conflicts_cliques_cache_size:
+                cls.conflicts_cliques_cache.popitem(last=False)
+        else:
+            cls.conflicts_cliques_cache.move_to_end(key)
+        return expanded
+
     @classmethod
     def add_conflicts_cliques2(cls, g, cedges, mid, mid_in_edges):
         if mid_in_edges:
@@ -142,19 +163,26 @@ class AgentObservation:
             # orig_feat = put_back_one_hot_encoding_unbatched(orig_feat, max_n_machines)
             orig_feat = orig_feat.to(torch.device("cpu"))
         else:
-            if "n_conflict_edges" in gym_observation:  # precomputed cliques
-                n_conflict_edges = (
-                    gym_observation["n_conflict_edges"].long().to(torch.device("cpu"))
+            if "n_conflict_members" in gym_observation:  # precomputed cliques
+                n_conflict_members = (
+                    gym_observation["n_conflict_members"].long().to(torch.device("cpu"))
                 )
-
-                conflicts_edges = (
-                    gym_observation["conflicts_edges"].long().to(torch.device("cpu"))
-                )
-                conflicts_edges_machineid = (
-                    gym_observation["conflicts_edges_machineid"]
-                    .long()
-                    .to(torch.device("cpu"))
+                conflicts_cliques = (
+                    gym_observation["conflicts_cliques"].long().to(torch.device("cpu"))
                 )
+                conflicts_edges = []
+                conflicts_edges_machineid = []
+                all_nce = []
+                for i in range(orig_feat.shape[0]):
+                    ce, cemid = cls.expand_conflicts_cliques(
+                        conflicts_cliques[i, :, : n_conflict_members[i].item()]
+                    )
+                    conflicts_edges.append(ce)
+                    conflicts_edges_machineid.append(
+                        cemid.unsqueeze(0).expand(ce.shape)
+                    )
+                    all_nce.append(torch.LongTensor([ce.shape[1]]))
+                n_conflict_edges = torch.cat(all_nce)
                 orig_feat = orig_feat.to(torch.device("cpu"))
             else:  # compute cliques
                 conflicts_edges = []
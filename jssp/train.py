@@ -56,6 +56,7 @@ def main(args, exp_name, path) -> float:
             load_from_job=args.load_from_job,
             load_max_jobs=args.load_max_jobs,
             generate_bounds=args.generate_duration_bounds,
+            cache_dir=args.instance_cache_dir,
         )
         args.fixed_problem = True
 
@@ -109,12 +110,16 @@ def main(args, exp_name, path) -> float:
         fixed_validation=args.fixed_validation,
         fixed_random_validation=args.fixed_random_validation,
         validation_batch_size=args.validation_batch_size,
+        n_validation_workers=args.n_validation_workers,
+        async_validation=args.async_validation,
         validation_freq=1 if args.validation_freq == -1 else args.validation_freq,
         display_env=exp_name,
         path=path,
         custom_heuristic_names=args.custom_heuristic_names,
         ortools_strategy=args.ortools_strategy,
         max_time_ortools=args.max_time_ortools,
+        n_ortools_workers=args.n_ortools_workers,
+        ortools_cache_dir=args.ortools_cache_dir,
         scaling_constant_ortools=args.scaling_constant_ortools,
         vecenv_type=args.vecenv_type,
         validate_on_total_data=args.validate_on_total_data,
@@ -138,6 +143,8 @@ def main(args, exp_name, path) -> float:
         gae_lambda=args.gae_lambda,
         return_based_scaling=args.return_based_scaling,
         store_rollouts_on_disk=args.store_rollouts_on_disk,
+        rollout_arena=args.rollout_arena,
+        pipelined_rollouts=args.pipelined_rollouts,
         critic_loss=args.critic_loss,
         debug_net=False,
         display_gantt=args.display_gantt,
@@ -166,6 +173,7 @@ def main(args, exp_name, path) -> float:
         observe_conflicts_as_cliques=observe_clique,
         observe_real_duration_when_affect=observe_real_duration_when_affect,
         do_not_observe_updated_bounds=args.do_not_observe_updated_bounds,
+        graph_backend=args.graph_backend,
     )
     env_specification.print_self()
     if args.batch_size == 1 and not args.dont_normalize_advantage:
@@ -25,6 +25,7 @@
 import numpy as np
 import pathlib
 import glob
+from generic.instance_store import InstanceStore
 from jssp.utils.utils import check_sanity
 
 
@@ -35,12 +36,25 @@ def load_problem(
     load_from_job=0,
     load_max_jobs=-1,
     generate_bounds=-1.0,
+    cache_dir=None,
 ):
     # Customized problem loader
     # - support for bounded duration uncertainty
     # - support for unattributed machines
     # - support for columns < number of machines
 
+    if cache_dir is not None:
+        # parsed problems are stored in cache_dir
+        return InstanceStore(cache_dir).load(
+            problem_file,
+            load_problem,
+            taillard_offset,
+            deterministic,
+            load_from_job,
+            load_max_jobs,
+            generate_bounds,
+        )
+
     print("generate_bounds=", generate_bounds)
 
     if not deterministic:
@@ -182,9 +196,17 @@ def load_problem(
         return len(affectations), n_m, affectations, durations
 
 
-def load_taillard_problem(problem_file, taillard_offset=True, deterministic=True):
+def load_taillard_problem(
+    problem_file, taillard_offset=True, deterministic=True, cache_dir=None
+):
     # http://jobshop.jjvh.nl/explanation.php#taillard_def
 
+    if cache_dir is not None:
+        # parsed problems are stored in cache_dir
+        return InstanceStore(cache_dir).load(
+            problem_file, load_taillard_problem, taillard_offset, deterministic
+        )
+
     if not deterministic:
         print("Loading problem with uncertainties, using extended taillard format")
 
@@ -0,0 +1,44 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+# Plotly gantt charts of JSSP schedules, imported by the states when they render.
+
+import pandas as pd
+import plotly.figure_factory as ff
+
+from generic.render import png_to_tensor
+
+
+def render_gantt(tasks, colors):
+    # tasks as dicts of Task, Start, Finish and Resource
+    fig = ff.create_gantt(
+        pd.DataFrame(tasks),
+        index_col="Resource",
+        colors=colors,
+        show_colorbar=True,
+        group_tasks=True,
+    )
+    fig.update_yaxes(autorange="reversed")  # otherwise tasks are listed from the bottom
+    return png_to_tensor(fig.to_image(format="png"))
@@ -33,6 +33,8 @@ from typing import List, Optional, Tuple, Union
 import numpy as np
 import torch
 
+from generic.instance_store import InstanceStore
+
 
 def generate_deterministic_problem(n_jobs, n_machines, high, rng: np.random.Generator):
     """
@@ -139,9 +141,17 @@ def job_and_task_to_node(job_id, task_id, n_machines):
     return job_id * n_machines + task_id
 
 
-def load_taillard_problem(problem_file, taillard_offset=True, deterministic=True):
+def load_taillard_problem(
+    problem_file, taillard_offset=True, deterministic=True, cache_dir=None
+):
     # http://jobshop.jjvh.nl/explanation.php#taillard_def
 
+    if cache_dir is not None:
+        # parsed problems are stored in cache_dir
+        return InstanceStore(cache_dir).load(
+            problem_file, load_taillard_problem, taillard_offset, deterministic
+        )
+
     if not deterministic:
         print("Loading problem with uncertainties, using extended taillard format")
 
@@ -249,12 +259,25 @@ def load_problem(
     load_from_job=0,
     load_max_jobs=-1,
     generate_bounds=None,
+    cache_dir=None,
 ):
     # Customized problem loader
     # - support for bounded duration uncertainty
     # - support for unattributed machines
     # - support for columns < number of machines
 
+    if cache_dir is not None:
+        # parsed problems are stored in cache_dir
+        return InstanceStore(cache_dir).load(
+            problem_file,
+            load_problem,
+            taillard_offset,
+            deterministic,
+            load_from_job,
+            load_max_jobs,
+            generate_bounds,
+        )
+
     print("generate_bounds=", generate_bounds)
 
     if not deterministic:
@@ -478,24 +501,58 @@ def compute_conflicts_cliques(machineid):
     return conflicts_edges, conflicts_edges_machineid
 
 
+def compact_conflicts_cliques(machineid):
+    """
+    Conflict cliques as a (2, n_members) tensor: the tasks affected to a machine
+    (first row), grouped by machine id (second row).
+    """
+    members = (machineid != -1).nonzero(as_tuple=True)[0]
+    members = members[torch.sort(machineid[members], stable=True)[1]]
+    return torch.stack([members, machineid[members]])
+
+
+def expand_conflicts_cliques(cliques):
+    """
+    Edges between all pairs of distinct tasks of the same clique, in the order of
+    compute_conflicts_cliques, and the machine id of every edge.
+    """
+    members, machineid = cliques[0], cliques[1]
+    if members.shape[0] == 0:
+        return torch.zeros((2, 0), dtype=torch.long), machineid[:0]
+    sizes = torch.unique_consecutive(machineid, return_counts=True)[1]
+    starts = torch.cumsum(sizes, 0) - sizes
+    member_sizes = torch.repeat_interleave(sizes, sizes)
+    member_starts = torch.repeat_interleave(starts, sizes)
+    # every member is paired with every member of its clique, itself included
+    src = torch.repeat_interleave(members, member_sizes)
+    pair_starts = torch.cumsum(member_sizes, 0) - member_sizes
+    dst_pos = torch.arange(src.shape[0]) - torch.repeat_interleave(
+        pair_starts - member_starts, member_sizes
+    )
+    dst = members[dst_pos]
+    keep = src != dst
+    src, dst = src[keep], dst[keep]
+    order = torch.argsort(src * (members.max() + 1) + dst)
+    src, dst = src[order], dst[order]
+    return torch.stack([src, dst]), machineid[dst_pos[keep][order]]
+
+
 def obs_as_tensor(obs):
     if isinstance(obs, np.ndarray):
         return torch.tensor(obs)
     elif isinstance(obs, dict):
         max_nnodes = max(obs["n_nodes"])
         max_nedges = max(obs["n_edges"])
-        if "n_conflict_edges" in obs:
-            max_nconflicts_edges = max(obs["n_conflict_edges"])
+        if "n_conflict_members" in obs:
+            max_n_members = max(obs["n_conflict_members"])
         newobs = {}
         for key, _obs in obs.items():
             if key == "features":
                 newobs[key] = torch.tensor(_obs[:, :max_nnodes, :])
             elif key == "edge_index":
                 newobs[key] = torch.tensor(_obs[:, :, :max_nedges])
-            elif key == "conflicts_edges":
-                newobs[key] = torch.tensor(_obs[:, :, :max_nconflicts_edges])
-            elif key == "conflicts_edges_machineid":
-                newobs[key] = torch.tensor(_obs[:, :, :max_nconflicts_edges])
+            elif key == "conflicts_cliques":
+                newobs[key] = torch.tensor(_obs[:, :, :max_n_members])
             else:
                 newobs[key] = torch.tensor(_obs)
         return newobs
@@ -509,18 +566,16 @@ def single_obs_as_tensor(obs):
     elif isinstance(obs, dict):
         max_nnodes = obs["n_nodes"]
         max_nedges = obs["n_edges"]
-        if "n_conflict_edges" in obs:
-            max_nconflicts_edges = obs["n_conflict_edges"]
+        if "n_conflict_members" in obs:
+            max_n_members = obs["n_conflict_members"]
         newobs = {}
         for key, _obs in obs.items():
             if key == "features":
                 newobs[key] = torch.tensor(_obs[:max_nnodes, :]).unsqueeze(0)
             elif key == "edge_index":
                 newobs[key] = torch.tensor(_obs[:, :max_nedges]).unsqueeze(0)
-            elif key == "conflicts_edges":
-                newobs[key] = torch.tensor(_obs[:, :max_nconflicts_edges]).unsqueeze(0)
-            elif key == "conflicts_edges_machineid":
-                newobs[key] = torch.tensor(_obs[:, :max_nconflicts_edges]).unsqueeze(0)
+            elif key == "conflicts_cliques":
+                newobs[key] = torch.tensor(_obs[:, :max_n_members]).unsqueeze(0)
             else:
                 newobs[key] = torch.tensor(_obs).unsqueeze(0)
         return newobs
@@ -534,18 +589,16 @@ def obs_as_tensor_add_batch_dim(obs):
     elif isinstance(obs, dict):
         max_nnodes = obs["n_nodes"]
         max_nedges = obs["n_edges"]
-        if "n_conflict_edges" in obs:
-            max_nconflicts_edges = obs["n_conflict_edges"]
+        if "n_conflict_members" in obs:
+            max_n_members = obs["n_conflict_members"]
         newobs = {}
         for key, _obs in obs.items():
             if key == "features":
                 newobs[key] = torch.tensor(_obs[:max_nnodes, :]).unsqueeze(0)
             elif key == "edge_index":
                 newobs[key] = torch.tensor(_obs[:, :max_nedges]).unsqueeze(0)
-            elif key == "conflicts_edges":
-                newobs[key] = torch.tensor(_obs[:, :max_nconflicts_edges]).unsqueeze(0)
-            elif key == "conflicts_edges_machineid":
-                newobs[key] = torch.tensor(_obs[:, :max_nconflicts_edges]).unsqueeze(0)
+            elif key == "conflicts_cliques":
+                newobs[key] = torch.tensor(_obs[:, :max_n_members]).unsqueeze(0)
             else:
                 newobs[key] = torch.tensor([_obs])
         return newobs
@@ -559,7 +612,7 @@ def rebatch_obs(obs):
     rebatched_obs = {}
     max_nnodes = 0
     max_nedges = 0
-    max_nconflicts_edges = 0
+    max_n_members = 0
     num_steps = len(obs)
     for _obs in obs:
         mnn = _obs["n_nodes"].max().item()
@@ -568,13 +621,13 @@ def rebatch_obs(obs):
         mne = _obs["n_edges"].max().item()
         if mne > max_nedges:
             max_nedges = mne
-        if "n_conflict_edges" in _obs:
-            mce = _obs["n_conflict_edges"].max().item()
-            if mce > max_nconflicts_edges:
-                max_nconflicts_edges = mce
+        if "n_conflict_members" in _obs:
+            mcm = _obs["n_conflict_members"].max().item()
+            if mcm > max_n_members:
+                max_n_members = mcm
     max_nnodes = int(max_nnodes)
     max_nedges = int(max_nedges)
-    max_nconflicts_edges = int(max_nconflicts_edges)
+    max_n_members = int(max_n_members)
 
     for key in obs[0]:
         if key == "features":
@@ -599,15 +652,15 @@ def rebatch_obs(obs):
                     for j in range(num_steps)
                 ]
             ).reshape(torch.Size((-1,)) + s)
-        elif key in ["conflicts_edges", "conflicts_edges_machineid"]:
-            s = (obs[0][key].shape[-2], max_nconflicts_edges)
+        elif key == "conflicts_cliques":
+            s = (obs[0][key].shape[-2], max_n_members)
             rebatched_obs[key] = torch.stack(
                 [
                     torch.nn.functional.pad(
                         obs[j][key],
                         (
                             0,
-                            max_nconflicts_edges - obs[j][key].shape[-1],
+                            max_n_members - obs[j][key].shape[-1],
                         ),
                     )
                     for j in range(num_steps)
@@ -192,6 +192,7 @@ class Env(gym.Env):
             self.problem,
             self.deterministic,
             observe_conflicts_as_cliques=self.observe_conflicts_as_cliques,
+            resource_model=self.env_specification.resource_model,
         )
 
     def _create_transition_model(self):
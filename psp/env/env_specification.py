@@ -49,6 +49,7 @@ class EnvSpecification:
         fast_forward,
         observe_subgraph,
         random_taillard,
+        resource_model="flowGraph",
     ):
         self.problems = problems
         self.max_n_modes = self.problems.max_n_modes
@@ -82,6 +83,7 @@ class EnvSpecification:
         self.fast_forward = fast_forward
         self.observe_subgraph = observe_subgraph
         self.random_taillard = random_taillard
+        self.resource_model = resource_model
 
         if self.max_edges_factor > 0:
             self.shape_pr = (
@@ -230,6 +232,7 @@ class EnvSpecification:
             f"observation horizon time:           {self.observation_horizon_time}\n"
             f"fast forward:                       {self.fast_forward}\n"
             f"observe subgraph:                   {self.observe_subgraph}\n"
+            f"resource model:                     {self.resource_model}\n"
             f"List of features:\n - Task Completion Times\n - selectable\n - duration"
         )
 
@@ -21,11 +21,11 @@
 # along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
 #
 
-# import numpy as np
 import random
 from concurrent.futures import ThreadPoolExecutor
 
 import dgl
+import numpy as np
 import torch
 
 from ..utils.taillard_rcpsp import TaillardRcpsp
@@ -55,7 +55,6 @@ class GEnv:
         self.pb_ids = pb_ids
         random.shuffle(self.pb_ids)
         self.pb_index = -1
-        self.succ_cache = {}
 
         self.reset()
 
@@ -131,6 +130,8 @@ class GEnv:
         # Reset the internal state, but do not sample a new problem
         if soft:
             self.state.reset()
+            if self.observe_subgraph:
+                self.reset_window()
 
         # Reset the state by creating a new one
         # also may select a different problem
@@ -154,42 +155,58 @@ class GEnv:
     def khop_thread_safe(self, graph, source_nodes, k):
         return dgl.khop_out_subgraph(graph, source_nodes, k=k, relabel_nodes=True)[0]
 
-    def succ_cached(self, graph, n):
-        if n in self.succ_cache.keys():
-            return self.succ_cache[n]
-        # normal version
-        # suc = set(graph.successors(n, etype="prec").tolist())
-        # skip dgl inernal test
-        suc = set(graph._graph.successors(graph.get_etype_id("prec"), n).tolist())
-        self.succ_cache[n] = suc
-        return suc
+    def reset_successors(self):
+        # precedence successors of every node in CSR form (successors of node n are
+        # succ_indices[succ_indptr[n] : succ_indptr[n + 1]]), as prec edges of the
+        # problem are not removed when observing subgraphs
+        edges = np.array(self.state.problem_edges, dtype=np.int64).reshape(-1, 2)
+        edges = edges[np.argsort(edges[:, 0], kind="stable")]
+        self.succ_indptr = np.zeros(self.state.n_nodes + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(edges[:, 0], minlength=self.state.n_nodes),
+            out=self.succ_indptr[1:],
+        )
+        self.succ_indices = edges[:, 1]
+
+    def successors(self, nodes):
+        # successors of all nodes, with repetitions
+        starts = self.succ_indptr[nodes]
+        counts = self.succ_indptr[nodes + 1] - starts
+        shift = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        return self.succ_indices[np.arange(len(shift)) + shift]
+
+    def reset_window(self):
+        # windows[n] is the sorted array of the nodes at most observation_horizon_step
+        # successors away from the selectable node n, kept while n is selectable so
+        # that only the nodes entering or leaving the selectable set are expanded
+        self.windows = {}
+
+    def window(self, node):
+        window = np.zeros(0, dtype=np.int64)
+        hop_nodes = np.array([node], dtype=np.int64)
+        for i in range(self.env_specification.observation_horizon_step):
+            hop_nodes = np.setdiff1d(self.successors(hop_nodes), window)
+            if len(hop_nodes) == 0:
+                break
+            window = np.union1d(window, hop_nodes)
+        return window
+
+    def update_windows(self, present_nodes):
+        present_nodes = set(present_nodes.tolist())
+        for node in self.windows.keys() - present_nodes:
+            del self.windows[node]
+        for node in present_nodes - self.windows.keys():
+            self.windows[node] = self.window(node)
 
     def process_obs(self, full_observation):
+        # observes the subgraph of the nodes in the frontier, the selectable nodes and
+        # the nodes in the step and time horizons after them, self.observed_nodes
+        # being the sorted ids of the observed nodes in the full graph
         if not self.observe_subgraph:
             return full_observation
-        frontier_nodes = torch.tensor(list(self.state.nodes_in_frontier))
-        present_nodes = (torch.where(self.state.selectables() == 1)[0]).tolist()
-        if self.env_specification.observation_horizon_step != 0:
-            local_present_nodes = present_nodes
-            future_nodes_step = set()
-            for i in range(self.env_specification.observation_horizon_step):
-                succs = set()
-                for n in local_present_nodes:
-                    # vanilla version
-                    # outs = set(full_observation.successors(n, etype="prec").tolist())
-                    # cached version
-                    outs = self.succ_cached(full_observation, n)
-                    # nocheck version
-                    # outs = set(
-                    #     full_observation._graph.successors(
-                    #         full_observation.get_etype_id("prec"), n
-                    #     ).tolist()
-                    # )
-                    succs = succs.union(outs)
-                local_present_nodes = succs
-                future_nodes_step = future_nodes_step.union(local_present_nodes)
-        else:
-            future_nodes_step = set()
+        present_nodes = torch.where(self.state.selectables() == 1)[0]
+        self.update_windows(present_nodes)
+        future_nodes = [np.zeros(0, dtype=np.int64), *self.windows.values()]
 
         if (
             self.env_specification.observation_horizon_time != 0
@@ -199,38 +216,43 @@ class GEnv:
             earlier_start_times = (
                 self.state.all_tct()[:, 1] - self.state.all_durations()[:, 1]
             )
-            future_nodes_time = torch.where(
-                torch.logical_and(
-                    earlier_start_times > present_date,
-                    earlier_start_times
-                    < present_date + self.env_specification.observation_horizon_time,
-                )
-            )[0]
-            future_nodes_time = set(future_nodes_time.tolist())
-        else:
-            future_nodes_time = set()
-
-        future_nodes = future_nodes_step.union(future_nodes_time)
+            future_nodes.append(
+                torch.where(
+                    torch.logical_and(
+                        earlier_start_times > present_date,
+                        earlier_start_times
+                        < present_date
+                        + self.env_specification.observation_horizon_time,
+                    )
+                )[0].numpy()
+            )
 
+        future_nodes = np.unique(np.concatenate(future_nodes))
         if len(future_nodes) == 0:
-            past_nodes = torch.where(self.state.get_pasts())[0]
-            future_nodes = set(range(full_observation.num_nodes())) - set(
-                past_nodes.tolist()
+            future_nodes = np.flatnonzero(
+                np.logical_not(self.state.get_pasts().numpy())
             )
 
-        nodes_to_keep = torch.tensor(
-            list(
-                (
-                    future_nodes.union(set(present_nodes)).union(
-                        set(frontier_nodes.tolist())
-                    )
-                )
+        nodes_to_keep = np.unique(
+            np.concatenate(
+                [
+                    future_nodes,
+                    present_nodes.numpy(),
+                    np.fromiter(self.state.nodes_in_frontier, dtype=np.int64),
+                ]
             )
         )
+        self.observed_nodes = torch.from_numpy(nodes_to_keep)
 
         subgraph = dgl.node_subgraph(
             full_observation,
-            nodes_to_keep.to(self.state.device),
+            {
+                "n": self.observed_nodes.to(self.state.device),
+                "global_data": torch.arange(
+                    full_observation.num_nodes("global_data"),
+                    device=self.state.device,
+                ),
+            },
             output_device=torch.device("cpu"),
         )
         return subgraph
@@ -238,12 +260,12 @@ class GEnv:
     def action_to_node_id(self, action):
         if not self.observe_subgraph:
             return action
-        return self.current_observation.ndata[dgl.NID][action].item()
+        return self.observed_nodes[action].item()
 
     def process_mask(self, full_mask):
         if not self.observe_subgraph:
             return full_mask
-        return full_mask[self.current_observation.ndata[dgl.NID]]
+        return full_mask[self.observed_nodes]
 
     def get_solution(self):
         return self.state.get_solution()
@@ -269,7 +291,11 @@ class GEnv:
             self.problem,
             self.deterministic,
             observe_conflicts_as_cliques=self.observe_conflicts_as_cliques,
+            resource_model=self.env_specification.resource_model,
         )
+        if self.observe_subgraph:
+            self.reset_successors()
+            self.reset_window()
 
     def _create_transition_model(self):
         self.transition_model = TransitionModel(self.env_specification)
@@ -8,15 +8,20 @@ from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
 import pickle
 import io
 import contextlib
+import itertools
 import dgl
 from dgl import multiprocessing as mp
 import numpy as np
+import math
 import time
+import torch
 
 # import tracemalloc
 
 from psp.env.genv import GEnv as Env
 
+from .graph_delta import GraphDeltaDecoder, GraphDeltaEncoder
+from .graph_tensors import GraphBuilder, graph_counts, graph_schema, graph_tensors
 from .vector_env import GraphVectorEnv
 
 __all__ = ["AsyncVectorEnv"]
@@ -53,33 +58,163 @@ class CloudpickleWrapper:
         return self.fn()
 
 
-def create_shared_memory(size, n, ctx, disk):
-    if disk:
+# distinguishes the files of the vector envs of a process (pipelined rollouts step
+# two of them)
+disk_buffer_ids = itertools.count()
+
+
+def create_shared_memory(size, n, ctx, transport):
+    if transport == "disk":
         fnames = []
+        buffer_id = next(disk_buffer_ids)
         for i in range(n):
             fname = (
-                "/tmp/wheatley_dgl_" + str(os.getpid()) + "_worker_" + str(i) + ".obs"
+                "/tmp/wheatley_dgl_"
+                + str(os.getpid())
+                + "_"
+                + str(buffer_id)
+                + "_worker_"
+                + str(i)
+                + ".obs"
             )
             fnames.append(fname)
 
         return fnames
-    else:
+    elif transport == "pickle":
         return [ctx.Array("B", size) for i in range(n)]
+    elif transport == "tensor":
+        return [
+            SharedGraphBuffer(torch.empty(size, dtype=torch.uint8).share_memory_())
+            for i in range(n)
+        ]
+    elif transport == "delta":
+        return [DeltaGraphBuffer() for i in range(n)]
+    else:
+        raise Exception(f"graph transport {transport} not recognized")
 
 
-def read_from_shared_memory(shared_memory, n, disk):
-    if disk:
+def read_from_shared_memory(shared_memory, n, transport, updates=None, copy=False):
+    if transport == "disk":
         return [dgl.load_graphs(shared_memory[i])[0][0] for i in range(n)]
-    else:
+    elif transport == "pickle":
         return [pickle.loads(shared_memory[i].get_obj()) for i in range(n)]
+    else:
+        return [shared_memory[i].read(updates[i], copy) for i in range(n)]
 
 
-def write_to_shared_memory(index, obs, shared_memory, disk):
-    if disk:
+def write_to_shared_memory(index, obs, shared_memory, transport):
+    if transport == "disk":
         dgl.save_graphs(shared_memory[index], [obs])
-    else:
+    elif transport == "pickle":
         data = pickle.dumps(obs)
         shared_memory[index][: len(data)] = data
+    else:
+        return shared_memory[index].write(obs)
+
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+
+class SharedGraphBuffer:
+    """
+    Heterographs written as raw tensors in a shared memory buffer. The buffer starts
+    with a header of node counts per ntype and edge counts per etype, followed by the
+    src / dst ids of every etype and the node / edge data. The schema (ntypes, etypes,
+    data keys, dtypes and trailing shapes) only goes through the pipe when it changes,
+    as does the buffer when the worker has to grow it.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.schema = None
+
+    def __getstate__(self):
+        return {"buffer": self.buffer, "schema": None}
+
+    def set_schema(self, schema):
+        self.schema = schema
+        self.builder = GraphBuilder(schema)
+
+    def layout(self, counts):
+        # offsets, dtypes and shapes of the tensors following the header
+        offset = _align(8 * len(counts))
+        tensors = []
+        for dtype, shape in self.builder.shapes(counts):
+            tensors.append((offset, dtype, shape))
+            offset = _align(offset + math.prod(shape) * dtype.itemsize)
+        return tensors, offset
+
+    @staticmethod
+    def view(buffer, offset, dtype, shape):
+        nbytes = math.prod(shape) * dtype.itemsize
+        return buffer[offset : offset + nbytes].view(dtype).view(shape)
+
+    def write(self, g):
+        # returns (schema, buffer) to send to the parent, None for unchanged values
+        schema = graph_schema(g)
+        new_schema = None
+        if schema != self.schema:
+            self.set_schema(schema)
+            new_schema = schema
+        counts = graph_counts(g, schema)
+        tensors, size = self.layout(counts)
+        new_buffer = None
+        if size > self.buffer.numel():
+            self.buffer = torch.empty(
+                max(size, 2 * self.buffer.numel()), dtype=torch.uint8
+            ).share_memory_()
+            new_buffer = self.buffer
+        self.view(self.buffer, 0, torch.int64, (len(counts),)).copy_(
+            torch.tensor(counts)
+        )
+        for (offset, dtype, shape), value in zip(
+            tensors, graph_tensors(g, schema, counts)
+        ):
+            self.view(self.buffer, offset, dtype, shape).copy_(value)
+        if new_schema is None and new_buffer is None:
+            return None
+        return new_schema, new_buffer
+
+    def read(self, update, copy=False):
+        if update is not None:
+            schema, buffer = update
+            if schema is not None:
+                self.set_schema(schema)
+            if buffer is not None:
+                self.buffer = buffer
+        n_counts = len(self.schema[0]) + len(self.schema[1])
+        counts = self.view(self.buffer, 0, torch.int64, (n_counts,)).tolist()
+        tensors, size = self.layout(counts)
+        # one copy of the used part of the buffer instead of views on the shared
+        # memory, that the worker overwrites at next step
+        buffer = self.buffer[:size].clone() if copy else self.buffer
+        return self.builder.build(counts, [self.view(buffer, *t) for t in tensors])
+
+
+class DeltaGraphBuffer:
+    """
+    Heterographs sent through the pipe as deltas with the previous graph of the same
+    env. The worker copy of the buffer encodes, the parent copy decodes: graphs are
+    rebuilt from the previous graph, and share its unchanged tensors.
+    """
+
+    def __init__(self):
+        self.encoder = GraphDeltaEncoder()
+        self.decoder = GraphDeltaDecoder()
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def write(self, g):
+        return self.encoder.encode(g)
+
+    def read(self, update, copy=False):
+        # decoded tensors are never views on worker memory
+        return self.decoder.decode(update)
 
 
 class AsyncGraphVectorEnv(GraphVectorEnv):
@@ -106,12 +241,13 @@ class AsyncGraphVectorEnv(GraphVectorEnv):
         context: Optional[str] = None,
         daemon: bool = True,
         worker: Optional[Callable] = None,
-        disk=True,
+        transport="disk",
+        n_buffers=None,
     ):
         ctx = mp.get_context(context)
         self.env_fns = env_fns
         self.shared_memory = shared_memory
-        self.disk = disk
+        self.transport = transport
         self.copy = copy
         dummy_env = env_fns[0]()
         dummy_env.close()
@@ -121,11 +257,15 @@ class AsyncGraphVectorEnv(GraphVectorEnv):
         )
 
         if self.shared_memory:
+            # one observation buffer per env unless workers run several envs
             self._obs_buffer = create_shared_memory(
-                2000000, n=self.num_envs, ctx=ctx, disk=self.disk
+                2000000,
+                n=self.num_envs if n_buffers is None else n_buffers,
+                ctx=ctx,
+                transport=self.transport,
             )
         else:
-            _obs_buffer = None
+            self._obs_buffer = None
         self.observations = []
 
         self.parent_pipes, self.processes = [], []
@@ -144,7 +284,7 @@ class AsyncGraphVectorEnv(GraphVectorEnv):
                     child_pipe,
                     parent_pipe,
                     self._obs_buffer,
-                    self.disk,
+                    self.transport,
                     self.error_queue,
                 ),
             )
@@ -214,21 +354,13 @@ class AsyncGraphVectorEnv(GraphVectorEnv):
             successes.append(success)
             if success:
                 obs, info = result
-                if not self.shared_memory:
-                    observations_list.append(obs)
+                observations_list.append(obs)
                 infos = self._add_info(infos, info, i)
 
         self._raise_if_errors(successes)
         self._state = AsyncState.DEFAULT
 
-        if not self.shared_memory:
-            self.observations = observations_list
-        else:
-            self.observations = read_from_shared_memory(
-                self._obs_buffer, n=self.num_envs, disk=self.disk
-            )
-
-        return (deepcopy(self.observations) if self.copy else self.observations), infos
+        return self._read_observations(observations_list), infos
 
     def step_async(self, actions):
         self._assert_is_running()
@@ -263,8 +395,7 @@ class AsyncGraphVectorEnv(GraphVectorEnv):
             successes.append(success)
             if success:
                 obs, rew, terminated, truncated, info = result
-                if not self.shared_memory:
-                    observations_list.append(obs)
+                observations_list.append(obs)
                 rewards.append(rew)
                 terminateds.append(terminated.item())
                 truncateds.append(truncated)
@@ -273,21 +404,33 @@ class AsyncGraphVectorEnv(GraphVectorEnv):
         self._raise_if_errors(successes)
         self._state = AsyncState.DEFAULT
 
-        if not self.shared_memory:
-            self.observations = observations_list
-        else:
-            self.observations = read_from_shared_memory(
-                self._obs_buffer, n=self.num_envs, disk=self.disk
-            )
-
         return (
-            deepcopy(self.observations) if self.copy else self.observations,
+            self._read_observations(observations_list),
             np.array(rewards),
             np.array(terminateds, dtype=np.bool_),
             np.array(truncateds, dtype=np.bool_),
             infos,
         )
 
+    def _read_observations(self, observations_list):
+        if not self.shared_memory:
+            self.observations = observations_list
+        elif self.transport in ["tensor", "delta"]:
+            # observations are copied while reading, if needed
+            self.observations = read_from_shared_memory(
+                self._obs_buffer,
+                n=self.num_envs,
+                transport=self.transport,
+                updates=observations_list,
+                copy=self.copy,
+            )
+            return self.observations
+        else:
+            self.observations = read_from_shared_memory(
+                self._obs_buffer, n=self.num_envs, transport=self.transport
+            )
+        return deepcopy(self.observations) if self.copy else self.observations
+
     def call_async(self, name: str, *args, **kwargs):
         self._assert_is_running()
         if self._state != AsyncState.DEFAULT:
@@ -417,7 +560,7 @@ class AsyncGraphVectorEnv(GraphVectorEnv):
 
     def __del__(self):
         """On deleting the object, checks that the vector environment is closed."""
-        if self.shared_memory and self.disk:
+        if self.shared_memory and self.transport == "disk":
             for b in self._obs_buffer:
                 try:
                     os.remove(b)
@@ -428,7 +571,7 @@ class AsyncGraphVectorEnv(GraphVectorEnv):
             self.close(terminate=True)
 
 
-def _worker(index, env_fn, pipe, parent_pipe, shared_memory, disk, error_queue):
+def _worker(index, env_fn, pipe, parent_pipe, shared_memory, transport, error_queue):
     assert shared_memory is None
     env = env_fn()
     parent_pipe.close()
@@ -440,6 +583,7 @@ def _worker(index, env_fn, pipe, parent_pipe, shared_memory, disk, error_queue):
                 pipe.send(((observation, info), True))
 
             elif command == "step":
+                start = time.perf_counter()
                 (
                     observation,
                     reward,
@@ -452,6 +596,8 @@ def _worker(index, env_fn, pipe, parent_pipe, shared_memory, disk, error_queue):
                     observation, info = env.reset()
                     info["final_observation"] = old_observation
                     info["final_info"] = old_info
+                # busy time of the worker, to report its utilization
+                info["step_time"] = time.perf_counter() - start
                 pipe.send(((observation, reward, terminated, truncated, info), True))
             elif command == "seed":
                 env.seed(data)
@@ -489,7 +635,7 @@ def _worker(index, env_fn, pipe, parent_pipe, shared_memory, disk, error_queue):
 
 
 def _worker_shared_memory(
-    index, env_fn, pipe, parent_pipe, shared_memory, disk, error_queue
+    index, env_fn, pipe, parent_pipe, shared_memory, transport, error_queue
 ):
     assert shared_memory is not None
     env = env_fn()
@@ -501,8 +647,10 @@ def _worker_shared_memory(
             if command == "reset":
                 # snap1 = tracemalloc.take_snapshot()
                 observation, info = env.reset(**data)
-                write_to_shared_memory(index, observation, shared_memory, disk)
-                pipe.send(((None, info), True))
+                update = write_to_shared_memory(
+                    index, observation, shared_memory, transport
+                )
+                pipe.send(((update, info), True))
                 # snap2 = tracemalloc.take_snapshot()
                 # top_stats = snap2.compare_to(snap1, "lineno")
                 # for stat in top_stats:
@@ -511,6 +659,7 @@ def _worker_shared_memory(
             elif command == "step":
                 # print("getting mem snapshot"n)
                 # snap1 = tracemalloc.take_snapshot()
+                start = time.perf_counter()
                 (
                     observation,
                     reward,
@@ -524,8 +673,12 @@ def _worker_shared_memory(
                     info["final_observation"] = old_observation
                     info["final_info"] = old_info
 
-                write_to_shared_memory(index, observation, shared_memory, disk)
-                pipe.send(((None, reward, terminated, truncated, info), True))
+                update = write_to_shared_memory(
+                    index, observation, shared_memory, transport
+                )
+                # busy time of the worker, to report its utilization
+                info["step_time"] = time.perf_counter() - start
+                pipe.send(((update, reward, terminated, truncated, info), True))
                 # snap2 = tracemalloc.take_snapshot()
                 # top_stats = snap2.compare_to(snap1, "lineno")
                 # for stat in top_stats:
@@ -0,0 +1,208 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+# Heterographs encoded as their difference with the previous graph of the same env:
+# edges removed and added per etype, and rows of node / edge data that changed.
+# Deltas hold numpy arrays, as tensors sent through pipes go through one shared
+# memory segment each.
+
+import torch
+
+from .graph_tensors import GraphBuilder, graph_counts, graph_schema
+
+
+def graph_parts(g, schema):
+    # (2, n_edges) ids of every etype, then node data and edge data
+    ntypes, etypes, _, ndata, edata = schema
+    parts = [torch.stack(g.edges(etype=etype)) for etype in etypes]
+    parts += [g.nodes[ntype].data[key] for ntype, key, _, _ in ndata]
+    parts += [g.edges[etype].data[key] for etype, key, _, _ in edata]
+    return parts
+
+
+def row_delta(base, value):
+    # None if value is base, (changed rows, their values) if less than half of the
+    # rows changed, value otherwise
+    if base.shape == value.shape:
+        changed = base != value
+        if changed.dim() > 1:
+            changed = changed.flatten(1).any(1)
+        changed = changed.nonzero(as_tuple=True)[0]
+        if changed.shape[0] == 0:
+            return None
+        if 2 * changed.shape[0] < value.shape[0]:
+            return changed.numpy(), value[changed].numpy()
+    return value.numpy()
+
+
+def apply_row_delta(base, delta):
+    if delta is None:
+        return base
+    if isinstance(delta, tuple):
+        value = base.clone()
+        value[torch.from_numpy(delta[0])] = torch.from_numpy(delta[1])
+        return value
+    return torch.from_numpy(delta)
+
+
+def edge_delta(base, edges):
+    # kept edges of base and (removed edges, added edges) if edges are the kept edges
+    # of base followed by new ones (dgl keeps the order of edges on removal), None
+    # otherwise
+    n = int(torch.cat([base, edges], 1).max()) + 1
+    base_keys = base[0] * n + base[1]
+    keys = edges[0] * n + edges[1]
+    keep = torch.isin(base_keys, keys)
+    n_keep = int(keep.sum())
+    if n_keep > keys.shape[0] or not torch.equal(keys[:n_keep], base_keys[keep]):
+        return None, None
+    removed = (~keep).nonzero(as_tuple=True)[0]
+    return keep, (removed.numpy(), edges[:, n_keep:].numpy())
+
+
+class GraphDeltaEncoder:
+    """
+    Encodes the graphs of an env as deltas with the previously encoded graph. The
+    first graph, and graphs of a new schema, are sent in full.
+    """
+
+    def __init__(self):
+        self.schema = None
+        self.parts = None
+
+    def encode(self, g):
+        schema = graph_schema(g)
+        counts = graph_counts(g, schema)
+        # the env updates its graph in place
+        parts = [p.clone() for p in graph_parts(g, schema)]
+        n_etypes = len(schema[1])
+        if schema != self.schema:
+            self.schema = schema
+            self.parts = parts
+            return schema, counts, [p.numpy() for p in parts]
+
+        deltas = []
+        keeps = []
+        for base, edges in zip(self.parts[:n_etypes], parts[:n_etypes]):
+            if torch.equal(base, edges):
+                keeps.append(None)
+                deltas.append(None)
+                continue
+            keep, delta = edge_delta(base, edges)
+            keeps.append(keep)
+            deltas.append(edges.numpy() if delta is None else delta)
+        for base, value in zip(
+            self.parts[n_etypes : n_etypes + len(schema[3])],
+            parts[n_etypes : n_etypes + len(schema[3])],
+        ):
+            deltas.append(row_delta(base, value))
+        etype_ids = {etype: i for i, etype in enumerate(schema[1])}
+        for (etype, _, _, _), base, value in zip(
+            schema[4],
+            self.parts[n_etypes + len(schema[3]) :],
+            parts[n_etypes + len(schema[3]) :],
+        ):
+            i = etype_ids[etype]
+            if keeps[i] is None and deltas[i] is not None:
+                # edges sent in full
+                deltas.append(value.numpy())
+            elif keeps[i] is None:
+                deltas.append(row_delta(base, value))
+            else:
+                n_keep = base[keeps[i]].shape[0]
+                deltas.append(
+                    (
+                        row_delta(base[keeps[i]], value[:n_keep]),
+                        value[n_keep:].numpy(),
+                    )
+                )
+        self.parts = parts
+        return None, counts, deltas
+
+
+class GraphDeltaDecoder:
+    """Rebuilds graphs from the deltas of a GraphDeltaEncoder."""
+
+    def __init__(self):
+        self.schema = None
+        self.builder = None
+        self.parts = None
+
+    def decode(self, delta):
+        schema, counts, deltas = delta
+        if schema is not None:
+            self.schema = schema
+            self.builder = GraphBuilder(schema)
+            self.parts = [torch.from_numpy(d) for d in deltas]
+        else:
+            self.parts = self.apply(deltas)
+        n_etypes = len(self.schema[1])
+        ids = torch.cat(
+            [p.flatten() for p in self.parts[:n_etypes]]
+            + [torch.empty(0, dtype=self.schema[2])]
+        )
+        # unchanged parts are shared with the previous graph
+        return self.builder.build(counts, [ids] + self.parts[n_etypes:])
+
+    def apply(self, deltas):
+        _, etypes, _, ndata, _ = self.schema
+        n_etypes = len(etypes)
+        parts = []
+        keeps = []
+        for base, delta in zip(self.parts[:n_etypes], deltas[:n_etypes]):
+            keep = None
+            if delta is None:
+                parts.append(base)
+            elif isinstance(delta, tuple):
+                keep = torch.ones(base.shape[1], dtype=torch.bool)
+                keep[torch.from_numpy(delta[0])] = False
+                parts.append(torch.cat([base[:, keep], torch.from_numpy(delta[1])], 1))
+            else:
+                parts.append(torch.from_numpy(delta))
+            keeps.append(keep)
+        for base, delta in zip(
+            self.parts[n_etypes : n_etypes + len(ndata)],
+            deltas[n_etypes : n_etypes + len(ndata)],
+        ):
+            parts.append(apply_row_delta(base, delta))
+        etype_ids = {etype: i for i, etype in enumerate(etypes)}
+        for (etype, _, _, _), base, delta in zip(
+            self.schema[4],
+            self.parts[n_etypes + len(ndata) :],
+            deltas[n_etypes + len(ndata) :],
+        ):
+            keep = keeps[etype_ids[etype]]
+            if keep is None:
+                parts.append(apply_row_delta(base, delta))
+            else:
+                parts.append(
+                    torch.cat(
+                        [
+                            apply_row_delta(base[keep], delta[0]),
+                            torch.from_numpy(delta[1]),
+                        ]
+                    )
+                )
+        return parts
@@ -0,0 +1,142 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+# Heterographs as flat lists of tensors, to write them in shared memory or rollout
+# storages and rebuild them from views without any deserialization.
+
+import dgl
+import torch
+from dgl import heterograph_index
+from dgl.frame import Frame
+
+
+def graph_schema(g):
+    # ntypes, etypes (in the order of dgl metagraphs), idtype, and (type, key, dtype,
+    # trailing shape) of node and edge data
+    ntypes = tuple(sorted(g.ntypes))
+    etypes = tuple(sorted(g.canonical_etypes))
+    ndata = []
+    for ntype in ntypes:
+        for key, value in g.nodes[ntype].data.items():
+            ndata.append((ntype, key, value.dtype, tuple(value.shape[1:])))
+    edata = []
+    for etype in etypes:
+        for key, value in g.edges[etype].data.items():
+            edata.append((etype, key, value.dtype, tuple(value.shape[1:])))
+    return ntypes, etypes, g.idtype, tuple(ndata), tuple(edata)
+
+
+def graph_counts(g, schema):
+    # number of nodes per ntype then number of edges per etype
+    return [g.num_nodes(ntype) for ntype in schema[0]] + [
+        g.num_edges(etype) for etype in schema[1]
+    ]
+
+
+def graph_tensors(g, schema, counts):
+    # src / dst ids of all etypes in a single tensor, then node data and edge data
+    ntypes, etypes, idtype, ndata, edata = schema
+    ids = [
+        t
+        for etype, n in zip(etypes, counts[len(ntypes) :])
+        if n > 0
+        for t in g.edges(etype=etype)
+    ]
+    tensors = [torch.cat(ids + [torch.empty(0, dtype=idtype)])]
+    for ntype, key, _, _ in ndata:
+        tensors.append(g.nodes[ntype].data[key])
+    for etype, key, _, _ in edata:
+        tensors.append(g.edges[etype].data[key])
+    return tensors
+
+
+class GraphBuilder:
+    """
+    Rebuilds graphs of a given schema from the tensors of graph_tensors, building the
+    graph index from the coo of each etype and the frames from the tensors, as
+    dgl.load_graphs does.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        ntypes, etypes, _, _, _ = schema
+        self.metagraph = heterograph_index.create_metagraph_index(ntypes, etypes)[0]
+        self.ntype_ids = {ntype: i for i, ntype in enumerate(ntypes)}
+        self.etype_ids = {etype: i for i, etype in enumerate(etypes)}
+        # most etypes have no edges, their graph indexes are only built once
+        self.empty_rel_graphs = {}
+
+    def shapes(self, counts):
+        # dtypes and shapes of the tensors of graph_tensors
+        ntypes, etypes, idtype, ndata, edata = self.schema
+        n_nodes = counts[: len(ntypes)]
+        n_edges = counts[len(ntypes) :]
+        shapes = [(idtype, (2 * sum(n_edges),))]
+        for ntype, _, dtype, shape in ndata:
+            shapes.append((dtype, (n_nodes[self.ntype_ids[ntype]],) + shape))
+        for etype, _, dtype, shape in edata:
+            shapes.append((dtype, (n_edges[self.etype_ids[etype]],) + shape))
+        return shapes
+
+    def build(self, counts, tensors):
+        ntypes, etypes, _, ndata, edata = self.schema
+        n_nodes = counts[: len(ntypes)]
+        n_edges = counts[len(ntypes) :]
+        ids = torch.split(tensors[0], [n for n in n_edges for _ in range(2)])
+        rel_graphs = []
+        for i, (srctype, _, dsttype) in enumerate(etypes):
+            n_src = n_nodes[self.ntype_ids[srctype]]
+            n_dst = n_nodes[self.ntype_ids[dsttype]]
+            key = (i, n_src, n_dst)
+            if n_edges[i] == 0 and key in self.empty_rel_graphs:
+                rel_graphs.append(self.empty_rel_graphs[key])
+                continue
+            rel_graph = heterograph_index.create_unitgraph_from_coo(
+                1 if srctype == dsttype else 2,
+                n_src,
+                n_dst,
+                ids[2 * i],
+                ids[2 * i + 1],
+                ["coo", "csr", "csc"],
+            )
+            if n_edges[i] == 0:
+                self.empty_rel_graphs[key] = rel_graph
+            rel_graphs.append(rel_graph)
+        gidx = heterograph_index.create_heterograph_from_relations(
+            self.metagraph, rel_graphs, dgl.utils.toindex(n_nodes, "int64")
+        )
+        node_data = [{} for _ in ntypes]
+        for (ntype, key, _, _), value in zip(ndata, tensors[1:]):
+            node_data[self.ntype_ids[ntype]][key] = value
+        edge_data = [{} for _ in etypes]
+        for (etype, key, _, _), value in zip(edata, tensors[1 + len(ndata) :]):
+            edge_data[self.etype_ids[etype]][key] = value
+        return dgl.DGLGraph(
+            gidx,
+            list(ntypes),
+            [etype[1] for etype in etypes],
+            [Frame(data or None, num_rows=n) for data, n in zip(node_data, n_nodes)],
+            [Frame(data or None, num_rows=n) for data, n in zip(edge_data, n_edges)],
+        )
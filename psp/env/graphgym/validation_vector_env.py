@@ -0,0 +1,148 @@
+"""An async vector environment running episodes of several validation envs per worker."""
+import functools
+import sys
+
+from .async_vector_env import (
+    AsyncGraphVectorEnv,
+    read_from_shared_memory,
+    write_to_shared_memory,
+)
+
+__all__ = ["AsyncValidationVectorEnv"]
+
+
+class EnvGroup:
+    """Validation envs run by one worker, by validation index."""
+
+    def __init__(self, envs):
+        self.envs = envs
+
+    def close(self):
+        for env in self.envs.values():
+            env.close()
+
+
+class AsyncValidationVectorEnv(AsyncGraphVectorEnv):
+    """
+    Validation envs spread over a pool of workers, env i being run by worker
+    i % n_workers. Unlike training envs, validation envs are not reset at the end of
+    their episode: they drop out of the steps, and are sent back to the parent when
+    all episodes are done for their solution to be evaluated. Observations go through
+    one shared memory buffer per validation env for graph observations, through the
+    pipes otherwise.
+    """
+
+    def __init__(self, envs, n_workers, shared_memory=True, transport="tensor"):
+        n_workers = min(n_workers, len(envs))
+        self.n_validation_env = len(envs)
+        super().__init__(
+            [
+                functools.partial(
+                    EnvGroup,
+                    {i: envs[i] for i in range(w, len(envs), n_workers)},
+                )
+                for w in range(n_workers)
+            ],
+            context="spawn",
+            copy=False,
+            shared_memory=shared_memory,
+            worker=_validation_worker,
+            transport=transport,
+            n_buffers=len(envs),
+        )
+
+    def reset_envs(self, soft=False):
+        # returns the observations and masks of all envs, in validation order
+        self._assert_is_running()
+        for pipe in self.parent_pipes:
+            pipe.send(("reset", {"soft": soft}))
+        results = self._gather()
+        return self._read_results(list(range(self.n_validation_env)), results)
+
+    def step_envs(self, indices, actions):
+        # steps envs of indices, returns the indices, observations and masks of the
+        # envs that are not done
+        self._assert_is_running()
+        worker_actions = [{} for _ in self.parent_pipes]
+        for i, action in zip(indices, actions):
+            worker_actions[i % self.num_envs][i] = action
+        for pipe, data in zip(self.parent_pipes, worker_actions):
+            pipe.send(("step", data))
+        results = self._gather()
+        todo = [i for i in indices if results[i] is not None]
+        return (todo,) + self._read_results(todo, results)
+
+    def get_envs(self):
+        # copies of the envs, in validation order
+        self._assert_is_running()
+        for pipe in self.parent_pipes:
+            pipe.send(("get_envs", None))
+        envs = self._gather()
+        return [envs[i] for i in range(self.n_validation_env)]
+
+    def _gather(self):
+        results, successes = zip(*[pipe.recv() for pipe in self.parent_pipes])
+        self._raise_if_errors(successes)
+        merged = {}
+        for result in results:
+            merged.update(result)
+        return merged
+
+    def _read_results(self, indices, results):
+        observations = [results[i][0] for i in indices]
+        masks = [results[i][1] for i in indices]
+        if self.shared_memory:
+            observations = read_from_shared_memory(
+                [self._obs_buffer[i] for i in indices],
+                len(indices),
+                self.transport,
+                updates=observations,
+                copy=self.copy,
+            )
+        return observations, masks
+
+
+def _validation_worker(
+    index, env_fn, pipe, parent_pipe, shared_memory, transport, error_queue
+):
+    group = env_fn()
+    parent_pipe.close()
+
+    def send_obs(i, observation):
+        if shared_memory is None:
+            return observation
+        return write_to_shared_memory(i, observation, shared_memory, transport)
+
+    try:
+        while True:
+            command, data = pipe.recv()
+            if command == "reset":
+                results = {}
+                for i, env in group.envs.items():
+                    observation, info = env.reset(**data)
+                    results[i] = (send_obs(i, observation), info["mask"])
+                pipe.send((results, True))
+            elif command == "step":
+                results = {}
+                for i, action in data.items():
+                    observation, _, done, _, info = group.envs[i].step(action)
+                    if done:
+                        results[i] = None
+                    else:
+                        results[i] = (send_obs(i, observation), info["mask"])
+                pipe.send((results, True))
+            elif command == "get_envs":
+                pipe.send((group.envs, True))
+            elif command == "close":
+                pipe.send((None, True))
+                break
+            else:
+                raise RuntimeError(
+                    f"Received unknown command `{command}`. Must "
+                    "be one of {`reset`, `step`, `get_envs`, `close`}."
+                )
+    except (KeyboardInterrupt, Exception):
+        error_queue.put((index,) + sys.exc_info()[:2])
+        pipe.send((None, False))
+    finally:
+        group.close()
@@ -1,19 +1,21 @@
+import collections
+
 import numpy as np
 
 # import matplotlib.pyplot as plt
 import time
-from psp.utils.utils import compute_resources_graph_torch
+from psp.utils.utils import (
+    compute_resources_graph_torch,
+    compute_calendar_open_time,
+    compute_ends_with_calendar,
+)
 from psp.utils.resource_timeline import ResourceTimeline
 from psp.utils.resource_flowgraph import ResourceFlowGraph
+from psp.utils.resource_timeline_tree import ResourceTimelineTree
 from psp.solution import Solution
 
 from concurrent.futures import ThreadPoolExecutor
 
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
-from matplotlib.pyplot import cm
-import io
-import cv2
 import torch
 import dgl
 import bisect
@@ -27,6 +29,7 @@ class GState:
         problem,
         deterministic=True,
         observe_conflicts_as_cliques=True,
+        resource_model="flowGraph",  # or timelineTree
         normalize_features=True,
     ):
         # self.tpe = ThreadPoolExecutor()
@@ -44,7 +47,13 @@ class GState:
         self.deterministic = deterministic
         self.observe_conflicts_as_cliques = observe_conflicts_as_cliques
         self.env_specification = env_specification
-        self.resourceModel = ResourceFlowGraph
+        self.resource_model = resource_model
+        if self.resource_model == "flowGraph":
+            self.resourceModel = ResourceFlowGraph
+        elif self.resource_model == "timelineTree":
+            self.resourceModel = ResourceTimelineTree
+        else:
+            raise Exception(f"resource model {resource_model} not recognized")
 
         self.normalize = normalize_features
 
@@ -97,6 +106,7 @@ class GState:
         # nx.draw_networkx(self.graph)
         # plt.show()
         # self.numpy_problem_graph = np.transpose(np.array(self.problem_edges))
+        self.compute_prec_levels()
 
         self.reset_graph()
         self.reset_fresh_nodes()
@@ -106,6 +116,7 @@ class GState:
         self.reset_resources()
         self.reset_selectable()
         self.reset_type()
+        self.resource_conf = None
         self.reset_conflicts_as_cliques()
 
         # self.resources_edges.append((prec, succ))
@@ -131,17 +142,78 @@ class GState:
             d[zero_length] = durs[zero_length, 0]
             return d
 
+    def compute_prec_levels(self):
+        # static structure used by update_completion_times : nodes are ranked by
+        # topological level (longest path from a source), predecessor edges grouped by
+        # level of their destination (CSR) and padded successors, all given as ranks
+        edges = np.unique(
+            np.array(self.problem_edges, dtype=np.int64).reshape(-1, 2), axis=0
+        )
+        n_succ = np.bincount(edges[:, 0], minlength=self.n_nodes)
+        succ = np.full((self.n_nodes + 1, max(n_succ.max(initial=0), 1)), self.n_nodes)
+        # edges are sorted by source
+        succ[
+            edges[:, 0],
+            np.arange(edges.shape[0]) - (np.cumsum(n_succ) - n_succ)[edges[:, 0]],
+        ] = edges[:, 1]
+
+        level = np.full(self.n_nodes + 1, -1, dtype=np.int64)
+        n_waiting = np.append(np.bincount(edges[:, 1], minlength=self.n_nodes), 0)
+        frontier = np.flatnonzero(n_waiting[:-1] == 0)
+        depth = 0
+        while frontier.size > 0:
+            level[frontier] = depth
+            next_nodes = succ[frontier].ravel()
+            next_nodes = next_nodes[next_nodes != self.n_nodes]
+            n_waiting -= np.bincount(next_nodes, minlength=self.n_nodes + 1)
+            frontier = np.unique(next_nodes[n_waiting[next_nodes] == 0])
+            depth += 1
+        assert np.all(level[:-1] >= 0), "precedence graph has a cycle"
+
+        order = np.argsort(level[:-1], kind="stable")
+        # rank of every node in the topological order, padding gets -1 which is
+        # never the latest rank
+        rank = np.empty(self.n_nodes + 1, dtype=np.int64)
+        rank[order] = np.arange(self.n_nodes)
+        rank[-1] = -1
+        level_ptr = np.searchsorted(level[order], np.arange(depth + 1))
+        by_level = np.argsort(rank[edges[:, 1]], kind="stable")
+
+        self.prec_level_ptr = level_ptr.tolist()
+        self.prec_edge_ptr = np.searchsorted(
+            level[edges[by_level, 1]], np.arange(depth + 1)
+        ).tolist()
+        self.prec_order = torch.tensor(order, device=self.device)
+        self.prec_rank = torch.tensor(rank, device=self.device)
+        self.prec_succ = torch.tensor(rank[succ[order]], device=self.device)
+        self.prec_pred_src = torch.tensor(rank[edges[by_level, 0]], device=self.device)
+        # position of the destination in its level, once per completion time
+        self.prec_pred_pos = (
+            torch.tensor(
+                rank[edges[by_level, 1]] - level_ptr[level[edges[by_level, 1]]],
+                device=self.device,
+            )
+            .unsqueeze(1)
+            .expand(-1, 4)
+            .contiguous()
+        )
+
     def reset_fresh_nodes(self):
         self.fresh_nodes = list(range(self.n_nodes))
 
     def reset_conflicts_as_cliques(self):
         if self.observe_conflicts_as_cliques:
+            # conflicts only depend on the problem, computed on first reset only
+            if self.resource_conf is None:
+                self.resource_conf = compute_resources_graph_torch(
+                    self.graph.ndata["resources"]["n"]
+                )
             (
                 resource_conf_edges,
                 resource_conf_id,
                 resource_conf_val,
                 resource_conf_val_r,
-            ) = compute_resources_graph_torch(self.graph.ndata["resources"]["n"])
+            ) = self.resource_conf
             self.graph.add_edges(
                 resource_conf_edges[0],
                 resource_conf_edges[1],
@@ -215,7 +287,6 @@ class GState:
 
         self.pred_cache = {}
         self.suc_cache = {}
-        self.indeg_cache = {}
         for n in range(self.graph.num_nodes(ntype="n")):
             # self.pred_cache[n] = self.graph.predecessors(n, etype="prec")
             self.pred_cache[n] = self.graph._graph.predecessors(
@@ -225,7 +296,6 @@ class GState:
             self.suc_cache[n] = self.graph._graph.successors(
                 self.graph.get_etype_id("prec"), n
             )
-            self.indeg_cache[n] = self.graph.in_degrees(n, etype="prec")
 
         self.graph.ndata["job"] = {
             "n": torch.zeros(self.n_nodes, dtype=torch.int, device=self.device)
@@ -303,11 +373,16 @@ class GState:
         self.reset_conflicts_as_cliques()
 
     def reset_frontier(self):
-        self.nodes_in_frontier = set()
-        for r in self.resources:
+        # frontier nodes of every (resource, timeindex) and number of these frontiers
+        # each node is in, updated for the resources consumed since last update
+        self.frontiers = {}
+        self.frontier_counts = collections.Counter()
+        self.frontiers_to_update = set()
+        for r, res in enumerate(self.resources):
             for i in range(1, 4):
-                for fe in r[i].frontier:
-                    self.nodes_in_frontier.add(fe[1])
+                self.frontiers[(r, i)] = res[i].frontier_nodes()
+                self.frontier_counts.update(self.frontiers[(r, i)])
+        self.nodes_in_frontier = set(self.frontier_counts)
 
     def reset_resources(self):
         if isinstance(self.problem, dict):
@@ -410,6 +485,7 @@ class GState:
                     + self.problem.n_nonrenewable_resources
                 ):
                     self.res_cal.append(self.problem.cals[self.problem.res_cal[r]])
+                self.reset_calendars_open_time()
                 self.res_cal_id = [
                     list(self.problem.cals.keys()).index(c)
                     for c in self.problem.res_cal
@@ -449,6 +525,10 @@ class GState:
         self.graph.ndata["tct"] = {
             "n": torch.zeros((self.n_nodes, 3), dtype=torch.float, device=self.device)
         }
+        # durations do not change until next reset
+        self.prec_durations = torch.cat(
+            [self.all_duration_real().unsqueeze(1), self.all_durations()], dim=1
+        )[self.prec_order]
         self.update_completion_times(None)
 
     ############################### ACCESSORS ############################
@@ -582,9 +662,9 @@ class GState:
         if self.remove_old_resource_info:
             self.remove_res_frontier(nodes_removed_from_frontier)
         if self.add_rp_edges == "frontier":
-            self.remove_rp_edges(strict=False)
+            self.remove_rp_edges(nodes_removed_from_frontier | {node_id}, strict=False)
         elif self.add_rp_edges == "frontier_strict":
-            self.remove_rp_edges(strict=True)
+            self.remove_rp_edges(nodes_removed_from_frontier | {node_id}, strict=True)
         if self.remove_past_prec:
             self.remove_past_edges(nodes_removed_from_frontier, node_id)
 
@@ -598,42 +678,19 @@ class GState:
                     break
 
     def render_fail(self):
-        plt.text(
-            0.5,
-            0.5,
-            "invalid",
-            size=50,
-            rotation=0.0,
-            ha="center",
-            va="center",
-            bbox=dict(
-                boxstyle="round",
-                ec=(1.0, 0.5, 0.5),
-                fc=(1.0, 0.8, 0.8),
-            ),
-        )
-        figimg = io.BytesIO()
-        plt.savefig(figimg, format="png", dpi=150)
-        plt.clf()
-        plt.close("all")
-        figimg.seek(0)
-        npimg = np.fromstring(figimg.read(), dtype="uint8")
-        cvimg = cv2.imdecode(npimg, cv2.IMREAD_UNCHANGED)
-        npimg = np.transpose(cvimg, (2, 0, 1))
-        torchimg = torch.from_numpy(npimg)
-        return torchimg
+        from psp.utils.render import render_fail
+
+        return render_fail()
 
     def render_solution(self, schedule, scaling=1.0):
         starts = [int(i * scaling) for i in schedule[0]]
         modes = schedule[1]
         if isinstance(self.problem, dict):
             n_jobs = self.problem["n_jobs"]
-            nres = self.problem["n_resources"]
             maxres = self.problem["resource_availability"]
             rusage = [self.problem["resources"][j][modes[j]] for j in range(n_jobs)]
         else:
             n_jobs = self.problem.n_jobs
-            nres = self.problem.n_resources
             maxres = self.problem.resource_availabilities
             rusage = [self.problem.resource_cons[j][modes[j]] for j in range(n_jobs)]
 
@@ -643,62 +700,9 @@ class GState:
             for j in range(n_jobs)
         ]
 
-        levels = []
-        for r in range(nres):
-            levels.append([0] * int((max(ends) + 1)))
-
-        # color = cm.gnuplot2(np.linspace(0, 1, n_jobs))
-        color = cm.rainbow(np.linspace(0, 1, len(starts)))
-
-        fig, ax = plt.subplots(nres)
-        for i in range(nres):
-            ax[i].set_xlim([-1, max(ends) * 1.2])
-            ax[i].set_ylim([0, maxres[i]])
-            ax[i].set_ylabel(f"R {i+1}")
-
-        patches = []
-
-        for i in range(n_jobs):
-            for r in range(nres):
-                rect = Rectangle(
-                    (starts[i], levels[r][starts[i]]),
-                    ends[i] - starts[i],
-                    rusage[i][r],
-                    edgecolor=color[i],
-                    facecolor=color[i],
-                    fill=True,
-                    alpha=0.2,
-                    lw=1,
-                    label=f"J{i}/m{modes[i]}",
-                )
-                ax[r].add_patch(rect)
-                if rusage[i][r] != 0:
-                    max_level = max(levels[r][starts[i] : ends[i] + 1])
-                    ax[r].text(
-                        starts[i] + (ends[i] - starts[i]) / 2,
-                        max_level + rusage[i][r] / 2 - 0.2,
-                        str(i),
-                        color=color[i],
-                    )
-                for t in range(starts[i], ends[i]):
-                    levels[r][t] += rusage[i][r]
-                if r == 0:
-                    patches.append(rect)
-
-        ax[nres - 1].set_xlabel("time")
-        fig.tight_layout(pad=2)
-        fig.legend(handles=patches)
-
-        figimg = io.BytesIO()
-        fig.savefig(figimg, format="png", dpi=150)
-        plt.clf()
-        plt.close("all")
-        figimg.seek(0)
-        npimg = np.fromstring(figimg.read(), dtype="uint8")
-        cvimg = cv2.imdecode(npimg, cv2.IMREAD_UNCHANGED)
-        npimg = np.transpose(cvimg, (2, 0, 1))
-        torchimg = torch.from_numpy(npimg)
-        return torchimg
+        from psp.utils.render import render_resource_usage
+
+        return render_resource_usage(starts, ends, modes, rusage, maxres)
 
     def get_solution(self):
         if not self.succeeded():
@@ -821,6 +825,15 @@ class GState:
             # extract graph info
             self.update_resource_prec(constraining_resource)
 
+    def reset_calendars_open_time(self):
+        # cumulated open times of every calendar, shared by resources of same calendar
+        open_times = {}
+        self.res_cal_open_time = []
+        for cal in self.res_cal:
+            if id(cal) not in open_times:
+                open_times[id(cal)] = compute_calendar_open_time(cal)
+            self.res_cal_open_time.append(open_times[id(cal)])
+
     def compute_ends_with_cal(self, node_id, resources_used, start):
         durations = self.durations(node_id)
         duration_real = self.duration_real(node_id)
@@ -832,69 +845,19 @@ class GState:
         if len(self.res_cal) == 0:
             return end_dates, end_date_real
 
+        # real, then min max mode
+        all_starts = start.cpu().numpy()
+        all_durations = torch.cat([duration_real.reshape(1), durations]).cpu().numpy()
+        all_ends = all_starts + all_durations
         for r in resources_used:
-            p = bisect.bisect(self.res_cal[r], start_real, key=lambda x: x[0]) - 1
-            if p == -1:  # date is before first interval
-                p = 0
-
-            remaining_duration = duration_real.item()  # do not forget to copy !
-            opening_duration = self.res_cal[r][p][1] - max(
-                self.res_cal[r][p][0], start_real
-            )
-
-            while remaining_duration > opening_duration:
-                remaining_duration -= opening_duration
-                p += 1
-                if p >= len(self.res_cal[r]):
-                    print("!!!!! not enough openings for task")
-                    print("time type: real")
-                    print("resource: ", r)
-                    print("calendar: ", self.res_cal[r])
-                    print("node_id: ", node_id)
-                    print("start time: ", start_real)
-                    print("duration", duration_real)
-                    print("remaining duration: ", remaining_duration)
-                    print("trying p:", p)
-                    exit()
-                opening_duration = self.res_cal[r][p][1] - self.res_cal[r][p][0]
-
-            local_end_date_real = (
-                max(start_real.item(), self.res_cal[r][p][0]) + remaining_duration
+            all_ends = np.maximum(
+                all_ends,
+                compute_ends_with_calendar(
+                    self.res_cal_open_time[r], all_starts, all_durations
+                ),
             )
-
-            if local_end_date_real > end_date_real:
-                end_date_real = local_end_date_real
-
-            for i in range(3):
-                p = bisect.bisect(self.res_cal[r], starts[i], key=lambda x: x[0]) - 1
-                if p == -1:
-                    p = 0
-                remaining_duration = durations[i].item()  # do not forget to copy !
-                opening_duration = self.res_cal[r][p][1] - max(
-                    self.res_cal[r][p][0], starts[i]
-                )
-                while remaining_duration > opening_duration:
-                    remaining_duration -= opening_duration
-                    p += 1
-                    if p >= len(self.res_cal[r]):
-                        print("!!!!! not enough openings for task")
-                        print("time type: ", i)
-                        print("resource: ", r)
-                        print("calendar: ", self.res_cal[r])
-                        print("node_id: ", node_id)
-                        print("start time: ", starts[i])
-                        print("duration", durations[i])
-                        print("remaining duration: ", remaining_duration)
-                        print("trying p:", p)
-                        exit()
-                    opening_duration = self.res_cal[r][p][1] - self.res_cal[r][p][0]
-                local_end_date = (
-                    max(starts[i], self.res_cal[r][p][0]) + remaining_duration
-                )
-                if local_end_date > end_dates[i]:
-                    end_dates[i] = local_end_date
-
-        return end_dates, end_date_real
+        all_ends = torch.tensor(all_ends, dtype=torch.float, device=self.device)
+        return all_ends[1:], all_ends[0]
 
     def update_resource_prec(self, constraining_resource):
         if self.factored_rp:
@@ -944,11 +907,18 @@ class GState:
         return [self.resources[rid][i].availability(level.item()) for i in range(4)]
 
     def resource_available_date_flowgraph(self, rid, level):
+        if self.resource_model == "timelineTree":
+            # only keep the date, resource precedences come from new_edges_cache
+            return [
+                self.resources[rid][i].availability(level.item())[0] for i in range(4)
+            ]
         return [self.resources[rid][i].availability(level.item()) for i in range(4)]
 
     def consume(self, timeindex, node_id, start, end):
         resources_used = torch.where(self.resources_usage(node_id) != 0)[0]
         for r in resources_used:
+            if timeindex != 0:
+                self.frontiers_to_update.add((r.item(), timeindex))
             self.resources[r][timeindex].consume(
                 node_id,
                 self.resource_usage(node_id, r).item(),
@@ -959,16 +929,7 @@ class GState:
 
     def update_completion_times_after(self, node_id):
         # for n in self.graph.successors(node_id, etype="prec"):
-        for n in self.cached_suc(node_id):
-            self.update_completion_times(n)
-
-    def max_thread_safe(self, cur_node_id):
-        return torch.max(
-            # self.tct(self.graph.predecessors(cur_node_id, etype="prec")), 0, True
-            self.tct(self.cached_pred(cur_node_id)),
-            0,
-            True,
-        )
+        self.update_completion_times(self.cached_suc(node_id))
 
     def cached_pred(self, node_id):
         return self.pred_cache[node_id]
@@ -981,128 +942,135 @@ class GState:
     def cached_suc(self, node_id):
         return self.suc_cache[node_id]
 
-    def cached_indeg(self, node_id):
-        return self.indeg_cache[node_id]
-
-    def update_completion_times(self, node_id):
-        initial_tct = False
-        if node_id is None:
-            indeg = self.graph.in_degrees(etype="prec")
-            open_nodes = torch.where(indeg == 0)[0].tolist()
-            initial_tct = True
+    def update_completion_times(self, node_ids):
+        # propagates completion times one topological level at a time, from all sources
+        # if node_ids is None, otherwise from node_ids to their successors as long as
+        # completion times change
+        # rows are in topological order, so that a level is a slice
+        # columns are real, then min max mode
+        tct = torch.cat([self.all_tct_real().unsqueeze(1), self.all_tct()], dim=1)[
+            self.prec_order
+        ]
+        durations = self.prec_durations
+        if node_ids is None:
+            level = 0
+            last_level = len(self.prec_level_ptr) - 2
         else:
-            open_nodes = [node_id.item()]
-        while open_nodes:
-            cur_node_id = open_nodes.pop(0)
-
-            # if self.graph.in_degrees(cur_node_id, etype="prec") == 0:
-            if self.cached_indeg(cur_node_id) == 0:
-                max_tct_predecessors = torch.zeros(
-                    (3), dtype=torch.float, device=self.device
-                )
-                max_tct_predecessors_real = torch.zeros(
-                    (1), dtype=torch.float, device=self.device
-                )
+            if len(node_ids) == 0:
+                return
+            ranks = self.prec_rank[node_ids]
+            dirty = torch.zeros(self.n_nodes + 1, dtype=torch.bool, device=self.device)
+            dirty[ranks] = True
+            level = bisect.bisect_right(self.prec_level_ptr, ranks.min().item()) - 1
+            last_rank = ranks.max().item()
+            last_level = bisect.bisect_right(self.prec_level_ptr, last_rank) - 1
+            n_changed = 0
+
+        while level <= last_level:
+            start, end = self.prec_level_ptr[level], self.prec_level_ptr[level + 1]
+            if level == 0:
+                # sources
+                new_tct = durations[start:end]
             else:
-                # max_tct_predecessors = torch.max(
-                #     self.tct(self.graph.predecessors(cur_node_id, etype="prec")),
-                #     0,
-                #     keepdim=True,
-                # )[0]
-                # max_tct_predecessors = self.tpe.submit(
-                #     self.max_thread_safe, cur_node_id
-                # ).result()[0]
-                # preds = self.graph.predecessors(cur_node_id, etype="prec")
-                preds = self.cached_pred(cur_node_id)
-                max_tct_predecessors = torch.from_numpy(
-                    np.max(
-                        self.tct(preds).to(torch.device("cpu")).numpy(),
-                        axis=0,
-                        keepdims=True,
-                    )
-                ).to(self.device)
-
-                # max_tct_predecessors_real = torch.max(
-                #     self.tct_real(self.graph.predecessors(cur_node_id, etype="prec"))
-                # )
-                max_tct_predecessors_real = torch.tensor(
-                    np.max(self.tct_real(preds).to(torch.device("cpu")).numpy())
-                ).to(self.device)
-
-            new_completion_time = max_tct_predecessors + self.durations(cur_node_id)
-            new_completion_time_real = max_tct_predecessors_real + self.duration_real(
-                cur_node_id
-            )
-
-            if (
-                initial_tct
-                or (
-                    torch.not_equal(
-                        new_completion_time_real, self.tct_real(cur_node_id)
+                estart, eend = self.prec_edge_ptr[level], self.prec_edge_ptr[level + 1]
+                new_tct = (
+                    torch.full((end - start, 4), -torch.inf, device=self.device)
+                    .scatter_reduce_(
+                        0,
+                        self.prec_pred_pos[estart:eend],
+                        tct[self.prec_pred_src[estart:eend]],
+                        "amax",
                     )
+                    .add_(durations[start:end])
                 )
-                or (
-                    torch.any(
-                        torch.not_equal(new_completion_time, self.tct(cur_node_id))
-                    )
+            if node_ids is None:
+                tct[start:end] = new_tct
+            else:
+                changed = torch.logical_and(
+                    dirty[start:end],
+                    torch.any(torch.not_equal(new_tct, tct[start:end]), dim=1),
                 )
-            ):
-                self.set_tct(cur_node_id, new_completion_time)
-                self.set_tct_real(cur_node_id, new_completion_time_real)
+                changed_ranks = torch.nonzero(changed).squeeze(1)
+                if len(changed_ranks) > 0:
+                    n_changed += len(changed_ranks)
+                    tct[start:end] = torch.where(
+                        changed.unsqueeze(1), new_tct, tct[start:end]
+                    )
+                    sucs = self.prec_succ[changed_ranks + start]
+                    dirty[sucs] = True
+                    last_rank = max(last_rank, sucs.max().item())
+                    last_level = bisect.bisect_right(self.prec_level_ptr, last_rank) - 1
+            level += 1
 
-                sucs = self.cached_suc(cur_node_id).tolist()
-                open_nodes = [n for n in open_nodes if n not in sucs]
-                open_nodes.extend(sucs)
+        if node_ids is None or n_changed > 0:
+            tct = tct[self.prec_rank[:-1]]
+            self.all_tct_real()[:] = tct[:, 0]
+            self.all_tct()[:] = tct[:, 1:]
 
     def update_frontier(self):
-        new_nodes_in_frontier = set()
-        for r in self.resources:
-            for i in range(1, 4):
-                for fe in r[i].frontier:
-                    new_nodes_in_frontier.add(fe[1])
-        removed_from_frontier = self.nodes_in_frontier - new_nodes_in_frontier
-        self.nodes_in_frontier = new_nodes_in_frontier
+        added, maybe_removed = set(), set()
+        for r, i in self.frontiers_to_update:
+            old_nodes = self.frontiers[(r, i)]
+            new_nodes = self.resources[r][i].frontier_nodes()
+            self.frontier_counts.update(new_nodes - old_nodes)
+            self.frontier_counts.subtract(old_nodes - new_nodes)
+            added |= new_nodes - old_nodes
+            maybe_removed |= old_nodes - new_nodes
+            self.frontiers[(r, i)] = new_nodes
+        self.frontiers_to_update.clear()
+        removed_from_frontier = set()
+        for n in maybe_removed:
+            if self.frontier_counts[n] == 0:
+                del self.frontier_counts[n]
+                removed_from_frontier.add(n)
+        self.nodes_in_frontier |= added
+        self.nodes_in_frontier -= removed_from_frontier
         return removed_from_frontier
 
-    def remove_rp_edges(self, strict):
-        # keep only edges with an end into the frontie
-        # remove edges with no end in the frontier
-        rp_edges = self.graph.edges(etype="rc", form="all")
-        nif = torch.tensor(list(self.nodes_in_frontier), dtype=torch.long)
-        c1 = torch.eq(rp_edges[0].unsqueeze(1), nif.unsqueeze(0))
-        c2 = torch.eq(rp_edges[1].unsqueeze(1), nif.unsqueeze(0))
-        # src_not_in_frontier = torch.logical_not(torch.any(c1, dim=1))
-        # dst_not_in_frontier = torch.logical_not(torch.any(c2, dim=1))
+    def incident_edges(self, nodes, etype, src=True, dst=True, form="eid"):
+        # edges of etype with their source and/or destination in nodes, from the
+        # in / out edges index of the graph
+        nodes = torch.tensor(list(nodes), dtype=torch.int64, device=self.device)
+        edges = []
+        if src:
+            edges.append(self.graph.out_edges(nodes, form="all", etype=etype))
+        if dst:
+            edges.append(self.graph.in_edges(nodes, form="all", etype=etype))
+        u, v, eids = [torch.cat(e) for e in zip(*edges)]
+        eids, first = np.unique(eids.numpy(), return_index=True)
+        if form == "eid":
+            return torch.from_numpy(eids)
+        return u[first], v[first], torch.from_numpy(eids)
+
+    def remove_rp_edges(self, nodes, strict):
+        # remove edges with no end in the frontier (not both ends if strict), only
+        # edges incident to nodes may have changed of status: nodes removed from the
+        # frontier and the affected node, the destination of the new edges
+        if not nodes or self.graph.num_edges(etype="rp") == 0:
+            return
+        u, v, eids = self.incident_edges(nodes, "rp", form="all")
+        frontier = torch.tensor(list(self.nodes_in_frontier), dtype=torch.int64)
+        u_in_frontier = torch.isin(u, frontier)
+        v_in_frontier = torch.isin(v, frontier)
         if strict:
-            c3 = torch.logical_or(c1, c2)
+            to_keep = torch.logical_and(u_in_frontier, v_in_frontier)
         else:
-            c3 = torch.logical_and(c1, c2)
-        to_remove = torch.where(c3)[0]
-        self.graph.remove_edges(rp_edges[2][to_remove], etype="rp")
+            to_keep = torch.logical_or(u_in_frontier, v_in_frontier)
+        self.graph.remove_edges(eids[torch.logical_not(to_keep)], etype="rp")
 
     def remove_res_frontier(self, nodes_removed_from_frontier):
         self.remove_res(list(nodes_removed_from_frontier))
-        if self.observe_conflicts_as_cliques:
-            rc_edges = self.graph.edges(etype="rc", form="all")
-            nrrf = torch.tensor(list(nodes_removed_from_frontier))
-            c1 = torch.eq(rc_edges[0].unsqueeze(1), nrrf.unsqueeze(0))
-            c2 = torch.eq(rc_edges[1].unsqueeze(1), nrrf.unsqueeze(0))
-            # src_in_removed = torch.any(c1, dim=1)
-            # dst_in_removed = torch.any(c2, dim=1)
-            to_remove = torch.where(torch.logical_or(c1, c2))[0]
-            eids = rc_edges[2][to_remove]
+        if self.observe_conflicts_as_cliques and nodes_removed_from_frontier:
+            eids = self.incident_edges(nodes_removed_from_frontier, "rc")
             self.graph.remove_edges(eids, etype="rc")
 
     def remove_past_edges(self, removed_from_frontier, newly_affected):
         nodes_to_remove = removed_from_frontier
         if not newly_affected in self.nodes_in_frontier:
             nodes_to_remove.add(newly_affected)
-        pr_edges = self.graph.edges(etype="prec", form="all")
-        nitr = torch.tensor(list(nodes_to_remove), dtype=torch.long)
-        c = torch.eq(pr_edges[1].unsqueeze(1), nitr.unsqueeze(0))
-        dst_in_nitr = torch.any(c, dim=1)
-        to_remove = torch.where(dst_in_nitr)[0]
-        self.graph.remove_edges(pr_edges[2][to_remove], etype="prec")
+        if nodes_to_remove:
+            eids = self.incident_edges(nodes_to_remove, "prec", src=False)
+            self.graph.remove_edges(eids, etype="prec")
 
     def rp_edges_to_keep(self):
         new_edges = []
@@ -3,18 +3,16 @@ import numpy as np
 # import matplotlib.pyplot as plt
 import networkx as nx
 import time
-from psp.utils.utils import compute_resources_graph_np
-from psp.utils.resource_timeline import ResourceTimeline
+from psp.utils.utils import (
+    compute_resources_graph_np,
+    compute_calendar_open_time,
+    compute_ends_with_calendar,
+)
 from psp.utils.resource_flowgraph import ResourceFlowGraph
+from psp.utils.resource_timeline_tree import ResourceTimelineTree
 from psp.solution import Solution
 
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
-from matplotlib.pyplot import cm
-import io
-import cv2
 import torch
-import bisect
 
 
 class State:
@@ -26,7 +24,7 @@ class State:
         problem,
         deterministic=True,
         observe_conflicts_as_cliques=True,
-        resource_model="flowGraph",  # or timeline
+        resource_model="flowGraph",  # or timelineTree
         normalize_features=True,
     ):
         self.problem = problem
@@ -43,8 +41,13 @@ class State:
         self.resource_model = resource_model
         if self.resource_model == "flowGraph":
             self.resourceModel = ResourceFlowGraph
+        elif self.resource_model == "timeline":
+            # ResourceTimeline has no frontier_nodes nor still_available
+            raise Exception("resource model timeline not supported, use timelineTree")
+        elif self.resource_model == "timelineTree":
+            self.resourceModel = ResourceTimelineTree
         else:
-            self.resourceModel = ResourceTimeline
+            raise Exception(f"resource model {resource_model} not recognized")
 
         self.normalize = normalize_features
 
@@ -196,20 +199,7 @@ class State:
         self.edge_index = {}
         self.resource_prec_att = []
         self.resource_prec_edges = []
-
-        if self.observe_conflicts_as_cliques:
-            (
-                self.resource_conf_edges,
-                self.resource_conf_id,
-                self.resource_conf_val,
-                self.resource_conf_val_r,
-            ) = compute_resources_graph_np(self.features[:, 10:])
-
-        else:
-            self.resource_conf_edges = None
-            self.resource_conf_id = None
-            self.resource_conf_val = None
-            self.resource_conf_val_r = None
+        # resource conflicts only depend on the problem, kept from __init__
 
         self.fast_forward()
 
@@ -231,8 +221,7 @@ class State:
         self.nodes_in_frontier = set()
         for r in self.resources:
             for i in range(1, 4):
-                for fe in r[i].frontier:
-                    self.nodes_in_frontier.add(fe[1])
+                self.nodes_in_frontier |= r[i].frontier_nodes()
 
     def reset_resources(self):
         if isinstance(self.problem, dict):
@@ -320,6 +309,7 @@ class State:
                     + self.problem.n_nonrenewable_resources
                 ):
                     self.res_cal.append(self.problem.cals[self.problem.res_cal[r]])
+                self.reset_calendars_open_time()
 
         assert len(self.resources) == self.n_resources
         self.reset_frontier()
@@ -529,8 +519,7 @@ class State:
             self.nodes_in_frontier = set()
             for r in self.resources:
                 for i in range(1, 4):
-                    for fe in r[i].frontier:
-                        self.nodes_in_frontier.add(fe[1])
+                    self.nodes_in_frontier |= r[i].frontier_nodes()
 
     def mask_wrt_non_renewable_resources(self):
         if isinstance(self.problem, dict):
@@ -552,42 +541,19 @@ class State:
                     break
 
     def render_fail(self):
-        plt.text(
-            0.5,
-            0.5,
-            "invalid",
-            size=50,
-            rotation=0.0,
-            ha="center",
-            va="center",
-            bbox=dict(
-                boxstyle="round",
-                ec=(1.0, 0.5, 0.5),
-                fc=(1.0, 0.8, 0.8),
-            ),
-        )
-        figimg = io.BytesIO()
-        plt.savefig(figimg, format="png", dpi=150)
-        plt.clf()
-        plt.close("all")
-        figimg.seek(0)
-        npimg = np.fromstring(figimg.read(), dtype="uint8")
-        cvimg = cv2.imdecode(npimg, cv2.IMREAD_UNCHANGED)
-        npimg = np.transpose(cvimg, (2, 0, 1))
-        torchimg = torch.from_numpy(npimg)
-        return torchimg
+        from psp.utils.render import render_fail
+
+        return render_fail()
 
     def render_solution(self, schedule, scaling=1.0):
         starts = [int(i * scaling) for i in schedule[0]]
         modes = schedule[1]
         if isinstance(self.problem, dict):
             n_jobs = self.problem["n_jobs"]
-            nres = self.problem["n_resources"]
             maxres = self.problem["resource_availability"]
             rusage = [self.problem["resources"][j][modes[j]] for j in range(n_jobs)]
         else:
             n_jobs = self.problem.n_jobs
-            nres = self.problem.n_resources
             maxres = self.problem.resource_availabilities
             rusage = [self.problem.resource_cons[j][modes[j]] for j in range(n_jobs)]
 
@@ -597,62 +563,9 @@ class State:
             for j in range(n_jobs)
         ]
 
-        levels = []
-        for r in range(nres):
-            levels.append([0] * int((max(ends) + 1)))
-
-        # color = cm.gnuplot2(np.linspace(0, 1, n_jobs))
-        color = cm.rainbow(np.linspace(0, 1, len(starts)))
-
-        fig, ax = plt.subplots(nres)
-        for i in range(nres):
-            ax[i].set_xlim([-1, max(ends) * 1.2])
-            ax[i].set_ylim([0, maxres[i]])
-            ax[i].set_ylabel(f"R {i+1}")
-
-        patches = []
-
-        for i in range(n_jobs):
-            for r in range(nres):
-                rect = Rectangle(
-                    (starts[i], levels[r][starts[i]]),
-                    ends[i] - starts[i],
-                    rusage[i][r],
-                    edgecolor=color[i],
-                    facecolor=color[i],
-                    fill=True,
-                    alpha=0.2,
-                    lw=1,
-                    label=f"J{i}/m{modes[i]}",
-                )
-                ax[r].add_patch(rect)
-                if rusage[i][r] != 0:
-                    max_level = max(levels[r][starts[i] : ends[i] + 1])
-                    ax[r].text(
-                        starts[i] + (ends[i] - starts[i]) / 2,
-                        max_level + rusage[i][r] / 2 - 0.2,
-                        str(i),
-                        color=color[i],
-                    )
-                for t in range(starts[i], ends[i]):
-                    levels[r][t] += rusage[i][r]
-                if r == 0:
-                    patches.append(rect)
-
-        ax[nres - 1].set_xlabel("time")
-        fig.tight_layout(pad=2)
-        fig.legend(handles=patches)
-
-        figimg = io.BytesIO()
-        fig.savefig(figimg, format="png", dpi=150)
-        plt.clf()
-        plt.close("all")
-        figimg.seek(0)
-        npimg = np.fromstring(figimg.read(), dtype="uint8")
-        cvimg = cv2.imdecode(npimg, cv2.IMREAD_UNCHANGED)
-        npimg = np.transpose(cvimg, (2, 0, 1))
-        torchimg = torch.from_numpy(npimg)
-        return torchimg
+        from psp.utils.render import render_resource_usage
+
+        return render_resource_usage(starts, ends, modes, rusage, maxres)
 
     def get_solution(self):
         if not self.succeeded():
@@ -832,10 +745,19 @@ class State:
         for i in range(3):
             self.consume(i + 1, node_id, start[i + 1], self.tct(node_id)[i])
 
-        if self.resource_model == "flowGraph" and self.add_rp_edges != "none":
+        if self.resource_model != "timeline" and self.add_rp_edges != "none":
             # extract graph info
             self.update_resource_prec(constraining_resource)
 
+    def reset_calendars_open_time(self):
+        # cumulated open times of every calendar, shared by resources of same calendar
+        open_times = {}
+        self.res_cal_open_time = []
+        for cal in self.res_cal:
+            if id(cal) not in open_times:
+                open_times[id(cal)] = compute_calendar_open_time(cal)
+            self.res_cal_open_time.append(open_times[id(cal)])
+
     def compute_ends_with_cal(self, node_id, resources_used, start):
         durations = self.durations(node_id)
         duration_real = self.duration_real(node_id)
@@ -845,44 +767,17 @@ class State:
         end_date_real = duration_real + start_real
         if len(self.res_cal) == 0:
             return end_dates, end_date_real
+        # real, then min max mode
+        all_durations = np.concatenate([[duration_real], durations])
+        all_ends = start + all_durations
         for r in resources_used:
-            p = bisect.bisect(self.res_cal[r], start_real, key=lambda x: x[0]) - 1
-            if p == -1:  # date is before first interval
-                p = 0
-            remaining_duration = duration_real
-            opening_duration = self.res_cal[r][p][1] - max(
-                self.res_cal[r][p][0], start_real
-            )
-            while remaining_duration > opening_duration:
-                remaining_duration -= opening_duration
-                p += 1
-                opening_duration = self.res_cal[r][p][1] - self.res_cal[r][p][0]
-            local_end_date_real = (
-                max(start_real, self.res_cal[r][p][0]) + remaining_duration
+            all_ends = np.maximum(
+                all_ends,
+                compute_ends_with_calendar(
+                    self.res_cal_open_time[r], start, all_durations
+                ),
             )
-            if local_end_date_real > end_date_real:
-                end_date_real = local_end_date_real
-
-            # TODO : check that end time is at end of window and not at start of next one
-            for i in range(3):
-                p = bisect.bisect(self.res_cal[r], starts[i], key=lambda x: x[0]) - 1
-                if p == -1:
-                    p = 0
-                remaining_duration = durations[i]
-                opening_duration = self.res_cal[r][p][1] - max(
-                    self.res_cal[r][p][0], starts[i]
-                )
-                while remaining_duration > opening_duration:
-                    remaining_duration -= opening_duration
-                    p += 1
-                    opening_duration = self.res_cal[r][p][1] - self.res_cal[r][p][0]
-                local_end_date = (
-                    max(starts[i], self.res_cal[r][p][0]) + remaining_duration
-                )
-                if local_end_date > end_dates[i]:
-                    end_dates[i] = local_end_date
-
-        return end_dates, end_date_real
+        return all_ends[1:], all_ends[0]
 
     def update_resource_prec(self, constraining_resource):
         if self.factored_rp:
@@ -904,8 +799,8 @@ class State:
 
         else:
             for r in range(self.n_resources):
-                if len(self.resources[r][1].new_edges_cache) != 0:
-                    for i in range(3):
+                for i in range(3):
+                    if len(self.resources[r][i + 1].new_edges_cache) != 0:
                         self.resource_prec_edges.extend(
                             self.resources[r][i + 1].new_edges_cache
                         )
@@ -929,6 +824,9 @@ class State:
         return [self.resources[rid][i].availability(level) for i in range(4)]
 
     def resource_available_date_flowgraph(self, rid, level):
+        if self.resource_model == "timelineTree":
+            # only keep the date, resource precedences come from new_edges_cache
+            return [self.resources[rid][i].availability(level)[0] for i in range(4)]
         return [self.resources[rid][i].availability(level) for i in range(4)]
 
     def consume(self, timeindex, node_id, start, end):
@@ -996,8 +894,7 @@ class State:
         new_nodes_in_frontier = set()
         for r in self.resources:
             for i in range(1, 4):
-                for fe in r[i].frontier:
-                    new_nodes_in_frontier.add(fe[1])
+                new_nodes_in_frontier |= r[i].frontier_nodes()
 
         removed_from_frontier = self.nodes_in_frontier - new_nodes_in_frontier
         self.remove_res(list(removed_from_frontier))
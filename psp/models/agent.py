@@ -23,8 +23,6 @@
 
 
 import torch
-import dgl
-import pickle
 
 from generic.agent import Agent
 from .gnn_dgl import GnnDGL
@@ -35,7 +33,9 @@ from functools import partial
 import numpy as np
 from .agent_observation import AgentObservation
 from .agent_graph_observation import AgentGraphObservation
+from .rwpe_cache import RWPECache
 import copy
+from alg.rollout_storage import RolloutStorage
 
 
 class Agent(Agent):
@@ -58,6 +58,7 @@ class Agent(Agent):
         )
 
         self.graphobs = graphobs
+        self.packed_actions = graphobs and self.agent_specification.fe_type == "dgl"
         if self.graphobs:
             self.obs_as_tensor_add_batch_dim = self._obs_as_tensor_add_batch_dim_graph
             self.obs_as_tensor = self._obs_as_tensor_graph
@@ -78,7 +79,10 @@ class Agent(Agent):
 
         if self.agent_specification.fe_type == "dgl":
             if agent_specification.cache_rwpe:
-                self.rwpe_cache = {}
+                self.rwpe_cache = RWPECache(
+                    max_size=agent_specification.rwpe_cache_size,
+                    shared=agent_specification.share_rwpe_cache,
+                )
             else:
                 self.rwpe_cache = None
 
@@ -215,8 +219,6 @@ class Agent(Agent):
         return AgentObservation.np_to_torch(obs)
 
     def _rebatch_obs(self, obs):
-        if isinstance(obs[0], str):
-            return obs
         return AgentObservation.rebatch_obs(obs)
 
     def _obs_as_tensor_add_batch_dim_graph(self, obs):
@@ -224,8 +226,16 @@ class Agent(Agent):
             cobs = obs
         else:
             cobs = copy.deepcopy(obs)
-        return AgentGraphObservation.rewire_internal(
-            cobs,
+        return self._rewire_graph(cobs)
+
+    def _obs_as_tensor_graph(self, obs):
+        return [self._rewire_graph(o) for o in obs]
+
+    def _rewire_graph(self, obs):
+        # observations are rewired once here, before being stored in the rollout, so
+        # that minibatches of all epochs are only batched
+        g = AgentGraphObservation.rewire_internal(
+            obs,
             conflicts=self.agent_specification.conflicts,
             bidir=True,
             compute_laplacian_pe=False,
@@ -233,36 +243,26 @@ class Agent(Agent):
             rwpe_k=self.agent_specification.rwpe_k,
             rwpe_cache=self.rwpe_cache,
         )
-
-    def _obs_as_tensor_graph(self, obs):
-        return [
-            AgentGraphObservation.rewire_internal(
-                o,
-                conflicts=self.agent_specification.conflicts,
-                bidir=True,
-                compute_laplacian_pe=False,
-                laplacian_pe_cache=None,
-                rwpe_k=self.agent_specification.rwpe_k,
-                rwpe_cache=self.rwpe_cache,
-            )
-            for o in obs
-        ]
+        if self.agent_specification.fe_type == "dgl":
+            g = self.gnn.rewire_observation(g)
+        return g
 
     def _rebatch_obs_graph(self, obs):
         # we need to flatten a list of list into a single list
-        if isinstance(obs[0], str):
-            return obs
         return sum(obs, [])
 
+    def get_n_nodes(self, obs):
+        # number of nodes of the observations, to pack their masks
+        return [int(torch.count_nonzero(o.ndata["rewired"] == 0)) for o in obs]
+
     def _get_obs_graph(self, b_obs, mb_ind):
-        if isinstance(b_obs[0], str):
-            return [dgl.load_graphs(b_obs[i])[0][0] for i in mb_ind]
+        if isinstance(b_obs, RolloutStorage):
+            return b_obs.get(mb_ind)
         return list(b_obs[i] for i in mb_ind)
 
     def _get_obs(self, b_obs, mb_ind):
-        if isinstance(b_obs, list):
-            list_obs = [pickle.load(open(b_obs[i], "rb")) for i in mb_ind]
-            return self.rebatch_obs(list_obs)
+        if isinstance(b_obs, RolloutStorage):
+            return self.rebatch_obs(b_obs.get(mb_ind))
         minibatched_obs = {}
         for key in b_obs:
             minibatched_obs[key] = b_obs[key][mb_ind]
@@ -210,6 +210,16 @@ class AgentGraphObservation:
         self.res_cal_id = []
 
         self.n_graphs = len(graph_observation)
+        # graphs rewired once by GnnDGL.rewire_observation are only batched
+        self.rewired = all(g.ntypes == ["n"] for g in graph_observation)
+        if self.rewired:
+            if do_batch:
+                self.glist = False
+                self.graphs = dgl.batch(graph_observation)
+            else:
+                self.glist = True
+                self.graphs = graph_observation
+            return
 
         for g in graph_observation:
             if rewire_internal:
@@ -246,15 +256,5 @@ class AgentGraphObservation:
     @classmethod
     def rwpe(cls, g, k, rwpe_cache):
         if rwpe_cache is not None:
-            edges = g.edges(order="srcdst")
-            key = (
-                g.num_nodes(),
-                *(edges[0].tolist() + edges[1].tolist()),
-            )
-            if key in rwpe_cache:
-                return rwpe_cache[key]
-            else:
-                pe = dgl.random_walk_pe(g, k)
-                rwpe_cache[key] = pe
-                return pe
+            return rwpe_cache.random_walk_pe(g, k)
         return dgl.random_walk_pe(g, k)
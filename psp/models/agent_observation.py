@@ -534,15 +534,5 @@ class AgentObservation:
 
     def rwpe(self, g, k):
         if self.rwpe_cache is not None:
-            edges = g.edges(order="srcdst")
-            key = (
-                g.num_nodes(),
-                *(edges[0].tolist() + edges[1].tolist()),
-            )
-            if key in self.rwpe_cache:
-                return self.rwpe_cache[key]
-            else:
-                pe = dgl.random_walk_pe(g, k)
-                self.rwpe_cache[key] = pe
-                return pe
+            return self.rwpe_cache.random_walk_pe(g, k)
         return dgl.random_walk_pe(g, k)
@@ -21,6 +21,7 @@
 # along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
 #
 
+import collections
 
 from generic.mlp import MLP
 import torch
@@ -33,6 +34,30 @@ from .agent_graph_observation import AgentGraphObservation
 from .edge_embedder import PspEdgeEmbedder
 from .rewiring import rewire, homogeneous_edges
 
+# features: (total number of nodes, features_dim), node embeddings concatenated with
+# the embedding of their graph, graph_embedding: (batch_size, features_dim / 2),
+# n_nodes: (batch_size,) number of nodes of each graph
+PackedNodeFeatures = collections.namedtuple(
+    "PackedNodeFeatures", "features graph_embedding n_nodes"
+)
+
+
+def pad_nodes(node_features, n_nodes, max_n_nodes):
+    # (total number of nodes, d) to (batch_size, max_n_nodes, d)
+    graph_ids = torch.repeat_interleave(
+        torch.arange(len(n_nodes), device=n_nodes.device), n_nodes
+    )
+    first_nodes = torch.cumsum(n_nodes, 0) - n_nodes
+    node_ids = (
+        torch.arange(node_features.shape[0], device=n_nodes.device)
+        - first_nodes[graph_ids]
+    )
+    padded = node_features.new_zeros(
+        (len(n_nodes), max_n_nodes, node_features.shape[1])
+    )
+    padded[graph_ids, node_ids] = node_features
+    return padded
+
 
 class GnnDGL(torch.nn.Module):
     def __init__(
@@ -243,7 +268,47 @@ class GnnDGL(torch.nn.Module):
         for egat in self.features_extractors:
             egat.reset_parameters()
 
-    def forward(self, obs):
+    def rewire(self, g, batch_size):
+        return rewire(
+            g,
+            self.graph_pooling,
+            self.conflicts == "node",
+            self.vnode,
+            batch_size,
+            self.input_dim_features_extractor,
+            self.max_n_resources,
+            6,
+            7,
+            10,
+            10,
+            8,
+            9,
+            self.graphobs,
+        )
+
+    def rewire_observation(self, g):
+        # rewires a single graph observation once, when it is stored, so that forward
+        # only batches it; ndata["rewired"] is 0 for the nodes of the observation, 1
+        # for resource nodes, 2 for pool nodes and 3 for virtual nodes
+        res_cal_id = g.ndata["res_cal"]["global_data"][0]
+        g = dgl.node_type_subgraph(g, ["n"])
+        g, poolnodes, resource_nodes, vnodes = self.rewire(g, 1)
+        rewired = torch.zeros(g.num_nodes(), dtype=torch.int64)
+        res_cal = torch.zeros(g.num_nodes(), dtype=res_cal_id.dtype)
+        if resource_nodes is not None:
+            rewired[resource_nodes] = 1
+            res_cal[resource_nodes] = res_cal_id
+        if poolnodes is not None:
+            rewired[poolnodes] = 2
+        if vnodes is not None:
+            rewired[vnodes] = 3
+        g.ndata["rewired"] = rewired
+        g.ndata["res_cal"] = res_cal
+        return g
+
+    def forward(self, obs, packed=False):
+        # node embeddings concatenated with the graph embedding, padded to
+        # (batch_size, max_n_nodes, features_dim), or as PackedNodeFeatures if packed
         if self.graphobs:
             observation = AgentGraphObservation(
                 obs,
@@ -256,12 +321,10 @@ class GnnDGL(torch.nn.Module):
                 rewire_internal=False,
             )
             g = observation.graphs
-            res_cal_id = torch.cat(observation.res_cal_id)
             batch_size = observation.n_graphs
-            num_nodes = g.num_nodes()
-            if batch_size == 1:
-                n_nodes = g.batch_num_nodes("n")[0].item()
-            else:
+            if not observation.rewired:
+                res_cal_id = torch.cat(observation.res_cal_id)
+                num_nodes = g.num_nodes()
                 n_nodes = g.batch_num_nodes("n")
 
         else:
@@ -283,22 +346,25 @@ class GnnDGL(torch.nn.Module):
             n_nodes = observation.get_n_nodes()
             num_nodes = g.num_nodes()
 
-        g, poolnodes, resource_nodes, vnodes = rewire(
-            g,
-            self.graph_pooling,
-            self.conflicts == "node",
-            self.vnode,
-            batch_size,
-            self.input_dim_features_extractor,
-            self.max_n_resources,
-            6,
-            7,
-            10,
-            10,
-            8,
-            9,
-            self.graphobs,
-        )
+        if self.graphobs and observation.rewired:
+            # observations rewired by rewire_observation, the extra nodes of every
+            # graph following its own nodes
+            rewired = g.ndata["rewired"]
+            node_index = torch.where(rewired == 0)[0]
+            resource_nodes = torch.where(rewired == 1)[0]
+            poolnodes = torch.where(rewired == 2)[0]
+            vnodes = torch.where(rewired == 3)[0]
+            res_cal_id = g.ndata["res_cal"][resource_nodes]
+            num_nodes = len(node_index)
+            n_nodes = torch.bincount(
+                torch.repeat_interleave(torch.arange(batch_size), g.batch_num_nodes())[
+                    node_index
+                ],
+                minlength=batch_size,
+            )
+        else:
+            node_index = None
+            g, poolnodes, resource_nodes, vnodes = self.rewire(g, batch_size)
 
         if self.add_self_loops:
             if self.graphobs:
@@ -455,75 +521,45 @@ class GnnDGL(torch.nn.Module):
                 features_list, axis=1
             )  # The final embedding is concatenation of all layers embeddings
 
-        node_features = features[:num_nodes, :]
-
-        if self.graphobs and batch_size != 1:
-            if self.graph_pooling == "max":
-                graph_embedding = []
-                startelt = 0
-                for i in range(batch_size):
-                    nn = n_nodes[i]
-                    graph_embedding.append(
-                        torch.max(node_features[startelt : startelt + nn], dim=0)[0]
-                    )
-                    startelt += nn
-                graph_embedding = torch.stack(graph_embedding)
-            elif self.graph_pooling == "avg":
-                graph_embedding = []
-                startelt = 0
-                for i in range(batch_size):
-                    nn = n_nodes[i]
-                    gp = torch.ones(nn, device=node_features.device) / nn
-                    graph_embedding.append(
-                        torch.matmul(gp, node_features[startelt : startelt + nn])
-                    )
-                    startelt += nn
-                graph_embedding = torch.stack(graph_embedding)
-            elif self.graph_pooling in ["learn", "learninv"]:
-                graph_embedding = features[poolnodes, :]
-
-            nnf = []
-            startelt = 0
-            for i in range(batch_size):
-                nn = n_nodes[i]
-                nnf.append(
-                    torch.nn.functional.pad(
-                        node_features[startelt : startelt + nn],
-                        (0, 0, 0, self.max_n_nodes - nn),
-                        mode="constant",
-                        value=0.0,
-                    )
-                )
-                startelt += nn
-            node_features = torch.stack(nnf)
+        if node_index is None:
+            node_features = features[:num_nodes, :]
+        else:
+            node_features = features[node_index.to(features.device)]
 
+        # nodes of the batched graphs come first, graph by graph
+        if self.graphobs:
+            n_nodes = n_nodes.to(node_features.device)
         else:
-            node_features = node_features.reshape(batch_size, n_nodes, -1)
-
-            if self.graph_pooling == "max":
-                max_elts, _ = torch.max(node_features, dim=1)
-                graph_embedding = max_elts
-            elif self.graph_pooling == "avg":
-                graph_pooling = (
-                    torch.ones(n_nodes, device=node_features.device) / n_nodes
-                )
-                graph_embedding = torch.matmul(graph_pooling, node_features)
-            elif self.graph_pooling == "gap":
-                graph_embedding = self.gap(g, features)
-            elif self.graph_pooling in ["learn", "learninv"]:
-                graph_embedding = features[poolnodes, :]
-            else:
-                raise Exception(
-                    f"Graph pooling {self.graph_pooling} not recognized. Only accepted pooling are max and avg"
-                )
+            n_nodes = torch.full(
+                (batch_size,), n_nodes, dtype=torch.int64, device=node_features.device
+            )
+        if self.graph_pooling == "max":
+            graph_embedding = dgl.ops.segment_reduce(n_nodes, node_features, "max")
+        elif self.graph_pooling == "avg":
+            graph_embedding = dgl.ops.segment_reduce(n_nodes, node_features, "mean")
+        elif self.graph_pooling == "gap":
+            graph_embedding = self.gap(g, features)
+        elif self.graph_pooling in ["learn", "learninv"]:
+            graph_embedding = features[poolnodes, :]
+        else:
+            raise Exception(
+                f"Graph pooling {self.graph_pooling} not recognized. Only accepted pooling are max and avg"
+            )
 
-            node_features = torch.nn.functional.pad(
-                node_features,
-                (0, 0, 0, self.max_n_nodes - node_features.shape[1]),
-                mode="constant",
-                value=0.0,
+        if packed:
+            return PackedNodeFeatures(
+                torch.cat(
+                    (
+                        node_features,
+                        torch.repeat_interleave(graph_embedding, n_nodes, dim=0),
+                    ),
+                    dim=1,
+                ),
+                graph_embedding,
+                n_nodes,
             )
 
+        node_features = pad_nodes(node_features, n_nodes, self.max_n_nodes)
         graph_embedding = graph_embedding.reshape(batch_size, 1, -1)
         # repeat the graph embedding to match the nodes embedding size
         repeated = graph_embedding.expand(node_features.shape)
@@ -20,55 +20,55 @@
 # You should have received a copy of the GNU General Public License
 # along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
 #
+import functools
+
 import torch
 from .agent_observation import AgentObservation
 
 
+@functools.lru_cache(maxsize=128)
+def graph_index(batch_num_nodes):
+    # graph of every node of a batched graph, for a tuple of numbers of nodes (the
+    # same for all minibatches of problems of the same size)
+    return torch.repeat_interleave(
+        torch.arange(len(batch_num_nodes)), torch.tensor(batch_num_nodes)
+    )
+
+
 def learned_graph_pool(
     g,
     node_offset,
     resource_nodes,
     batch_size,
-    origbnn,
+    node_graph,
     input_dim_features_extractor,
     typeid,
     revtypeid,
     inverse_pooling=False,
     graphobs=False,
 ):
-    poolnodes = list(range(node_offset, node_offset + batch_size))
+    poolnodes = torch.arange(node_offset, node_offset + batch_size)
     data = torch.zeros((batch_size, input_dim_features_extractor))
     g.add_nodes(batch_size, data={"feat": data})
-    ei0 = []
-    ei1 = []
-    startnode = 0
-    for i in range(batch_size):
-        ei0 += [node_offset + i] * origbnn[i]
-        ei1 += list(range(startnode, startnode + origbnn[i]))
-        startnode += origbnn[i]
+    ei0 = node_offset + node_graph
+    ei1 = torch.arange(node_graph.shape[0])
 
     if resource_nodes is not None:
         num_res = len(resource_nodes) // batch_size
-        for i in range(batch_size):
-            ei1 += resource_nodes[i * num_res : (i + 1) * num_res]
-            ei0 += [node_offset + i] * num_res
+        ei0 = torch.cat(
+            [ei0, torch.repeat_interleave(poolnodes, num_res)],
+        )
+        ei1 = torch.cat([ei1, resource_nodes])
 
-    # g.add_edges(
-    #     list(range(node_offset, node_offset + batch_size)),
-    #     list(range(node_offset, node_offset + batch_size)),
-    #     data={"type": torch.LongTensor([0] * batch_size)},
-    # )
     if graphobs:
         g.add_edges(ei1, ei0, etype="pool")
     else:
-        g.add_edges(ei1, ei0, data={"type": torch.LongTensor([typeid] * len(ei0))})
+        g.add_edges(ei1, ei0, data={"type": torch.full_like(ei0, typeid)})
     if inverse_pooling:
         if graphobs:
             g.add_edges(ei0, ei1, etype="rpool")
         else:
-            g.add_edges(
-                ei0, ei1, data={"type": torch.LongTensor([revtypeid] * len(ei0))}
-            )
+            g.add_edges(ei0, ei1, data={"type": torch.full_like(ei0, revtypeid)})
 
     return g, poolnodes, node_offset + batch_size
 
@@ -77,7 +77,7 @@ def node_conflicts(
     g,
     node_offset,
     batch_size,
-    origbnn,
+    node_graph,
     first_res_index,
     max_n_resources,
     input_dim_features_extractor,
@@ -89,130 +89,63 @@ def node_conflicts(
     else:
         resources_used = g.ndata["feat"][:, first_res_index:]
     num_resources = resources_used.shape[1]
-    resource_nodes = list(range(node_offset, node_offset + num_resources * batch_size))
-    batch_id = []
-    for i, nn in enumerate(origbnn):
-        batch_id.extend([i] * nn)
-    batch_id = torch.IntTensor(batch_id)
+    resource_nodes = torch.arange(node_offset, node_offset + num_resources * batch_size)
     data = torch.zeros(
         (
             batch_size * max_n_resources,
             input_dim_features_extractor,
         )
     )
-    data[:, :] = torch.LongTensor(list(range(max_n_resources)) * batch_size).unsqueeze(
-        1
-    )
+    data[:, :] = torch.arange(max_n_resources).repeat(batch_size).unsqueeze(1)
     g.add_nodes(num_resources * batch_size, data={"feat": data})
     idxaffected = torch.where(resources_used != 0)
     consumers = idxaffected[0]
     nconsumers = consumers.shape[0]
-    resource_start_per_batch = []
-    for i in range(batch_size):
-        resource_start_per_batch.append(node_offset + num_resources * i)
-    resource_start_per_batch = torch.IntTensor(resource_start_per_batch)
-    resource_index = idxaffected[1] + resource_start_per_batch[batch_id[consumers]]
-
-    rntype = torch.LongTensor(
-        list(range(num_resources)) * batch_size
-    ) + torch.LongTensor([edge_type_offset] * len(resource_nodes))
+    resource_index = (
+        idxaffected[1] + node_offset + num_resources * node_graph[consumers]
+    )
 
     rc = torch.gather(resources_used[consumers], 1, idxaffected[1].unsqueeze(1)).expand(
         nconsumers, 2
     )
+    # edge type per resource : not better, nres dependent : DISCARD
+    conf_data = {
+        "type": torch.full((nconsumers,), edge_type_offset, dtype=torch.long),
+        "rid": idxaffected[1].int(),
+        "att_rc": rc,
+    }
+    rconf_data = {
+        "type": torch.full((nconsumers,), edge_type_offset + 1, dtype=torch.long),
+        "rid": idxaffected[1].int(),
+        "att_rc": rc,
+    }
 
     if graphobs:
-        g.add_edges(
-            consumers,
-            resource_index,
-            etype="nodeconf",
-            data={
-                "type": torch.LongTensor([edge_type_offset] * nconsumers),
-                # "type": torch.LongTensor(
-                #     [edge_type_offset + num_resources] * nconsumers
-                # )
-                # + idxaffected[1].long(),
-                "rid": idxaffected[1].int(),
-                "att_rc": rc,
-            },
-        )
-        g.add_edges(
-            resource_index,
-            consumers,
-            etype="rnodeconf",
-            data={
-                "type": torch.LongTensor([edge_type_offset + 1] * nconsumers),
-                # edge type per resource : not better, nres dependent : DISCARD
-                # "type": torch.LongTensor(
-                #     [edge_type_offset + 2 * num_resources] * nconsumers
-                # )
-                # + idxaffected[1].long(),
-                "rid": idxaffected[1].int(),
-                "att_rc": rc,
-            },
-        )
-
+        g.add_edges(consumers, resource_index, etype="nodeconf", data=conf_data)
+        g.add_edges(resource_index, consumers, etype="rnodeconf", data=rconf_data)
     else:
-        g.add_edges(
-            consumers,
-            resource_index,
-            data={
-                "type": torch.LongTensor([edge_type_offset] * nconsumers),
-                # edge type per resource : not better, nres dependent : DISCARD
-                # "type": torch.LongTensor([edge_type_offset] * nconsumers)
-                # + idxaffected[1].long(),
-                "rid": idxaffected[1].int(),
-                "att_rc": rc,
-            },
-        )
-        g.add_edges(
-            resource_index,
-            consumers,
-            data={
-                "type": torch.LongTensor([edge_type_offset + 1] * nconsumers),
-                # "type": torch.LongTensor(
-                #     [edge_type_offset + num_resources] * nconsumers
-                # )
-                # + idxaffected[1].long(),
-                "rid": idxaffected[1].int(),
-                "att_rc": rc,
-            },
-        )
+        g.add_edges(consumers, resource_index, data=conf_data)
+        g.add_edges(resource_index, consumers, data=rconf_data)
 
     # find unused resources
     # ad local self loops
     if graphobs:
-        unused_resources = torch.tensor(resource_nodes)[
+        unused_resources = resource_nodes[
             torch.where(g.in_degrees(v=resource_nodes, etype="nodeconf") == 0)[0]
         ]
-
-        g.add_edges(
-            unused_resources,
-            unused_resources,
-            etype="self",
-            data={
-                "type": torch.LongTensor(
-                    [AgentObservation.edgeType["self"]] * unused_resources.shape[0]
-                ),
-                "rid": torch.zeros_like(unused_resources, dtype=torch.int),
-                "att_rc": torch.zeros(unused_resources.shape[0], 2),
-            },
-        )
     else:
-        unused_resources = torch.tensor(resource_nodes)[
+        unused_resources = resource_nodes[
             torch.where(g.in_degrees(v=resource_nodes) == 0)[0]
         ]
-        g.add_edges(
-            unused_resources,
-            unused_resources,
-            data={
-                "type": torch.LongTensor(
-                    [AgentObservation.edgeType["self"]] * unused_resources.shape[0]
-                ),
-                "rid": torch.zeros_like(unused_resources, dtype=torch.int),
-                "att_rc": torch.zeros(unused_resources.shape[0], 2),
-            },
-        )
+    self_data = {
+        "type": torch.full_like(unused_resources, AgentObservation.edgeType["self"]),
+        "rid": torch.zeros_like(unused_resources, dtype=torch.int),
+        "att_rc": torch.zeros(unused_resources.shape[0], 2),
+    }
+    if graphobs:
+        g.add_edges(unused_resources, unused_resources, etype="self", data=self_data)
+    else:
+        g.add_edges(unused_resources, unused_resources, data=self_data)
     return g, resource_nodes, node_offset + num_resources * batch_size
 
 
@@ -221,38 +154,27 @@ def vnode(
     node_offset,
     batch_size,
     input_dim_features_extractor,
-    origbnn,
+    node_graph,
     etype,
     revetype,
     graphobs,
 ):
-    vnodes = list(range(node_offset, node_offset + batch_size))
+    vnodes = torch.arange(node_offset, node_offset + batch_size)
     data = torch.zeros((batch_size, input_dim_features_extractor))
     data[:, :4] = 3
     g.add_nodes(
         batch_size,
         data={"feat": data},
     )
-    ei0 = []
-    ei1 = []
-    startnode = 0
-    for i in range(batch_size):
-        ei0 += [node_offset + i] * origbnn[i]
-        ei1 += list(range(startnode, startnode + origbnn[i]))
-        startnode += origbnn[i]
-
-    # g.add_edges(
-    #     list(range(node_offset, node_offset + batch_size)),
-    #     list(range(node_offset, node_offset + batch_size)),
-    #     data={"type": torch.LongTensor([0] * batch_size)},
-    # )
+    ei0 = node_offset + node_graph
+    ei1 = torch.arange(node_graph.shape[0])
 
     if graphobs:
         g.add_edges(ei1, ei0, etype="vnode")
         g.add_edges(ei0, ei1, etype="rvnode")
     else:
-        g.add_edges(ei1, ei0, data={"type": torch.LongTensor([etype] * len(ei0))})
-        g.add_edges(ei0, ei1, data={"type": torch.LongTensor([revetype] * len(ei0))})
+        g.add_edges(ei1, ei0, data={"type": torch.full_like(ei0, etype)})
+        g.add_edges(ei0, ei1, data={"type": torch.full_like(ei0, revetype)})
 
     return g, vnodes, node_offset + batch_size
 
@@ -274,14 +196,14 @@ def rewire(
     graphobs,
 ):
     node_offset = g.num_nodes()
-    origbnn = g.batch_num_nodes()
+    node_graph = graph_index(tuple(g.batch_num_nodes().tolist()))
 
     if node_conflicting:
         g, resource_nodes, node_offset = node_conflicts(
             g,
             node_offset,
             batch_size,
-            origbnn,
+            node_graph,
             first_res_index,
             max_n_resources,
             input_dim_features_extractor,
@@ -298,7 +220,7 @@ def rewire(
             node_offset,
             resource_nodes,
             batch_size,
-            origbnn,
+            node_graph,
             input_dim_features_extractor,
             poolnodeetype,
             poolnoderevetype,
@@ -314,7 +236,7 @@ def rewire(
             node_offset,
             batch_size,
             input_dim_features_extractor,
-            origbnn,
+            node_graph,
             vnodeetype,
             vnoderevetype,
             graphobs,
@@ -0,0 +1,124 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+import hashlib
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+
+import dgl
+
+
+class LRUStore:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        pe = self.entries.get(key)
+        if pe is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return pe
+
+    def put(self, key, pe):
+        self.entries[key] = pe
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+        }
+
+
+class RWPECacheManager(BaseManager):
+    pass
+
+
+RWPECacheManager.register("LRUStore", LRUStore)
+
+
+class RWPECache:
+    """
+    Bounded LRU cache of dgl.random_walk_pe results, keyed by the number of nodes, the
+    number of steps and a digest of the (sorted) edges of the graph.
+    If shared, the entries live in a manager process and the cache can be handed to
+    worker processes (the manager proxy is picklable).
+    """
+
+    def __init__(self, max_size=10000, shared=False):
+        self.max_size = max_size
+        self.shared = shared
+        if shared:
+            self.manager = RWPECacheManager()
+            self.manager.start()
+            self.store = self.manager.LRUStore(max_size)
+        else:
+            self.manager = None
+            self.store = LRUStore(max_size)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the manager is owned by the creating process, workers only use the proxy
+        state["manager"] = None
+        return state
+
+    @staticmethod
+    def key(g, k):
+        src, dst = g.edges(order="srcdst")
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(src.cpu().numpy().tobytes())
+        digest.update(dst.cpu().numpy().tobytes())
+        return (g.num_nodes(), k, digest.digest())
+
+    def random_walk_pe(self, g, k):
+        key = self.key(g, k)
+        pe = self.store.get(key)
+        if pe is None:
+            pe = dgl.random_walk_pe(g, k)
+            self.store.put(key, pe)
+        return pe
+
+    def stats(self):
+        stats = self.store.stats()
+        queries = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / queries if queries > 0 else 0.0
+        return stats
+
+    def close(self):
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
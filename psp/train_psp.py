@@ -55,7 +55,11 @@ def main(args, exp_name) -> float:
 
     # If we want to load a specific problem, under the taillard (extended) format, and train on it, we first do it.
     # Note that this problem can be stochastic or deterministic
-    loader = PSPLoader(generate_bounds=args.generate_duration_bounds)
+    loader = PSPLoader(
+        generate_bounds=args.generate_duration_bounds,
+        cache_dir=args.instance_cache_dir,
+        n_workers=args.n_loader_workers,
+    )
 
     assert (
         args.random_taillard
@@ -133,14 +137,19 @@ def main(args, exp_name) -> float:
         fixed_validation=args.fixed_validation,
         fixed_random_validation=args.fixed_random_validation,
         validation_batch_size=args.validation_batch_size,
+        n_validation_workers=args.n_validation_workers,
+        async_validation=args.async_validation,
         validation_freq=1 if args.validation_freq == -1 else args.validation_freq,
         display_env=exp_name,
         path=path,
         custom_heuristic_names=args.custom_heuristic_names,
         ortools_strategy=args.ortools_strategy,
         max_time_ortools=args.max_time_ortools,
+        n_ortools_workers=args.n_ortools_workers,
+        ortools_cache_dir=args.ortools_cache_dir,
         scaling_constant_ortools=args.scaling_constant_ortools,
         vecenv_type=args.vecenv_type,
+        graph_transport=args.graph_transport,
         validate_on_total_data=args.validate_on_total_data,
         optimizer=args.optimizer,
         n_workers=args.n_workers,
@@ -162,6 +171,8 @@ def main(args, exp_name) -> float:
         gae_lambda=args.gae_lambda,
         return_based_scaling=args.return_based_scaling,
         store_rollouts_on_disk=args.store_rollouts_on_disk,
+        rollout_arena=args.rollout_arena,
+        pipelined_rollouts=args.pipelined_rollouts,
         critic_loss=args.critic_loss,
         debug_net=args.debug_net,
         display_gantt=args.display_gantt,
@@ -199,6 +210,7 @@ def main(args, exp_name) -> float:
         fast_forward=args.fast_forward,
         observe_subgraph=args.observe_subgraph,
         random_taillard=args.random_taillard,
+        resource_model=args.resource_model,
     )
     env_specification.print_self()
     if args.batch_size == 1 and not args.dont_normalize_advantage:
@@ -258,6 +270,8 @@ def main(args, exp_name) -> float:
         hl_gauss=args.hl_gauss,
         reward_weights=args.reward_weights,
         sgformer=args.sgformer,
+        rwpe_cache_size=args.rwpe_cache_size,
+        share_rwpe_cache=args.share_rwpe_cache,
     )
     agent_specification.print_self()
 
@@ -341,9 +355,7 @@ def main(args, exp_name) -> float:
 
 def interrupt_handler(path, signum, frame):
     if path is not None:
-        files = glob.glob(
-            path + "/wheatley_dgl_" + str(os.getpid()) + "_*.obs"
-        ) + glob.glob(path + "/wheatley_pkl_" + str(os.getpid()) + "_*.obs")
+        files = glob.glob(path + "/wheatley_rollout_" + str(os.getpid()) + "_*.bin")
         print("removing ", files)
         for f in files:
             os.remove(f)
@@ -24,14 +24,25 @@
 import numpy as np
 import pathlib
 from .rcpsp import Rcpsp
+from generic.instance_store import InstanceStore
 import glob
+import multiprocessing
 import re
+from concurrent.futures import ProcessPoolExecutor
+
+
+def parse_psp(problem_file, generate_bounds=None):
+    return PSPLoader(generate_bounds).parse_single(problem_file)
 
 
 class PSPLoader:
-    def __init__(self, generate_bounds=None):
+    def __init__(self, generate_bounds=None, cache_dir=None, n_workers=0):
         self.cleanup()
         self.generate_bounds = generate_bounds
+        # parsed instances are stored in cache_dir if not None, directories are
+        # parsed in n_workers processes if n_workers > 0
+        self.cache_dir = cache_dir
+        self.n_workers = n_workers
 
     def cleanup(self):
         self.f = None
@@ -79,7 +90,20 @@ class PSPLoader:
 
     def load_directory(self, directory):
         files = sorted(glob.glob(directory + "/*"))
-        psps = [self.load_single(f) for f in files]
+        if self.cache_dir is not None:
+            parsed = InstanceStore(self.cache_dir, self.n_workers).load_all(
+                files, parse_psp, self.generate_bounds
+            )
+        elif self.n_workers > 0 and len(files) > 1:
+            with ProcessPoolExecutor(
+                self.n_workers, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                parsed = list(
+                    executor.map(parse_psp, files, [self.generate_bounds] * len(files))
+                )
+        else:
+            parsed = [self.parse_single(f) for f in files]
+        psps = [self.build(f, p) for f, p in zip(files, parsed)]
         print(f"loaded {len(psps)} files in {directory}")
         return psps
 
@@ -92,17 +116,34 @@ class PSPLoader:
 
     def load_single(self, problem_file):
         # print("loading ", problem_file)
+        if self.cache_dir is not None:
+            parsed = InstanceStore(self.cache_dir).load(
+                problem_file, parse_psp, self.generate_bounds
+            )
+        else:
+            parsed = self.parse_single(problem_file)
+        return self.build(problem_file, parsed)
+
+    def parse_single(self, problem_file):
+        # ("rcpsp", arguments of Rcpsp) or ("dict", problem)
         suffix = pathlib.Path(problem_file).suffix
         if suffix in [".sm", ".mm"]:
             # return self.load_sm(problem_file)
-            return self.load_single_rcpsp(problem_file)
+            return "rcpsp", self.parse_single_rcpsp(problem_file)
         elif suffix == ".rcp":
-            return self.load_rcp(problem_file)
+            return "dict", self.load_rcp(problem_file)
         elif suffix == ".ag1":
-            return self.load_ag1(problem_file)
+            return "rcpsp", self.parse_ag1(problem_file)
         else:
             raise ValueError("unkown file format" + problem_file)
 
+    def build(self, problem_file, parsed):
+        kind, problem = parsed
+        if kind == "rcpsp":
+            # cached instances are shared by identical files
+            return Rcpsp(**dict(problem, pb_id=problem_file))
+        return problem
+
     def load_rcp(self, problem_file):
         self.f = open(problem_file, "r")
         self.nextline()
@@ -157,6 +198,9 @@ class PSPLoader:
         }
 
     def load_ag1(self, problem_file):
+        return Rcpsp(**self.parse_ag1(problem_file))
+
+    def parse_ag1(self, problem_file):
         self.f = open(problem_file, "r")
         self.nextline()
         for i in range(18):
@@ -257,7 +301,7 @@ class PSPLoader:
         for j in range(3):
             durations[j].append([float(self.sline[j])])
 
-        return Rcpsp(
+        return dict(
             pb_id=problem_file,
             job_labels=job_labels,
             n_modes_per_job=n_modes_per_job,
@@ -393,6 +437,9 @@ class PSPLoader:
         }
 
     def load_single_rcpsp(self, problem_file):
+        return Rcpsp(**self.parse_single_rcpsp(problem_file))
+
+    def parse_single_rcpsp(self, problem_file):
         self.f = open(problem_file, "r")
         self.nextline()
 
@@ -551,7 +598,7 @@ class PSPLoader:
 
         self.cleanup()
 
-        return Rcpsp(
+        return dict(
             pb_id=problem_file,
             job_labels=job_labels,
             n_modes_per_job=n_modes_per_job,
@@ -85,12 +85,7 @@ def compute_ortools_makespan_on_real_duration(solution, state):
     return state.tct_real(-1), state.all_tct_real() - state.all_duration_real()
 
 
-def get_ortools_makespan_psp(
-    env,
-    max_time_ortools,
-    scaling_constant_ortools,
-    ortools_strategy="pessimistic",
-):
+def get_ortools_durations_psp(env, ortools_strategy):
     if ortools_strategy == "realistic":
         durations = env.state.all_duration_real()
     elif ortools_strategy == "pessimistic":
@@ -105,6 +100,16 @@ def get_ortools_makespan_psp(
 
     if isinstance(env, GEnv):
         durations = durations.numpy()
+    return durations
+
+
+def get_ortools_makespan_psp(
+    env,
+    max_time_ortools,
+    scaling_constant_ortools,
+    ortools_strategy="pessimistic",
+):
+    durations = get_ortools_durations_psp(env, ortools_strategy)
     solution, optimal = solve_psp(
         env.problem, durations, max_time_ortools, scaling_constant_ortools
     )
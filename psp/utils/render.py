@@ -0,0 +1,113 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+# Matplotlib rendering of PSP schedules, imported by the states when they render.
+
+import io
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.patches import Rectangle
+from matplotlib.pyplot import cm
+
+from generic.render import png_to_tensor
+
+
+def figure_to_tensor(fig):
+    figimg = io.BytesIO()
+    fig.savefig(figimg, format="png", dpi=150)
+    plt.clf()
+    plt.close("all")
+    return png_to_tensor(figimg.getvalue())
+
+
+def render_fail():
+    plt.text(
+        0.5,
+        0.5,
+        "invalid",
+        size=50,
+        rotation=0.0,
+        ha="center",
+        va="center",
+        bbox=dict(
+            boxstyle="round",
+            ec=(1.0, 0.5, 0.5),
+            fc=(1.0, 0.8, 0.8),
+        ),
+    )
+    return figure_to_tensor(plt.gcf())
+
+
+def render_resource_usage(starts, ends, modes, rusage, maxres):
+    # one plot per resource of the usage of every job over time
+    n_jobs = len(rusage)
+    nres = len(maxres)
+    levels = []
+    for r in range(nres):
+        levels.append([0] * int((max(ends) + 1)))
+
+    # color = cm.gnuplot2(np.linspace(0, 1, n_jobs))
+    color = cm.rainbow(np.linspace(0, 1, len(starts)))
+
+    fig, ax = plt.subplots(nres)
+    for i in range(nres):
+        ax[i].set_xlim([-1, max(ends) * 1.2])
+        ax[i].set_ylim([0, maxres[i]])
+        ax[i].set_ylabel(f"R {i+1}")
+
+    patches = []
+
+    for i in range(n_jobs):
+        for r in range(nres):
+            rect = Rectangle(
+                (starts[i], levels[r][starts[i]]),
+                ends[i] - starts[i],
+                rusage[i][r],
+                edgecolor=color[i],
+                facecolor=color[i],
+                fill=True,
+                alpha=0.2,
+                lw=1,
+                label=f"J{i}/m{modes[i]}",
+            )
+            ax[r].add_patch(rect)
+            if rusage[i][r] != 0:
+                max_level = max(levels[r][starts[i] : ends[i] + 1])
+                ax[r].text(
+                    starts[i] + (ends[i] - starts[i]) / 2,
+                    max_level + rusage[i][r] / 2 - 0.2,
+                    str(i),
+                    color=color[i],
+                )
+            for t in range(starts[i], ends[i]):
+                levels[r][t] += rusage[i][r]
+            if r == 0:
+                patches.append(rect)
+
+    ax[nres - 1].set_xlabel("time")
+    fig.tight_layout(pad=2)
+    fig.legend(handles=patches)
+    return figure_to_tensor(fig)
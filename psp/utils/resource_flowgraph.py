@@ -24,6 +24,9 @@
 # the sum of consumptions of r is lower than or equal to capa_r.
 # Careful, such a resource type is not always suitable for representing a set of disjunctive resources.
 
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, repeat
+
 
 class ResourceFlowGraph:
     def __init__(self, max_level, unit_val=1.0, renewable=True):
@@ -41,12 +44,39 @@ class ResourceFlowGraph:
         self.edges_att = []
         self.new_edges_cache = []
         self.new_edges_att_cache = []
-        # the frontier contains a list of tuples [releaseDate,nodeId,consReleased],
-        # that indicate that consReleased units of the resource are available at releaseDate from nodeId
-        self.frontier = []
         self.unit_val = unit_val
-        for i in range(0, int(self.max_level / self.unit_val)):
-            self.frontier.insert(i, [0, 0, self.unit_val])
+        # the frontier is a list of units [releaseDate,nodeId,unit_val] sorted by date,
+        # that indicate that one unit of the resource is available at releaseDate from nodeId.
+        # It is stored run length compressed: run i stands for run_counts[i] consecutive units
+        # released at run_dates[i] by run_nodes[i]
+        n_units = int(self.max_level / self.unit_val)
+        self.run_dates = []
+        self.run_nodes = []
+        self.run_counts = []
+        # run_ends[i] is the number of units in runs 0 to i, for i < n_run_ends only.
+        # It is invalidated from the first changed run and extended lazily by lookups,
+        # which only need the first runs most of the time
+        self.run_ends = []
+        self.n_run_ends = 0
+        self._insert_run(0, 0, n_units)
+        # unit_sums[k] is the sum of k units, accumulated one unit at a time as done when
+        # walking the uncompressed frontier, so that rounding errors are the same
+        self.unit_sums = list(accumulate(repeat(self.unit_val, n_units), initial=0))
+        self.unit_sums_tol = [s + self.unit_val / 2 for s in self.unit_sums]
+
+    @property
+    def frontier(self):
+        # uncompressed frontier, O(capacity), use frontier_nodes() when possible
+        return [
+            [date, node, self.unit_val]
+            for date, node, count in zip(
+                self.run_dates, self.run_nodes, self.run_counts
+            )
+            for _ in range(count)
+        ]
+
+    def frontier_nodes(self):
+        return set(self.run_nodes)
 
     def reset_new_cache(self):
         self.new_edges_cache = []
@@ -63,76 +93,103 @@ class ResourceFlowGraph:
         # indicating if tp is start or end of previous consumer
         # this version return first available date
         assert level <= self.max_level + self.unit_val / 2
-        # starts from the beginning of the frontier and returns the smallest date d_i such that \sum_{j <= i} consReleased[j] >= level
-        available_cons = 0
-        frontier_idx = -1
-        while available_cons + self.unit_val / 2 < level:
-            frontier_idx = frontier_idx + 1
-            available_cons += self.frontier[frontier_idx][2]
-        return self.frontier[frontier_idx][0]
+        # returns the smallest date d_i such that \sum_{j <= i} consReleased[j] >= level
+        n_units = bisect_left(self.unit_sums_tol, level)
+        if n_units == 0:
+            return self.run_dates[-1]
+        self._extend_run_ends(n_units=n_units)
+        return self.run_dates[bisect_left(self.run_ends, n_units, 0, self.n_run_ends)]
+
+    # position of the first unit of run in the uncompressed frontier
+    def _unit_pos(self, run):
+        if run == 0:
+            return 0
+        self._extend_run_ends(n_runs=run)
+        return self.run_ends[run - 1]
+
+    # extends run_ends until it covers n_units units and n_runs runs
+    def _extend_run_ends(self, n_units=0, n_runs=0):
+        run_ends = self.run_ends
+        run = self.n_run_ends
+        end = run_ends[run - 1] if run > 0 else 0
+        while end < n_units or run < n_runs:
+            end += self.run_counts[run]
+            if run < len(run_ends):
+                run_ends[run] = end
+            else:
+                run_ends.append(end)
+            run += 1
+        self.n_run_ends = run
 
     # Returns the max position pos in self.frontier such that frontier[pos][0] <= date
     # if date > frontier[-1][0], returns len(frontier)
     # if date < fronter[0][0], return -1
     def find_max_pos(self, date):
-        if len(self.frontier) == 0:
+        if len(self.run_dates) == 0:
             return 0
-        # assert date >= self.frontier[0][0]
-        if date < self.frontier[0][0]:
+        if date < self.run_dates[0]:
             return -1
-        pos = 0
-        while (pos < len(self.frontier)) and (self.frontier[pos][0] <= date):
-            pos = pos + 1
-        return pos - 1
+        return self._unit_pos(bisect_right(self.run_dates, date)) - 1
 
     def find_max_pos2(self, date):
-        if len(self.frontier) == 0:
-            return 0
-        # assert date >= self.frontier[0][0]
-        if date < self.frontier[0][0]:
-            return -1
-        pos = len(self.frontier) - 1
-        while (pos > 0) and (self.frontier[pos][0] > date):
-            pos = pos - 1
-        return pos
+        return self.find_max_pos(date)
 
     # inserts after the last position pos such that frontier[pos][0] <= date
     def insert_in_frontier(self, date, consumer_id, level):
-        max_pos = self.find_max_pos2(date)
-        for i in range(int(level / self.unit_val)):
-            self.frontier.insert(max_pos + 1, [date, consumer_id, self.unit_val])
+        self._insert_run(date, consumer_id, int(level / self.unit_val))
+
+    def _insert_run(self, date, consumer_id, count):
+        if count == 0:
+            return
+        run = bisect_right(self.run_dates, date)
+        if (
+            run > 0
+            and self.run_dates[run - 1] == date
+            and self.run_nodes[run - 1] == consumer_id
+        ):
+            self.run_counts[run - 1] += count
+            if run - 1 < self.n_run_ends:
+                self.n_run_ends = run - 1
+        else:
+            self.run_dates.insert(run, date)
+            self.run_nodes.insert(run, consumer_id)
+            self.run_counts.insert(run, count)
+            if run < self.n_run_ends:
+                self.n_run_ends = run
 
     def consume(self, consumer_id, level, start, end, debug=False):
         assert level <= self.max_level + self.unit_val / 2
         if not self.renewable:
             assert level <= self.remaining_level + self.unit_val / 2
             self.remaining_level -= level
-        cur_pos = self.find_max_pos2(start)
-        available_capa = 0
-        to_add_in_frontier = []
+        # number of units to take, rounding errors can cause severe errors !
+        n_units = bisect_left(self.unit_sums, level - self.unit_val / 2)
+        # units are taken from the last one released before start, backwards
+        run = bisect_right(self.run_dates, start) - 1
         flow_dict = {}
-        # while available_capa < level:
-        # while abs(available_capa - level) > self.unit_val / 2:
-        while available_capa < level - self.unit_val / 2:
-            # rounding errors can cause severe errors !
-            available_capa = available_capa + self.frontier[cur_pos][2]
-            if self.renewable:
-                to_add_in_frontier.append([end, consumer_id, self.unit_val])
-            origin_node = self.frontier[cur_pos][1]
-            self.frontier.pop(cur_pos)
-            cur_pos = cur_pos - 1
-            if origin_node in flow_dict:
-                flow_dict[origin_node] = flow_dict[origin_node] + self.unit_val
-            else:
-                flow_dict[origin_node] = self.unit_val
-        for t in to_add_in_frontier:
-            self.insert_in_frontier(t[0], t[1], t[2])
+        remaining = n_units
+        while remaining > 0:
+            assert run >= 0, "not enough units released before start"
+            origin_node = self.run_nodes[run]
+            taken = min(remaining, self.run_counts[run])
+            flow_dict[origin_node] = flow_dict.get(origin_node, 0) + taken
+            remaining -= taken
+            self.run_counts[run] -= taken
+            if self.run_counts[run] == 0:
+                del self.run_dates[run]
+                del self.run_nodes[run]
+                del self.run_counts[run]
+            run -= 1
+        if run + 1 < self.n_run_ends:
+            self.n_run_ends = run + 1
+        if self.renewable:
+            self._insert_run(end, consumer_id, n_units)
         self.nodes.append(consumer_id)
         for node in flow_dict:
             self.edges.append((node, consumer_id))
-            self.edges_att.append(flow_dict[node])
+            self.edges_att.append(self.unit_sums[flow_dict[node]])
             self.new_edges_cache.append((node, consumer_id))
-            self.new_edges_att_cache.append(flow_dict[node])
+            self.new_edges_att_cache.append(self.unit_sums[flow_dict[node]])
 
     def generate_graph(self):
         return 0
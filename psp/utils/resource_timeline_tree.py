@@ -0,0 +1,299 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+# Same resource model as ResourceTimeline, with O(log n) consume and availability.
+# The timepoints of a date only matter through the last one inserted at this date
+# (its level is the level available from this date on, and it is the one returned by
+# availability), so the timeline is stored as one node per distinct date in a treap
+# ordered by date, with lazy range add of levels and subtree min / max of levels.
+
+import random
+
+
+class _Node:
+    __slots__ = (
+        "date",
+        "level",
+        "consumer",
+        "is_start",
+        "priority",
+        "left",
+        "right",
+        "lazy",
+        "min",
+        "max",
+        "has_start",
+    )
+
+    def __init__(self, date, level, consumer, is_start, priority):
+        self.date = date
+        self.level = level
+        # consumer and is_start of the last timepoint inserted at date
+        self.consumer = consumer
+        self.is_start = is_start
+        self.priority = priority
+        self.left = None
+        self.right = None
+        # level delta still to be applied to children
+        self.lazy = 0
+        self.min = level
+        self.max = level
+        self.has_start = bool(is_start)
+
+
+def _add(node, delta):
+    if node is not None:
+        node.level += delta
+        node.min += delta
+        node.max += delta
+        node.lazy += delta
+
+
+def _push(node):
+    if node.lazy:
+        _add(node.left, node.lazy)
+        _add(node.right, node.lazy)
+        node.lazy = 0
+
+
+def _pull(node):
+    node.min = node.max = node.level
+    node.has_start = bool(node.is_start)
+    for child in (node.left, node.right):
+        if child is not None:
+            if child.min < node.min:
+                node.min = child.min
+            if child.max > node.max:
+                node.max = child.max
+            node.has_start = node.has_start or child.has_start
+
+
+def _split(node, date, strict=True):
+    # returns (nodes before date, nodes after date), date going to the second part if
+    # strict else to the first one
+    if node is None:
+        return None, None
+    _push(node)
+    if node.date < date or (not strict and node.date == date):
+        node.right, right = _split(node.right, date, strict)
+        _pull(node)
+        return node, right
+    left, node.left = _split(node.left, date, strict)
+    _pull(node)
+    return left, node
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        _push(left)
+        left.right = _merge(left.right, right)
+        _pull(left)
+        return left
+    _push(right)
+    right.left = _merge(left, right.left)
+    _pull(right)
+    return right
+
+
+def _first(node):
+    while node.left is not None:
+        _push(node)
+        node = node.left
+    return node
+
+
+def _last(node):
+    while node.right is not None:
+        _push(node)
+        node = node.right
+    return node
+
+
+def _rightmost_below(node, level):
+    # last node with node.level < level
+    while node is not None and node.min < level:
+        _push(node)
+        if node.right is not None and node.right.min < level:
+            node = node.right
+        elif node.level < level:
+            return node
+        else:
+            node = node.left
+    return None
+
+
+def _rightmost_start(node):
+    # last node whose last timepoint is a start
+    while node is not None and node.has_start:
+        _push(node)
+        if node.right is not None and node.right.has_start:
+            node = node.right
+        elif node.is_start:
+            return node
+        else:
+            node = node.left
+    return None
+
+
+class ResourceTimelineTree:
+    def __init__(
+        self, max_level, renewable=True, allow_before_last=True, unit_val=None
+    ):
+        self.max_level = max_level
+        self.renewable = renewable
+        # see ResourceTimeline
+        self.allow_before_last = allow_before_last
+        # levels are compared with a tolerance of half a unit, as in ResourceFlowGraph
+        self.tolerance = 0 if unit_val is None else unit_val / 2
+        self.rng = random.Random(0)
+        # initial timepoint
+        self.origin = _Node(0, max_level, None, None, self.rng.random())
+        self.root = self.origin
+        # resource precedences (consumer releasing the resource just before a start,
+        # new consumer), with the consumed level, same interface as ResourceFlowGraph
+        self.new_edges_cache = []
+        self.new_edges_att_cache = []
+        # number of dates where a consumer is the last one to release the resource
+        self.releases = {}
+
+    def reset_new_cache(self):
+        self.new_edges_cache = []
+        self.new_edges_att_cache = []
+
+    def frontier_nodes(self):
+        return set(self.releases)
+
+    def still_available(self, level):
+        if self.renewable:
+            return True
+        return _last(self.root).level + self.tolerance >= level
+
+    def availability(self, level):
+        # should return date, previous consumer, boolean
+        # indicating if tp is start or end of previous consumer
+        # this version return first available date, going back in time from the last
+        # date while the level is available, as ResourceTimeline does
+        threshold = level - self.tolerance
+        last = _last(self.root)
+        before_last, last_tree = _split(self.root, last.date)
+        not_available = _rightmost_below(before_last, threshold)
+        start = None
+        if not self.allow_before_last:
+            # do not get back before the start of other consumers
+            start = _rightmost_start(before_last)
+        self.root = _merge(before_last, last_tree)
+
+        if not_available is None:
+            ret = self.origin
+        else:
+            ret = self._next(not_available.date)
+        if start is not None and start.date >= ret.date:
+            ret = start
+        elif ret is self.origin:
+            # back to the initial timepoint, before the consumers starting at its date
+            if ret.is_start is None or self.max_level >= threshold:
+                return ret.date, None, None
+        return ret.date, ret.consumer, ret.is_start
+
+    def _next(self, date):
+        # first node with a date strictly after date
+        node = self.root
+        ret = None
+        while node is not None:
+            _push(node)
+            if node.date > date:
+                ret = node
+                node = node.left
+            else:
+                node = node.right
+        return ret
+
+    def _previous(self, date):
+        # last node with a date before or at date
+        node = self.root
+        ret = None
+        while node is not None:
+            _push(node)
+            if node.date <= date:
+                ret = node
+                node = node.right
+            else:
+                node = node.left
+        return ret
+
+    def _add_timepoint(self, date, consumer_id, is_start, delta):
+        before, after = _split(self.root, date)
+        if after is not None and _first(after).date == date:
+            node, after = _split(after, date, strict=False)
+            if not node.is_start and node.consumer is not None:
+                self._remove_release(node.consumer)
+            node.consumer = consumer_id
+            node.is_start = is_start
+            _pull(node)
+        else:
+            node = _Node(
+                date, _last(before).level, consumer_id, is_start, self.rng.random()
+            )
+        if not is_start:
+            self.releases[consumer_id] = self.releases.get(consumer_id, 0) + 1
+        _add(node, delta)
+        _add(after, delta)
+        self.root = _merge(_merge(before, node), after)
+
+    def _remove_release(self, consumer_id):
+        self.releases[consumer_id] -= 1
+        if self.releases[consumer_id] == 0:
+            del self.releases[consumer_id]
+
+    def consume(self, consumer_id, level, start, end, debug=False):
+        previous = self._previous(start)
+        if previous.is_start is False:
+            self.new_edges_cache.append((previous.consumer, consumer_id))
+            self.new_edges_att_cache.append(level)
+        self._add_timepoint(start, consumer_id, True, -level)
+        assert self.root.min + self.tolerance >= 0
+
+        if self.renewable:
+            self._add_timepoint(end, consumer_id, False, level)
+            assert self.root.max <= self.max_level + self.tolerance
+
+    def global_availability(self):
+        # [date, level] of every date but the last one
+        avail = []
+        stack = []
+        node = self.root
+        while stack or node is not None:
+            while node is not None:
+                _push(node)
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            avail.append([node.date, node.level])
+            node = node.right
+        return avail[:-1]
@@ -33,18 +33,25 @@ import torch
 
 
 def compute_resources_graph_np(r_info):
-    n_modes = r_info.shape[0]
+    n_modes, n_resources = r_info.shape
     # r_info is n_modes x n_resources, contains values between 0 and 1
-    conflicts = np.where(
-        np.logical_and(
-            np.expand_dims(r_info, 0) != 0,
-            np.expand_dims(r_info, 1) != 0,
-            out=np.zeros(
-                (r_info.shape[0], r_info.shape[0], r_info.shape[1]), dtype=bool
-            ),
-            where=np.expand_dims(np.logical_not(np.diag([True] * n_modes)), 2),
-        )
+    # modes using every resource, grouped by resource: conflicts are all pairs of
+    # distinct modes of a group, built without any n_modes x n_modes array
+    rid, mode = np.nonzero(r_info.T)
+    sizes = np.bincount(rid, minlength=n_resources)
+    member_sizes = sizes[rid]
+    src = np.repeat(mode, member_sizes)
+    pair_starts = np.cumsum(member_sizes) - member_sizes
+    dst_pos = np.arange(src.shape[0]) - np.repeat(
+        pair_starts - (np.cumsum(sizes) - sizes)[rid], member_sizes
     )
+    dst = mode[dst_pos]
+    conf_rid = np.repeat(rid, member_sizes)
+    keep = src != dst
+    src, dst, conf_rid = src[keep], dst[keep], conf_rid[keep]
+    # same order as a np.where on the dense n_modes x n_modes x n_resources array
+    order = np.argsort((src * n_modes + dst) * n_resources + conf_rid)
+    conflicts = (src[order], dst[order], conf_rid[order])
     # conflicts[0] is source of edge
     # conflicts[1] is dest of edge
     # conflicts[2] is ressource id
@@ -60,24 +67,27 @@ def compute_resources_graph_np(r_info):
 
 
 def compute_resources_graph_torch(r_info):
-    n_modes = r_info.shape[0]
+    n_modes, n_resources = r_info.shape
     # r_info is n_modes x n_resources, contains values between 0 and 1
-    notdiag = torch.logical_not(
-        torch.diag(torch.BoolTensor([True] * n_modes)).unsqueeze_(-1)
-    )
-    # m1 = r_info.unsqueeze(0) != 0
-    # m2 = r_info.unsqueeze(1) != 0
-
-    # c1 = torch.logical_and(m1, m2)
-    # c2 = torch.logical_and(c1, notdiag)
-    c2 = torch.logical_and(
-        torch.logical_and(
-            r_info.unsqueeze(0).expand(r_info.shape[0], -1, -1) != 0,
-            r_info.unsqueeze(1).expand(-1, r_info.shape[0], -1) != 0,
-        ),
-        notdiag,
+    # modes using every resource, grouped by resource: conflicts are all pairs of
+    # distinct modes of a group, built without any n_modes x n_modes tensor
+    rid, mode = torch.nonzero(r_info.t(), as_tuple=True)
+    sizes = torch.bincount(rid, minlength=n_resources)
+    member_sizes = sizes[rid]
+    src = torch.repeat_interleave(mode, member_sizes)
+    pair_starts = torch.cumsum(member_sizes, 0) - member_sizes
+    dst_pos = torch.arange(
+        src.shape[0], device=r_info.device
+    ) - torch.repeat_interleave(
+        pair_starts - (torch.cumsum(sizes, 0) - sizes)[rid], member_sizes
     )
-    conflicts = torch.where(c2)
+    dst = mode[dst_pos]
+    conf_rid = torch.repeat_interleave(rid, member_sizes)
+    keep = src != dst
+    src, dst, conf_rid = src[keep], dst[keep], conf_rid[keep]
+    # same order as a torch.where on the dense n_modes x n_modes x n_resources tensor
+    order = torch.argsort((src * n_modes + dst) * n_resources + conf_rid)
+    conflicts = (src[order], dst[order], conf_rid[order])
     # conflicts[0] is source of edge
     # conflicts[1] is dest of edge
     # conflicts[2] is ressource id
@@ -90,3 +100,41 @@ def compute_resources_graph_torch(r_info):
         conflicts_val,
         conflicts_val_r,
     )
+
+
+def compute_calendar_open_time(intervals):
+    # intervals are the sorted [open, close] dates of a resource calendar
+    # returns opens, closes and total open time at every close, for
+    # compute_ends_with_calendar
+    intervals = np.array(intervals, dtype=float).reshape(-1, 2)
+    opens = intervals[:, 0]
+    closes = intervals[:, 1]
+    return opens, closes, np.cumsum(closes - opens)
+
+
+def compute_ends_with_calendar(calendar, starts, durations):
+    # end dates of tasks of given starts and durations (any shape, typically one per
+    # time type) when they can only be processed during calendar openings
+    opens, closes, open_time = calendar
+    # first opening not closed before start
+    first = np.searchsorted(closes, starts, side="left")
+    if np.any(first == len(closes)):
+        raise Exception(
+            f"not enough openings in calendar for tasks starting at {starts}"
+        )
+    begins = np.maximum(starts, opens[first])
+    # open time elapsed at the end date
+    end_open_time = (
+        open_time[first] - (closes[first] - begins) + np.asarray(durations, float)
+    )
+    last = np.maximum(np.searchsorted(open_time, end_open_time, side="left"), first)
+    if np.any(last == len(closes)):
+        raise Exception(
+            f"not enough openings in calendar for tasks starting at {starts} of "
+            f"durations {durations}"
+        )
+    return np.where(
+        last == first,
+        begins + durations,
+        closes[last] - (open_time[last] - end_open_time),
+    )
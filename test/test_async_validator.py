@@ -0,0 +1,108 @@
+import sys
+
+sys.path.append("..")
+
+import multiprocessing
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import torch
+
+from generic.async_validator import AsyncValidator
+
+
+class StubValidator:
+    # validations wait for started to be acknowledged by go, makespans are the agent
+    # weight plus the global step, OR-Tools makespans are pending until close
+    def __init__(self, context):
+        self.device = torch.device("cpu")
+        self.started = context.Event()
+        self.go = context.Event()
+        self.makespans = []
+        self.ortools_makespans = {"realistic": []}
+        self.random_makespans = []
+        self.custom_makespans = {"MTWR": []}
+
+    def validate(self, agent, alg):
+        self.started.set()
+        self.go.wait()
+        makespan = agent.weight.item() + alg.global_step
+        self.makespans.append(makespan)
+        self.ortools_makespans["realistic"].append(float("nan"))
+        self.random_makespans.append(2 * makespan)
+        self.custom_makespans["MTWR"].append(3 * makespan)
+
+    def close(self):
+        self.ortools_makespans["realistic"] = [
+            makespan / 2 for makespan in self.makespans
+        ]
+
+
+def make_alg(agent, global_step):
+    return SimpleNamespace(
+        global_step=global_step,
+        start_time=0.0,
+        n_epochs=1,
+        num_envs=1,
+        num_steps=1,
+        ent_coef=0.0,
+        vf_coef=1.0,
+        logger=SimpleNamespace(name_to_value={}),
+        ep_info_buffer=deque(),
+        optimizer=torch.optim.SGD(agent.parameters(), lr=0.1),
+    )
+
+
+def poll_until(async_validator, n, timeout=60):
+    done = []
+    start = time.time()
+    while len(done) < n and time.time() - start < timeout:
+        done += async_validator.poll()
+        time.sleep(0.05)
+    return done
+
+
+def test_async_validator():
+    validator = StubValidator(multiprocessing.get_context("spawn"))
+    agent = torch.nn.Linear(1, 1, bias=False)
+    async_validator = AsyncValidator(validator, agent, max_pending=1)
+    try:
+        with torch.no_grad():
+            agent.weight.fill_(1.0)
+        assert async_validator.submit(1, agent, make_alg(agent, 10))
+        # the worker holds the first snapshot, the second one fills the queue
+        assert validator.started.wait(60)
+        with torch.no_grad():
+            agent.weight.fill_(2.0)
+        assert async_validator.submit(2, agent, make_alg(agent, 20))
+        assert not async_validator.submit(3, agent, make_alg(agent, 30))
+        assert async_validator.poll() == []
+
+        with torch.no_grad():
+            agent.weight.fill_(5.0)
+        validator.go.set()
+        assert poll_until(async_validator, 2) == [1, 2]
+        # the worker loads snapshots in its own copy of the agent
+        assert agent.weight.item() == 5.0
+        assert not agent.weight.is_shared()
+        # results of the snapshots taken at updates 1 and 2
+        assert validator.makespans == [11.0, 22.0]
+        assert validator.random_makespans == [22.0, 44.0]
+        assert validator.custom_makespans == {"MTWR": [33.0, 66.0]}
+        assert len(validator.ortools_makespans["realistic"]) == 2
+
+        with torch.no_grad():
+            agent.weight.fill_(4.0)
+        assert async_validator.submit(4, agent, make_alg(agent, 40))
+        # close merges the validations that were not polled
+        assert async_validator.close() == [4]
+    finally:
+        if async_validator.process.is_alive():
+            async_validator.process.terminate()
+    assert not async_validator.process.is_alive()
+    # histories come from the worker, with the OR-Tools makespans filled on close
+    assert validator.makespans == [11.0, 22.0, 44.0]
+    assert validator.ortools_makespans == {"realistic": [5.5, 11.0, 22.0]}
+    assert validator.random_makespans == [22.0, 44.0, 88.0]
+    assert validator.custom_makespans == {"MTWR": [33.0, 66.0, 132.0]}
@@ -0,0 +1,24 @@
+import sys
+
+sys.path.append(".")
+
+import numpy as np
+import pytest
+from psp.utils.utils import compute_calendar_open_time, compute_ends_with_calendar
+
+
+def test_ends_with_calendar():
+    cal = compute_calendar_open_time([(2, 7), (12, 17), (22, 27)])
+    assert np.all(cal[2] == [5, 10, 15])
+    # real, then min max mode
+    starts = np.array([0.0, 3.0, 7.0, 9.0])
+    durations = np.array([5.0, 5.0, 3.0, 7.0])
+    ends = compute_ends_with_calendar(cal, starts, durations)
+    assert np.all(ends == [7.0, 13.0, 15.0, 24.0])
+    # no duration
+    ends = compute_ends_with_calendar(cal, np.array([7.0, 8.0]), np.array([0, 0]))
+    assert np.all(ends == [7.0, 12.0])
+    with pytest.raises(Exception):
+        compute_ends_with_calendar(cal, np.array([20.0]), np.array([8.0]))
+    with pytest.raises(Exception):
+        compute_ends_with_calendar(cal, np.array([28.0]), np.array([1.0]))
@@ -1,8 +1,22 @@
+import copy
 import sys
 
+from psp.env.env_specification import EnvSpecification
 from psp.env.genv import GEnv
 from generic.utils import decode_mask
-from psp.env.graphgym.async_vector_env import AsyncGraphVectorEnv
+from psp.utils.utils import (
+    compute_resources_graph_np,
+    compute_resources_graph_torch,
+)
+from psp.env.graphgym.async_vector_env import (
+    AsyncGraphVectorEnv,
+    DeltaGraphBuffer,
+    SharedGraphBuffer,
+)
+from psp.env.graphgym.validation_vector_env import AsyncValidationVectorEnv
+import dgl
+import numpy as np
+import pytest
 import torch
 from collections import deque
 
@@ -155,3 +169,236 @@ def test_graphenv(problem_description_small, env_specification_small):
 
         rewards[step] = torch.tensor(reward).view(-1)
         next_done = torch.Tensor(done)
+
+
+def test_shared_graph_buffer():
+    g = dgl.heterograph(
+        {
+            ("n", "prec", "n"): (torch.tensor([0, 1]), torch.tensor([1, 2])),
+            ("n", "rp", "n"): (torch.tensor([], dtype=torch.int64),) * 2,
+        },
+        num_nodes_dict={"n": 3},
+    )
+    g.ndata["selectable"] = torch.tensor([True, False, False])
+    g.ndata["durations"] = torch.rand((3, 3))
+    g.edges["rp"].data["r"] = torch.empty((0, 4))
+
+    # worker and parent sides, with a buffer too small for the graph
+    worker = SharedGraphBuffer(torch.empty(16, dtype=torch.uint8).share_memory_())
+    parent = SharedGraphBuffer(worker.buffer)
+    update = worker.write(g)
+    assert update[0] is not None and update[1] is not None
+    g2 = parent.read(update, copy=True)
+    assert g2.num_nodes() == 3
+    assert torch.equal(g2.edges(etype="prec")[1], torch.tensor([1, 2]))
+    assert torch.equal(g2.ndata["selectable"], g.ndata["selectable"])
+    assert torch.equal(g2.ndata["durations"], g.ndata["durations"])
+    assert g2.edges["rp"].data["r"].shape == (0, 4)
+
+    # same schema and enough room: nothing goes through the pipe
+    g.ndata["durations"] = torch.rand((3, 3))
+    assert worker.write(g) is None
+    g3 = parent.read(None)
+    assert torch.equal(g3.ndata["durations"], g.ndata["durations"])
+    # copied observations are not overwritten by next writes
+    assert not torch.equal(g2.ndata["durations"], g3.ndata["durations"])
+
+
+def test_delta_graph_buffer():
+    import pickle
+
+    g = dgl.heterograph(
+        {
+            ("n", "prec", "n"): (torch.tensor([0, 1]), torch.tensor([1, 2])),
+            ("n", "rp", "n"): (torch.tensor([0, 0, 1]), torch.tensor([1, 2, 2])),
+        },
+        num_nodes_dict={"n": 3},
+    )
+    g.ndata["tct"] = torch.rand((3, 3))
+    g.ndata["durations"] = torch.rand((3, 3))
+    g.edges["rp"].data["r"] = torch.rand((3, 4))
+
+    worker = DeltaGraphBuffer()
+    parent = pickle.loads(pickle.dumps(worker))
+    g1 = parent.read(worker.write(g))
+    assert torch.equal(g1.ndata["tct"], g.ndata["tct"])
+
+    # one row changed, one rp edge removed and one added
+    g.ndata["tct"][1] = 0
+    g.remove_edges(torch.tensor([1]), etype="rp")
+    g.add_edges(torch.tensor([2]), torch.tensor([0]), etype="rp")
+    update = worker.write(g)
+    schema, _, _ = update
+    assert schema is None
+    g2 = parent.read(pickle.loads(pickle.dumps(update)))
+    for etype in g.canonical_etypes:
+        assert torch.equal(
+            torch.stack(g2.edges(etype=etype)), torch.stack(g.edges(etype=etype))
+        )
+    assert torch.equal(g2.ndata["tct"], g.ndata["tct"])
+    assert torch.equal(g2.edges["rp"].data["r"], g.edges["rp"].data["r"])
+    # unchanged tensors are shared with the previous graph, changed ones are not
+    assert g2.ndata["durations"].data_ptr() == g1.ndata["durations"].data_ptr()
+    assert g1.ndata["tct"][1].sum() != 0
+
+
+def make_env_specification(problem_description, **kwargs):
+    # the env_specification_small fixture misses recent arguments
+    args = dict(
+        problems=problem_description,
+        normalize_input=True,
+        input_list=["duration"],
+        max_edges_factor=2,
+        sample_n_jobs=-1,
+        chunk_n_jobs=-1,
+        observe_conflicts_as_cliques=True,
+        add_rp_edges="all",
+        observe_real_duration_when_affect=False,
+        do_not_observe_updated_bounds=False,
+        factored_rp=False,
+        remove_old_resource_info=True,
+        remove_past_prec=True,
+        observation_horizon_step=0,
+        observation_horizon_time=0,
+        fast_forward=False,
+        observe_subgraph=False,
+        random_taillard=False,
+    )
+    args.update(kwargs)
+    return EnvSpecification(**args)
+
+
+def test_validation_vector_env(problem_description_small):
+    env_specification = make_env_specification(problem_description_small)
+    envs = [
+        GEnv(problem_description_small, env_specification, [0], validate=True)
+        for _ in range(3)
+    ]
+    serial_envs = copy.deepcopy(envs)
+    vecenv = AsyncValidationVectorEnv(envs, 2)
+    obs, masks = vecenv.reset_envs(soft=True)
+    assert [o.num_nodes() for o in obs] == [
+        env.reset(soft=True)[0].num_nodes() for env in serial_envs
+    ]
+    indices = [0, 1, 2]
+    n_steps = 0
+    while indices:
+        # envs follow different schedules: the first or the last possible action
+        actions = [
+            torch.nonzero(mask)[0 if i == 0 else -1].item()
+            for i, mask in zip(indices, masks)
+        ]
+        for i, action in zip(indices, actions):
+            serial_envs[i].step(action)
+        indices, obs, masks = vecenv.step_envs(indices, actions)
+        n_steps += 1
+    envs = vecenv.get_envs()
+    vecenv.close()
+    assert n_steps > 1
+    for env, serial_env in zip(envs, serial_envs):
+        assert (
+            env.get_solution().get_makespan()
+            == serial_env.get_solution().get_makespan()
+        )
+
+
+def test_frontier_pruning(problem_description_small):
+    env_specification = make_env_specification(
+        problem_description_small, add_rp_edges="frontier_strict"
+    )
+    env = GEnv(problem_description_small, env_specification, [0], validate=True)
+    obs, info = env.reset(soft=True)
+    left_frontier = set()
+    done = False
+    while not done:
+        state = env.state
+        frontier = set(state.nodes_in_frontier)
+        obs, _, done, _, info = env.step(torch.nonzero(info["mask"])[-1].item())
+        # incremental frontier is the union of the resources frontiers
+        assert state.nodes_in_frontier == set().union(
+            *[r[i].frontier_nodes() for r in state.resources for i in range(1, 4)]
+        )
+        left_frontier |= frontier - state.nodes_in_frontier
+        src, dst = state.graph.edges(etype="rp")
+        for u, v in zip(src.tolist(), dst.tolist()):
+            assert u in state.nodes_in_frontier and v in state.nodes_in_frontier
+        src, dst = state.graph.edges(etype="rc")
+        assert not (set(src.tolist()) | set(dst.tolist())) & left_frontier
+        assert not set(state.graph.edges(etype="prec")[1].tolist()) & left_frontier
+
+
+def reference_observed_nodes(state, horizon_step, horizon_time):
+    # observed nodes recomputed from scratch at every step
+    selectables = torch.where(state.selectables() == 1)[0].tolist()
+    future = set()
+    hop = set(selectables)
+    for i in range(horizon_step):
+        hop = {v for u, v in state.problem_edges if u in hop} - future
+        future |= hop
+    if horizon_time != 0 and selectables:
+        present_date = torch.max(state.tct(torch.tensor(selectables)))
+        est = state.all_tct()[:, 1] - state.all_durations()[:, 1]
+        future |= set(
+            torch.where((est > present_date) & (est < present_date + horizon_time))[0]
+            .numpy()
+            .tolist()
+        )
+    if not future:
+        future = set(torch.where(~state.get_pasts())[0].tolist())
+    return sorted(future | set(selectables) | state.nodes_in_frontier)
+
+
+@pytest.mark.parametrize("horizon_step,horizon_time", [(1, 0), (2, 0), (0, 5), (1, 5)])
+def test_observe_subgraph(problem_description_small, horizon_step, horizon_time):
+    env_specification = make_env_specification(
+        problem_description_small,
+        remove_old_resource_info=False,
+        remove_past_prec=False,
+        observation_horizon_step=horizon_step,
+        observation_horizon_time=horizon_time,
+        observe_subgraph=True,
+    )
+    env = GEnv(problem_description_small, env_specification, [0], validate=True)
+    for reset in range(2):
+        obs, info = env.reset(soft=True)
+        done = False
+        while not done:
+            state = env.state
+            nodes = env.observed_nodes
+            assert nodes.tolist() == reference_observed_nodes(
+                state, horizon_step, horizon_time
+            )
+            assert torch.equal(obs.nodes["n"].data[dgl.NID], nodes)
+            # actions are indices in the observed nodes
+            action = torch.nonzero(info["mask"])[-1].item()
+            assert state.selectable(nodes[action])
+            obs, _, done, _, info = env.step(action)
+
+
+def test_resource_conflicts(problem_description_small):
+    r_info = torch.rand(40, 5) * (torch.rand(40, 5) < 0.3)
+    edges, rid, val, valr = compute_resources_graph_torch(r_info)
+    # pairs of distinct modes using the same resource, in dense (src, dst, rid) order
+    both = (r_info.unsqueeze(1) != 0) & (r_info.unsqueeze(0) != 0)
+    both[torch.arange(40), torch.arange(40)] = False
+    src, dst, r = torch.where(both)
+    assert torch.equal(edges, torch.stack([src, dst]))
+    assert torch.equal(rid, r)
+    assert torch.equal(val, r_info[src, r])
+    assert torch.equal(valr, r_info[dst, r])
+    np_edges, np_rid, _, _ = compute_resources_graph_np(r_info.numpy())
+    assert np.array_equal(np_edges, edges.numpy())
+    assert np.array_equal(np_rid, rid.numpy())
+
+    env_specification = make_env_specification(problem_description_small)
+    env = GEnv(problem_description_small, env_specification, [0], validate=True)
+    env.reset(soft=True)
+    conflicts = env.state.resource_conf
+    rc_edges = env.state.graph.edges(etype="rc")
+    env.step(0)
+    env.reset(soft=True)
+    # conflicts are computed once per problem
+    assert env.state.resource_conf is conflicts
+    assert all(
+        torch.equal(a, b) for a, b in zip(rc_edges, env.state.graph.edges(etype="rc"))
+    )
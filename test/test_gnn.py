@@ -1,3 +1,4 @@
+import pytest
 from psp.models.gnn_dgl import GnnDGL
 from psp.env.observation import EnvObservation
 from psp.models.agent_observation import AgentObservation
@@ -61,3 +62,160 @@ def test_gnn_dgl(env_specification_small, agent_specification, state_small):
         )
         * 2
     )
+
+
+def test_pad_nodes():
+    import torch
+    from psp.models.gnn_dgl import pad_nodes
+
+    n_nodes = torch.tensor([2, 3, 1])
+    features = torch.arange(12, dtype=torch.float).reshape(6, 2)
+    padded = pad_nodes(features, n_nodes, 4)
+    assert padded.shape == (3, 4, 2)
+    assert torch.equal(padded[0, :2], features[:2])
+    assert torch.equal(padded[1, :3], features[2:5])
+    assert torch.equal(padded[2, :1], features[5:])
+    assert padded[0, 2:].abs().sum() == 0
+    assert padded[2, 1:].abs().sum() == 0
+
+
+def test_rewire():
+    import dgl
+    import torch
+    from psp.models.rewiring import rewire
+
+    # two graphs of 3 and 2 nodes, 2 resources, node 1 consuming resource 0 and
+    # node 3 resource 1
+    resources = torch.tensor([[0, 0], [0.5, 0], [0, 0], [0, 0.2], [0, 0]])
+    feat = torch.cat([torch.zeros(5, 10), resources], dim=1)
+    graphs = [dgl.graph(([0], [1]), num_nodes=3), dgl.graph(([0], [1]), num_nodes=2)]
+    for g in graphs:
+        g.edata["type"] = torch.LongTensor([1])
+    g = dgl.batch(graphs)
+    g.ndata["feat"] = feat
+    g, poolnodes, resource_nodes, vnodes = rewire(
+        g, "learn", True, True, 2, 12, 2, 6, 7, 10, 10, 8, 9, False
+    )
+    assert resource_nodes.tolist() == [5, 6, 7, 8]
+    assert poolnodes.tolist() == [9, 10]
+    assert vnodes.tolist() == [11, 12]
+    assert g.num_nodes() == 13
+    assert g.has_edges_between([1, 5], [5, 1]).all()
+    assert g.has_edges_between([3, 8], [8, 3]).all()
+    # unused resources loop on themselves
+    assert g.has_edges_between([6, 7], [6, 7]).all()
+    # task and resource nodes are pooled in the pool node of their graph
+    assert g.predecessors(9).tolist() == [0, 1, 2, 5, 6]
+    assert g.predecessors(10).tolist() == [3, 4, 7, 8]
+    assert sorted(g.successors(12).tolist()) == [3, 4]
+
+
+def graph_observations(problem_description, n_steps, **kwargs):
+    import copy
+    import torch
+    from psp.env.genv import GEnv
+    from psp.models.agent_graph_observation import AgentGraphObservation
+    from test_genv import make_env_specification
+
+    env_specification = make_env_specification(problem_description, **kwargs)
+    env = GEnv(problem_description, env_specification, [0], validate=True)
+    obs, info = env.reset(soft=True)
+    observations = [copy.deepcopy(obs)]
+    for i in range(n_steps):
+        obs, _, _, _, info = env.step(torch.nonzero(info["mask"])[0].item())
+        observations.append(copy.deepcopy(obs))
+    observations = [
+        AgentGraphObservation.rewire_internal(o, conflicts="clique")
+        for o in observations
+    ]
+    return env_specification, observations
+
+
+def make_graph_gnn(
+    env_specification, graph_pooling="learn", conflicts="clique", vnode=False
+):
+    import torch
+
+    torch.manual_seed(0)
+    return GnnDGL(
+        input_dim_features_extractor=env_specification.n_features,
+        graph_pooling=graph_pooling,
+        max_n_nodes=env_specification.max_n_nodes,
+        max_n_resources=env_specification.max_n_resources,
+        n_mlp_layers_features_extractor=1,
+        n_layers_features_extractor=2,
+        hidden_dim_features_extractor=8,
+        activation_features_extractor=torch.nn.GELU,
+        n_attention_heads=2,
+        conflicts=conflicts,
+        vnode=vnode,
+        rwpe_k=0,
+        graphobs=True,
+    ).eval()
+
+
+@pytest.mark.parametrize(
+    "graph_pooling,conflicts,vnode",
+    [("learn", "clique", False), ("learninv", "node", True), ("max", "clique", True)],
+)
+def test_rewire_observation(problem_description_small, graph_pooling, conflicts, vnode):
+    import copy
+    import torch
+
+    env_specification, observations = graph_observations(problem_description_small, 2)
+    gnn = make_graph_gnn(env_specification, graph_pooling, conflicts, vnode)
+    stored = [gnn.rewire_observation(copy.deepcopy(o)) for o in observations]
+    n_resources = env_specification.max_n_resources if conflicts == "node" else 0
+    n_pool = 1 if graph_pooling in ["learn", "learninv"] else 0
+    for o, s in zip(observations, stored):
+        rewired = s.ndata["rewired"]
+        # extra nodes follow the nodes of the observation
+        assert torch.all(rewired[: o.num_nodes("n")] == 0)
+        assert torch.bincount(rewired, minlength=4).tolist() == [
+            o.num_nodes("n"),
+            n_resources,
+            n_pool,
+            int(vnode),
+        ]
+    # batching observations rewired once gives the same embeddings as rewiring the
+    # batched observations
+    with torch.no_grad():
+        assert torch.allclose(gnn(observations), gnn(stored), atol=1e-5)
+        packed = gnn(observations, packed=True)
+        packed_stored = gnn(stored, packed=True)
+    assert torch.equal(packed.n_nodes, packed_stored.n_nodes)
+    assert torch.allclose(packed.features, packed_stored.features, atol=1e-5)
+
+
+def test_packed_forward(problem_description_small):
+    import copy
+    import torch
+
+    # observed subgraphs have different numbers of nodes along the episode
+    env_specification, observations = graph_observations(
+        problem_description_small,
+        3,
+        remove_old_resource_info=False,
+        remove_past_prec=False,
+        observation_horizon_step=1,
+        observe_subgraph=True,
+    )
+    n_nodes = [o.num_nodes("n") for o in observations]
+    assert len(set(n_nodes)) > 1
+    gnn = make_graph_gnn(env_specification)
+    stored = [gnn.rewire_observation(copy.deepcopy(o)) for o in observations]
+    for obs in [observations, stored]:
+        with torch.no_grad():
+            padded = gnn(obs)
+            packed = gnn(obs, packed=True)
+        d = padded.shape[2]
+        assert padded.shape == (len(obs), env_specification.max_n_nodes, d)
+        assert packed.n_nodes.tolist() == n_nodes
+        assert torch.equal(
+            packed.features,
+            torch.cat([padded[i, :n] for i, n in enumerate(n_nodes)]),
+        )
+        assert torch.equal(packed.graph_embedding, padded[:, 0, d // 2 :])
+        # padding rows only have the graph embedding
+        for i, n in enumerate(n_nodes):
+            assert padded[i, n:, : d // 2].abs().sum() == 0
@@ -1,3 +1,4 @@
+import os
 import sys
 
 sys.path.append(".")
@@ -127,3 +128,25 @@ def test_psp_loader_sm():
 
     assert unc_bounds["durations"][1] == mins
     assert unc_bounds["durations"][2] == maxs
+
+
+def test_psp_loader_cache(tmp_path):
+    root = os.path.join(os.path.dirname(__file__), "..")
+    files = [
+        os.path.join(root, "instances/psp/272/272.sm"),
+        os.path.join(root, "instances/psp/mm/c154_3.mm"),
+    ]
+    parsed = [PSPLoader(generate_bounds=[0.1, 0.2]).load_single(f) for f in files]
+    loader = PSPLoader(generate_bounds=[0.1, 0.2], cache_dir=str(tmp_path))
+    for _ in range(2):
+        # parsed then read from the cache
+        cached = [loader.load_single(f) for f in files]
+        assert len(list(tmp_path.glob("instance_*.bin"))) == 2
+        for c, p, f in zip(cached, parsed, files):
+            assert c.pb_id == f
+            assert c.durations == p.durations
+            assert c.successors == p.successors
+            assert c.resource_cons == p.resource_cons
+    # entries depend on the loading options
+    PSPLoader(cache_dir=str(tmp_path)).load_single(files[0])
+    assert len(list(tmp_path.glob("instance_*.bin"))) == 3
@@ -0,0 +1,63 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+import sys
+
+sys.path.append("..")
+
+import numpy as np
+import pytest
+import torch
+
+from generic.ortools_store import OrToolsStore, content_key
+
+
+def test_content_key():
+    durations = np.arange(6).reshape(2, 3)
+    key = content_key((durations, [1, 2]), "realistic", 3)
+    assert key == content_key((durations.copy(), [1, 2]), "realistic", 3)
+    assert key == content_key((torch.tensor(durations), [1, 2]), "realistic", 3)
+    assert key != content_key((durations, [1, 2]), "averagistic", 3)
+    assert key != content_key((durations, [1, 2]), "realistic", 1)
+    assert key != content_key((durations.reshape(3, 2), [1, 2]), "realistic", 3)
+
+
+@pytest.mark.parametrize("n_workers", [0, 1])
+def test_ortools_store(tmp_path, n_workers):
+    store = OrToolsStore(str(tmp_path), n_workers)
+    store.submit("a", divmod, 7, 2)
+    store.submit("b", divmod, 9, 4)
+    # submitting a known key does not compute it again
+    store.submit("a", divmod, 0, 0)
+    assert store.get("a", wait=True) == (3, 1)
+    store.close()
+    assert store.get("b") == (2, 1)
+    assert store.n_pending() == 0
+
+    # solutions are shared through the directory
+    other = OrToolsStore(str(tmp_path))
+    assert other.get("a") == (3, 1)
+    assert other.get("c") is None
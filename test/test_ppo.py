@@ -0,0 +1,154 @@
+import os
+import sys
+
+sys.path.append("..")
+
+import pytest
+import torch
+
+from alg.ppo import PPO, create_env
+from psp.description import Description
+from psp.env.genv import GEnv
+from psp.env.graphgym.async_vector_env import AsyncGraphVectorEnv
+from psp.utils.loaders import PSPLoader
+from test_genv import make_env_specification
+from test_validator import make_training_specification
+
+
+class FirstActionAgent:
+    # takes the first possible action of every env, so that trajectories do not
+    # depend on how the envs are grouped
+    graphobs = True
+    reward_dim = 1
+
+    def __init__(self, packed_actions):
+        self.packed_actions = packed_actions
+
+    def obs_as_tensor(self, obs):
+        return list(obs)
+
+    def get_n_nodes(self, obs):
+        return [o.num_nodes("n") for o in obs]
+
+    def rebatch_obs(self, obs):
+        return sum(obs, [])
+
+    def get_action_and_value(self, obs, action_masks):
+        if self.packed_actions:
+            masks = [action_masks[[i]].values for i in range(len(action_masks))]
+        else:
+            masks = torch.as_tensor(action_masks)
+        action = torch.tensor([torch.nonzero(mask)[0].item() for mask in masks])
+        return action, torch.zeros(len(obs)), None, self.get_value(obs)
+
+    def get_value(self, obs):
+        return torch.tensor([[float(o.num_nodes("n"))] for o in obs])
+
+    def get_value_from_logits(self, value):
+        return value
+
+
+@pytest.fixture
+def problem_description_two(small_pb):
+    small_nonren = PSPLoader().load_single(
+        os.path.join(
+            os.path.dirname(__file__), "../instances/psp/small/small_nonren.sm"
+        )
+    )
+    return Description(
+        transition_model_config="simple",
+        reward_model_config="Sparse",
+        deterministic=True,
+        train_psps=[small_pb, small_nonren],
+        test_psps=[small_pb, small_nonren],
+        seed=0,
+    )
+
+
+def collect(tmp_path, problem_description, n_groups, packed_actions, transport):
+    env_specification = make_env_specification(problem_description)
+    ppo = PPO(
+        make_training_specification(
+            str(tmp_path) + "/", n_workers=4, n_steps_episode=12
+        ),
+        GEnv,
+        discard_incomplete_trials=False,
+    )
+    ppo.global_step = 0
+    env_fns = [
+        # each group of the pipelined rollouts has envs on both problems
+        create_env(GEnv, problem_description, env_specification, [i])
+        for i in [0, 1, 1, 0]
+    ]
+    group_size = 4 // n_groups
+    envs = [
+        AsyncGraphVectorEnv(
+            env_fns[g * group_size : (g + 1) * group_size],
+            copy=True,
+            shared_memory=True,
+            transport=transport,
+        )
+        for g in range(n_groups)
+    ]
+    try:
+        rollout = ppo.collect_rollouts(
+            FirstActionAgent(packed_actions),
+            envs if n_groups > 1 else envs[0],
+            env_specification,
+            torch.device("cpu"),
+        )
+    finally:
+        for group in envs:
+            group.close()
+    return ppo, rollout
+
+
+@pytest.mark.parametrize(
+    "packed_actions,transport", [(False, "tensor"), (True, "tensor"), (False, "disk")]
+)
+def test_pipelined_rollouts(
+    tmp_path, problem_description_two, packed_actions, transport
+):
+    torch.manual_seed(0)
+    sequential, rollout = collect(
+        tmp_path, problem_description_two, 1, packed_actions, transport
+    )
+    torch.manual_seed(0)
+    pipelined, pipelined_rollout = collect(
+        tmp_path, problem_description_two, 2, packed_actions, transport
+    )
+    obs, logprobs, actions, advantages, returns, values, masks, _ = rollout
+    (
+        p_obs,
+        p_logprobs,
+        p_actions,
+        p_advantages,
+        p_returns,
+        p_values,
+        p_masks,
+        _,
+    ) = pipelined_rollout
+
+    # samples are step major: sample t * num_envs + i is step t of env i
+    assert len(obs) == len(p_obs) == 12 * 4
+    for o, p_o in zip(obs, p_obs):
+        assert o.num_nodes("n") == p_o.num_nodes("n")
+        for key in ["selectable", "affected", "tct"]:
+            assert torch.equal(o.ndata[key]["n"], p_o.ndata[key]["n"])
+    assert torch.equal(actions, p_actions)
+    assert torch.equal(values, p_values)
+    # returns are built from the rewards and dones of every step
+    assert torch.equal(returns, p_returns)
+    assert torch.equal(advantages, p_advantages)
+    if packed_actions:
+        assert torch.equal(masks.values, p_masks.values)
+        assert torch.equal(masks.lengths, p_masks.lengths)
+    else:
+        assert torch.equal(masks, p_masks)
+    # episodes of the small problem end during the rollout
+    assert len(sequential.ep_info_buffer) == len(pipelined.ep_info_buffer) > 0
+
+    for ppo in [sequential, pipelined]:
+        assert set(ppo.rollout_utilization) == {"agent", "env"}
+        assert 0 < ppo.rollout_utilization["agent"] <= 1
+        assert 0 < ppo.rollout_utilization["env"] <= 1
@@ -0,0 +1,112 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+import os
+import pickle
+import sys
+
+sys.path.append("..")
+
+import cloudpickle
+import pytest
+
+from alg.ppo import create_env, worker_descriptions
+from generic.problem_store import ProblemStore
+from psp.description import Description
+from psp.env.genv import GEnv
+from psp.utils.loaders import PSPLoader
+from test_genv import make_env_specification
+
+
+def test_problem_store(tmp_path):
+    problems = [{"n_jobs": 2, "durations": [[1], [2, 3]]}, None, list(range(1000))]
+    store = ProblemStore(problems, str(tmp_path))
+    assert len(store) == 3
+    assert list(store) == problems
+    assert store[-1] == problems[2]
+    with pytest.raises(IndexError):
+        store[3]
+
+    # copies only hold the file name and offsets, and map the same file
+    copied = pickle.loads(pickle.dumps(store))
+    assert len(pickle.dumps(store)) < len(pickle.dumps(problems[2]))
+    assert copied[0] == problems[0]
+    # problems are unpickled on access, modifying them does not change the store
+    copied[0]["n_jobs"] = 3
+    assert copied[0] == problems[0]
+
+    # the file is removed by the store that created it, copies can still read it
+    copied.close()
+    assert os.path.exists(store.path)
+    store.close()
+    assert not os.path.exists(store.path)
+    assert copied[2] == problems[2]
+    assert len(ProblemStore([], str(tmp_path))) == 0
+
+
+def pickled_factories(problems):
+    # env factory pickled with the problems, and with the problems in stores
+    problem_description = Description(
+        transition_model_config="simple",
+        reward_model_config="Sparse",
+        deterministic=True,
+        train_psps=problems,
+        test_psps=problems[:10],
+        seed=0,
+    )
+    env_specification = make_env_specification(problem_description)
+    full = cloudpickle.dumps(
+        create_env(GEnv, problem_description, env_specification, [0])
+    )
+    env_problem_description, env_specification = worker_descriptions(
+        problem_description, env_specification
+    )
+    # the env specification refers to the stores too, not to the problems
+    assert env_specification.problems is env_problem_description
+    stored = cloudpickle.dumps(
+        create_env(GEnv, env_problem_description, env_specification, [0])
+    )
+    return full, stored, env_problem_description
+
+
+def test_worker_descriptions():
+    directory = os.path.join(os.path.dirname(__file__), "../instances/psp/sm/j30")
+    loader = PSPLoader()
+    problems = [
+        loader.load_single(os.path.join(directory, f"j30{i}_{j}.sm"))
+        for i in range(1, 21)
+        for j in range(1, 11)
+    ]
+    full, stored, env_problem_description = pickled_factories(problems)
+    small_full, small_stored, small_description = pickled_factories(problems[:10])
+    # only the problem offsets grow with the number of problems, the rest is mostly
+    # the observation space
+    assert len(stored) - len(small_stored) <= 8 * (len(problems) - 10) + 64
+    assert len(full) - len(small_full) > 100 * (len(stored) - len(small_stored))
+    env = cloudpickle.loads(stored)()
+    env.reset()
+    for description in [env_problem_description, small_description]:
+        description.train_psps.close()
+        description.test_psps.close()
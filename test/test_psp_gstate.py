@@ -1,3 +1,4 @@
+import os
 import sys
 
 sys.path.append(".")
@@ -5,7 +6,10 @@ sys.path.append(".")
 import pytest
 import numpy as np
 from psp.env.state import State
+from psp.env.gstate import GState
 from psp.description import Description
+from psp.utils.loaders import PSPLoader
+from test_genv import make_env_specification
 
 from psp.env.observation import EnvObservation
 from psp.models.agent_observation import AgentObservation
@@ -80,3 +84,76 @@ def test_gstate(gstate_small):
 
     print(s.observe())
     # TODO check resources
+
+
+def reference_completion_times(state, tct, tct_real, node_ids):
+    # worklist propagation from node_ids (all sources if None) to their successors
+    if node_ids is None:
+        open_nodes = [n for n in range(state.n_nodes) if len(state.cached_pred(n)) == 0]
+    else:
+        open_nodes = [int(n) for n in node_ids]
+    while open_nodes:
+        n = open_nodes.pop(0)
+        preds = state.cached_pred(n)
+        if len(preds) == 0:
+            max_preds = torch.zeros(3)
+            max_preds_real = torch.tensor(0.0)
+        else:
+            max_preds = torch.max(tct[preds], 0)[0]
+            max_preds_real = torch.max(tct_real[preds])
+        new_tct = max_preds + state.durations(n)
+        new_tct_real = max_preds_real + state.duration_real(n)
+        if (
+            node_ids is None
+            or not torch.equal(new_tct, tct[n])
+            or not torch.equal(new_tct_real, tct_real[n])
+        ):
+            tct[n] = new_tct
+            tct_real[n] = new_tct_real
+            sucs = state.cached_suc(n).tolist()
+            open_nodes = [m for m in open_nodes if m not in sucs] + sucs
+
+
+@pytest.mark.parametrize(
+    "problem_file",
+    ["../instances/psp/sm/j30/j3010_1.sm", "../instances/psp/mm/c154_3.mm"],
+)
+@pytest.mark.parametrize("deterministic", [True, False])
+def test_completion_times(problem_file, deterministic):
+    problem = PSPLoader().load_single(
+        os.path.join(os.path.dirname(__file__), problem_file)
+    )
+    problem_description = Description(
+        transition_model_config="simple",
+        reward_model_config="Sparse",
+        deterministic=deterministic,
+        train_psps=[problem],
+        test_psps=[problem],
+        seed=0,
+    )
+    state = GState(
+        make_env_specification(problem_description),
+        problem_description,
+        problem,
+        deterministic=deterministic,
+    )
+
+    # every propagation is checked against the worklist one
+    update_completion_times = state.update_completion_times
+    n_updates = []
+
+    def checked_update_completion_times(node_ids):
+        tct = state.all_tct().clone()
+        tct_real = state.all_tct_real().clone()
+        reference_completion_times(state, tct, tct_real, node_ids)
+        update_completion_times(node_ids)
+        assert torch.equal(state.all_tct(), tct)
+        assert torch.equal(state.all_tct_real(), tct_real)
+        n_updates.append(node_ids)
+
+    state.update_completion_times = checked_update_completion_times
+    state.reset_tct()
+    assert n_updates == [None]
+    while not state.done() and len(n_updates) < 30:
+        state.affect_job(torch.nonzero(state.graph.ndata["selectable"]["n"])[0].item())
+    assert len(n_updates) > 10
@@ -0,0 +1,89 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+import sys
+
+sys.path.append("..")
+
+import torch
+from torch.distributions.categorical import Categorical
+
+from generic.ragged_categorical import RaggedCategorical
+from generic.utils import PackedMasks, decode_mask
+
+
+def padded_categorical(logits, lengths, mask):
+    # reference: masked categorical over logits padded to the longest segment
+    padded_logits = torch.full((len(lengths), max(lengths)), -1e12)
+    padded_mask = torch.zeros((len(lengths), max(lengths)), dtype=torch.bool)
+    start = 0
+    for i, n in enumerate(lengths):
+        padded_logits[i, :n] = torch.where(
+            mask[start : start + n], logits[start : start + n], -1e12
+        )
+        padded_mask[i, :n] = mask[start : start + n]
+        start += n
+    return Categorical(logits=padded_logits), padded_mask
+
+
+def test_ragged_categorical():
+    torch.manual_seed(0)
+    lengths = [3, 5, 1, 4]
+    logits = torch.randn(sum(lengths))
+    mask = torch.rand(sum(lengths)) > 0.3
+    mask[[0, 3, 8, 9]] = True
+    distrib = RaggedCategorical(logits, torch.tensor(lengths), mask)
+    ref, padded_mask = padded_categorical(logits, lengths, mask)
+
+    action = ref.sample()
+    assert torch.allclose(distrib.log_prob(action), ref.log_prob(action))
+    p_log_p = torch.where(padded_mask, ref.logits * ref.probs, 0.0)
+    assert torch.allclose(distrib.entropy(), -p_log_p.sum(-1), atol=1e-6)
+    assert torch.equal(distrib.mode(), torch.argmax(ref.probs, dim=1))
+    for _ in range(20):
+        action = distrib.sample()
+        assert action.shape == (len(lengths),)
+        assert padded_mask[torch.arange(len(lengths)), action].all()
+
+
+def test_packed_masks():
+    masks = [
+        torch.tensor([True, False, True, False]),
+        torch.tensor([False, True, False, False]),
+        torch.tensor([True, True, True, False]),
+    ]
+    packed = decode_mask(masks, [3, 2, 4])
+    assert packed.lengths.tolist() == [3, 2, 4]
+    assert packed.values.tolist() == [True, False, True, False, True] + [
+        True,
+        True,
+        True,
+        False,
+    ]
+    sub = packed[[2, 0]]
+    assert sub.lengths.tolist() == [4, 3]
+    assert sub.values.tolist() == [True, True, True, False, True, False, True]
+    assert torch.equal(PackedMasks.cat([packed[:1], packed[1:]]).values, packed.values)
@@ -1,4 +1,6 @@
+import random
 import sys
+from itertools import accumulate
 
 sys.path.append(".")
 
@@ -97,3 +99,45 @@ def test_resource_flowgraph_insert_norm():
     assert date == 6
     date2 = rg.availability(0.2)
     assert date2 == 0
+
+
+def test_resource_flowgraph_runs():
+    rg = ResourceFlowGraph(1, unit_val=1 / 300, renewable=True)
+    assert rg.run_counts == [300]
+    rg.consume(1, 0.5, 0, 3)
+    rg.consume(2, 0.5, 0, 4)
+    assert rg.frontier_nodes() == {1, 2}
+    assert list(zip(rg.run_dates, rg.run_nodes, rg.run_counts)) == [
+        (3, 1, 150),
+        (4, 2, 150),
+    ]
+    assert len(rg.frontier) == 300
+    assert rg.find_max_pos(3) == 149
+    assert rg.availability(0.6) == 4
+    # takes the 150 units of 2 and 30 of 1, backwards from start
+    rg.consume(3, 0.6, 4, 10)
+    assert rg.new_edges_cache == [(0, 1), (0, 2), (2, 3), (1, 3)]
+    assert rg.new_edges_att_cache[2:] == [sum([1 / 300] * 150), sum([1 / 300] * 30)]
+    assert list(zip(rg.run_dates, rg.run_nodes, rg.run_counts)) == [
+        (3, 1, 120),
+        (10, 3, 180),
+    ]
+
+
+def test_resource_flowgraph_run_ends():
+    rng = random.Random(0)
+    rg = ResourceFlowGraph(1, unit_val=0.1, renewable=True)
+    for consumer in range(1, 200):
+        level = rng.randint(1, 10) / 10
+        start = rg.availability(level) + rng.randint(0, 3)
+        rg.consume(consumer, level, start, start + rng.randint(1, 5))
+        n_run_ends = rg.n_run_ends
+        assert rg.run_ends[:n_run_ends] == list(accumulate(rg.run_counts))[:n_run_ends]
+        frontier = rg.frontier
+        dates = [unit[0] for unit in frontier]
+        for date in range(dates[0], dates[-1] + 2):
+            # last unit released at or before date
+            assert rg.find_max_pos(date) == sum(d <= date for d in dates) - 1
+        for n_units in range(1, 11):
+            # date at which the n first released units are available
+            assert rg.availability(n_units / 10) == dates[n_units - 1]
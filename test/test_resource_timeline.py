@@ -2,12 +2,17 @@ import sys
 
 sys.path.append(".")
 
+import numpy as np
 import pytest
+from psp.env.env import Env
 from psp.utils.resource_timeline import ResourceTimeline
+from psp.utils.resource_timeline_tree import ResourceTimelineTree
+from test_genv import make_env_specification
 
 
-def test_resource_timeline():
-    rt = ResourceTimeline(4, True)
+@pytest.mark.parametrize("timeline", [ResourceTimeline, ResourceTimelineTree])
+def test_resource_timeline(timeline):
+    rt = timeline(4, True)
     a0 = rt.availability(2)
     assert a0 == (0, None, None)
     rt.consume(1, 2, 0, 3)
@@ -28,8 +33,9 @@ def test_resource_timeline():
     assert a5 == (15, 6, False)
 
 
-def test_resource_timeline_after_only():
-    rt = ResourceTimeline(4, renewable=True, allow_before_last=False)
+@pytest.mark.parametrize("timeline", [ResourceTimeline, ResourceTimelineTree])
+def test_resource_timeline_after_only(timeline):
+    rt = timeline(4, renewable=True, allow_before_last=False)
     a1 = rt.availability(2)
     assert a1 == (0, None, None)
     rt.consume(1, 2, 0, 3)
@@ -41,3 +47,63 @@ def test_resource_timeline_after_only():
     rt.consume(3, 2, 4, 10)
     a4 = rt.availability(2)
     assert a4 == (4, 3, True)
+
+
+def test_resource_timeline_tree_precedences():
+    rt = ResourceTimelineTree(1.0, unit_val=0.25)
+    rt.consume(1, 0.5, 0, 3)
+    rt.consume(2, 0.5, 0, 4)
+    assert rt.new_edges_cache == []
+    assert rt.frontier_nodes() == {1, 2}
+    # only 0.5 is free at 3: 0.75 waits for node 2 to end at 4, 0.6 is available at
+    # 3 up to the tolerance of unit_val
+    assert rt.availability(0.75) == (4, 2, False)
+    assert rt.availability(0.6) == (3, 1, False)
+    rt.consume(3, 0.5, 3, 5)
+    assert rt.new_edges_cache == [(1, 3)]
+    assert rt.new_edges_att_cache == [0.5]
+    assert rt.frontier_nodes() == {2, 3}
+    assert rt.global_availability() == [[0, 0.0], [3, 0.0], [4, 0.5]]
+    rt.reset_new_cache()
+    assert rt.new_edges_cache == []
+
+
+def run_episode(problem_description, **kwargs):
+    env = Env(
+        problem_description, make_env_specification(problem_description, **kwargs), [0]
+    )
+    obs, info = env.reset()
+    done = False
+    while not done:
+        # last possible action, so that resources are shared between activities
+        obs, reward, done, _, info = env.step(np.nonzero(info["mask"])[0][-1])
+    return reward, obs
+
+
+@pytest.mark.parametrize("add_rp_edges", ["none", "all", "frontier"])
+def test_state_resource_timeline_tree(problem_description_small, add_rp_edges):
+    reward, obs = run_episode(
+        problem_description_small, resource_model="flowGraph", add_rp_edges=add_rp_edges
+    )
+    tree_reward, tree_obs = run_episode(
+        problem_description_small,
+        resource_model="timelineTree",
+        add_rp_edges=add_rp_edges,
+    )
+    assert tree_reward == reward
+    if add_rp_edges == "none":
+        assert "rp_att" not in tree_obs
+        return
+    n_rp_edges = tree_obs["n_rp_edges"]
+    assert n_rp_edges > 0
+    # resource, level, critical, time type, as for flowGraph
+    rp_att = tree_obs["rp_att"][:n_rp_edges]
+    assert set(rp_att[:, 0]) <= {0, 1}
+    assert np.all(rp_att[:, 1] > 0)
+    assert set(rp_att[:, 2]) <= {0, 1}
+    assert set(rp_att[:, 3]) <= {0, 1, 2}
+
+
+def test_state_resource_timeline(problem_description_small):
+    with pytest.raises(Exception, match="timeline not supported"):
+        run_episode(problem_description_small, resource_model="timeline")
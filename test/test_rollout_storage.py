@@ -0,0 +1,112 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+import sys
+
+sys.path.append("..")
+
+import dgl
+import pytest
+import torch
+
+from alg.rollout_storage import RolloutStorage
+
+
+def random_graph(n_nodes, n_edges):
+    g = dgl.heterograph(
+        {
+            ("n", "prec", "n"): (
+                torch.randint(n_nodes, (n_edges,)),
+                torch.randint(n_nodes, (n_edges,)),
+            ),
+            ("n", "rc", "n"): (torch.tensor([], dtype=torch.int64),) * 2,
+        },
+        num_nodes_dict={"n": n_nodes},
+    )
+    g.ndata["feat"] = torch.rand((n_nodes, 3))
+    g.ndata["selectable"] = torch.rand(n_nodes) > 0.5
+    g.edges["prec"].data["r"] = torch.rand((n_edges, 2))
+    return g
+
+
+def equal_graphs(g1, g2):
+    for etype in g1.canonical_etypes:
+        for t1, t2 in zip(g1.edges(etype=etype), g2.edges(etype=etype)):
+            if not torch.equal(t1, t2):
+                return False
+        for k, v in g1.edges[etype].data.items():
+            if not torch.equal(v, g2.edges[etype].data[k]):
+                return False
+    for k, v in g1.ndata.items():
+        if not torch.equal(v, g2.ndata[k]):
+            return False
+    return g1.num_nodes() == g2.num_nodes()
+
+
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_rollout_storage_graphs(on_disk, tmp_path):
+    storage = RolloutStorage(str(tmp_path) if on_disk else None)
+    for rollout in range(2):
+        storage.reset()
+        graphs = [random_graph(5 + i % 7, 2 * i) for i in range(300)]
+        for step in range(0, len(graphs), 3):
+            storage.append(graphs[step : step + 3])
+        assert len(storage) == len(graphs)
+        indices = [299, 0, 150, 7]
+        for i, g in zip(indices, storage.get(indices)):
+            assert equal_graphs(graphs[i], g)
+        kept = storage.subset([1, 2, 298])
+        assert equal_graphs(graphs[298], kept.get([2])[0])
+    storage.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_rollout_storage_same_directory(tmp_path):
+    storages = [RolloutStorage(str(tmp_path)) for _ in range(2)]
+    graphs = [[random_graph(5 + i, 2 * i + s) for i in range(10)] for s in range(2)]
+    for storage, storage_graphs in zip(storages, graphs):
+        storage.append(storage_graphs)
+    assert len(list(tmp_path.iterdir())) == 2 * len(storages[0].columns)
+    for storage, storage_graphs in zip(storages, graphs):
+        for g, stored in zip(storage_graphs, storage.get(range(10))):
+            assert equal_graphs(g, stored)
+    storages[0].close()
+    assert equal_graphs(graphs[1][9], storages[1].get([9])[0])
+    storages[1].close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_rollout_storage_dicts():
+    storage = RolloutStorage()
+    steps = [
+        {"features": torch.rand((2, 4 + i, 3)), "n_nodes": torch.tensor([4 + i] * 2)}
+        for i in range(3)
+    ]
+    for obs in steps:
+        storage.append(obs)
+    sample = storage.get([3])[0]
+    assert torch.equal(sample["features"], steps[1]["features"][1])
+    assert torch.equal(sample["n_nodes"], steps[1]["n_nodes"][1])
@@ -0,0 +1,69 @@
+#
+# Wheatley
+# Copyright (c) 2023 Jolibrain
+# Authors:
+#    Guillaume Infantes <guillaume.infantes@jolibrain.com>
+#    Antoine Jacquet <antoine.jacquet@jolibrain.com>
+#    Michel Thomazo <thomazo.michel@gmail.com>
+#    Emmanuel Benazera <emmanuel.benazera@jolibrain.com>
+#
+#
+# This file is part of Wheatley.
+#
+# Wheatley is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Wheatley is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Wheatley. If not, see <https://www.gnu.org/licenses/>.
+#
+
+import sys
+
+sys.path.append("..")
+
+import dgl
+import torch
+
+from psp.models.rwpe_cache import RWPECache
+
+
+def chain(n, reverse_ids=False):
+    src = torch.arange(n - 1)
+    dst = src + 1
+    if reverse_ids:
+        src, dst = src.flip(0), dst.flip(0)
+    return dgl.graph((src, dst), num_nodes=n)
+
+
+def test_rwpe_cache_lru():
+    cache = RWPECache(max_size=2)
+    pe = cache.random_walk_pe(chain(3), 4)
+    assert torch.equal(pe, dgl.random_walk_pe(chain(3), 4))
+    # same edges with other edge ids
+    assert cache.random_walk_pe(chain(3, reverse_ids=True), 4) is pe
+    cache.random_walk_pe(chain(4), 4)
+    cache.random_walk_pe(chain(3), 4)
+    cache.random_walk_pe(chain(5), 4)
+    # chain(4) was the least recently used
+    cache.random_walk_pe(chain(3), 4)
+    cache.random_walk_pe(chain(4), 4)
+    stats = cache.stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 4
+    assert stats["evictions"] == 2
+    assert stats["size"] == 2
+
+
+def test_rwpe_cache_shared():
+    cache = RWPECache(max_size=2, shared=True)
+    pe = cache.random_walk_pe(chain(3), 4)
+    assert torch.equal(cache.random_walk_pe(chain(3), 4), pe)
+    assert cache.stats()["hits"] == 1
+    cache.close()
@@ -1,8 +1,12 @@
 import os
+from types import SimpleNamespace
 
+import matplotlib.pyplot as plt
 import torch
 
 from alg.ppo import PPO
+from generic.training_specification import TrainingSpecification
+from test_genv import make_env_specification
 from psp.env.env import Env
 from generic.agent_validator import AgentValidator
 
@@ -29,3 +33,102 @@ def test_validator_psp(
 
     os.makedirs(validator.path, exist_ok=True)
     validator.validate(psp_agent, alg)
+
+
+def make_training_specification(path, **kwargs):
+    # the training_specification fixture does not exist
+    args = dict(
+        total_timesteps=1000,
+        n_validation_env=1,
+        fixed_validation=False,
+        fixed_random_validation=0,
+        validation_batch_size=0,
+        validation_freq=1,
+        display_env="test",
+        path=path,
+        custom_heuristic_names=[],
+        ortools_strategy=["realistic"],
+        max_time_ortools=1,
+        scaling_constant_ortools=1000,
+        vecenv_type="graphgym",
+        validate_on_total_data=False,
+        optimizer="adam",
+        n_workers=1,
+        gamma=1.0,
+        n_epochs=1,
+        normalize_advantage=True,
+        ent_coef=0.0,
+        vf_coef=1.0,
+        n_steps_episode=10,
+        batch_size=10,
+        iter_size=1,
+        clip_range=0.2,
+        target_kl=None,
+        freeze_graph=False,
+        lr=0.001,
+        fe_lr=None,
+        rpo=False,
+        rpo_smoothing_param=1.0,
+        gae_lambda=1.0,
+        return_based_scaling=False,
+        store_rollouts_on_disk=None,
+        critic_loss="l2",
+        debug_net=False,
+        display_gantt=False,
+    )
+    args.update(kwargs)
+    return TrainingSpecification(**args)
+
+
+class LinearAgent(torch.nn.Module):
+    # only what saving the best model uses
+    def __init__(self):
+        super().__init__()
+        self.linear = torch.nn.Linear(2, 1)
+
+    def checkpoint(self):
+        return {k: v.detach().clone() for k, v in self.state_dict().items()}
+
+
+def test_pending_ortools_best_model(tmp_path, problem_description_small):
+    path = str(tmp_path) + "/"
+    validator = AgentValidator(
+        problem_description_small,
+        make_env_specification(problem_description_small),
+        torch.device("cpu"),
+        make_training_specification(path),
+        True,
+        graphobs=True,
+    )
+    agent = LinearAgent()
+    alg = SimpleNamespace(optimizer=torch.optim.SGD(agent.parameters(), lr=0.1))
+    validator.current_scatter_fig = plt.figure()
+    weights = agent.checkpoint()
+
+    # a validation whose OR-Tools solution is still being computed
+    validator.makespans.append(12.0)
+    validator.ortools_makespans["realistic"].append(float("nan"))
+    validator.pending_ortools_makespans.append((0, "realistic", ["pending"]))
+    validator._save_if_best_model(agent, alg)
+    assert not os.path.exists(path + "agent.pkl")
+    with torch.no_grad():
+        agent.linear.weight.add_(1.0)
+
+    validator._backfill_ortools_makespans()
+    assert len(validator.pending_best_models) == 1
+    # the model of the validation is saved once the solution is available
+    validator.ortools_store.submit("pending", tuple, [10.0, None, True])
+    validator._backfill_ortools_makespans()
+    assert validator.ortools_makespans["realistic"] == [10.0]
+    assert validator.pending_best_models == []
+    assert validator.makespan_ratio == 1.2
+    saved = torch.load(path + "agent.pkl")
+    assert all(torch.equal(saved[k], weights[k]) for k in weights)
+    assert os.path.exists(path + "best-ortools-ppo-cactus.png")
+
+    # then compared to the next validations
+    validator.makespans.append(13.0)
+    validator.ortools_makespans["realistic"].append(10.0)
+    validator._save_if_best_model(agent, alg)
+    assert validator.makespan_ratio == 1.2
+    validator.close()
@@ -3,8 +3,10 @@ from collections import defaultdict
 from itertools import product
 from pathlib import Path
 
+import networkx as nx
 import numpy as np
 import pytest
+import torch
 
 from args import argument_parser, parse_args
 from generic.agent_specification import AgentSpecification
@@ -12,6 +14,7 @@ from generic.utils import get_path
 from jssp.description import Description
 from jssp.env.env import Env
 from jssp.env.env_specification import EnvSpecification
+from jssp.env.precedence_graph import ArrayPrecedenceGraph
 from jssp.env.state import State
 from jssp.eval import list_instances
 from jssp.models.agent import Agent
@@ -19,6 +22,11 @@ from jssp.models.custom_agent import CustomAgent
 from jssp.solve import solve_instance
 from jssp.train import main
 from jssp.utils.loaders import load_problem
+from jssp.utils.utils import (
+    compact_conflicts_cliques,
+    compute_conflicts_cliques,
+    expand_conflicts_cliques,
+)
 
 # This is the list of all experiments we want to try.
 # Each entry should be read as "argument_name: [value_experiment_1, value_experiment_2, ...]"
@@ -448,3 +456,210 @@ def test_solve_api(instance_file: str, taillard_offset: bool):
     agent = Agent(env_specification, agent_specification=agent_specification)
     solution = solve_instance(agent, affectations, durations, deterministic=True)
     assert solution is not None
+
+
+@pytest.mark.parametrize(
+    "deterministic,observe_real_duration_when_affect",
+    [(True, False), (False, False), (False, True)],
+)
+def test_graph_backends(deterministic: bool, observe_real_duration_when_affect: bool):
+    """The array precedence graph must give the exact same observations as networkx."""
+
+    def make_env(graph_backend: str):
+        env_specification = EnvSpecification(
+            max_n_jobs=8,
+            max_n_machines=6,
+            normalize_input=True,
+            input_list=[
+                "duration",
+                "total_job_time",
+                "total_machine_time",
+                "job_completion_percentage",
+                "machine_completion_percentage",
+                "mopnr",
+                "mwkr",
+            ],
+            insertion_mode="no_forced_insertion",
+            max_edges_factor=4,
+            sample_n_jobs=-1,
+            chunk_n_jobs=-1,
+            observe_conflicts_as_cliques=True,
+            observe_real_duration_when_affect=observe_real_duration_when_affect,
+            do_not_observe_updated_bounds=False,
+            graph_backend=graph_backend,
+        )
+        problem_description = Description(
+            deterministic=deterministic,
+            fixed=True,
+            transition_model_config="simple",
+            reward_model_config="Sparse",
+            duration_mode_bounds=(10, 50),
+            duration_delta=(10, 200),
+            n_jobs=8,
+            n_machines=6,
+            max_duration=99,
+            seed=0,
+        )
+        return Env(problem_description, env_specification)
+
+    env_nx = make_env("networkx")
+    env_array = make_env("array")
+    rng = np.random.default_rng(0)
+    done = False
+    while not done:
+        mask = env_nx.action_masks()
+        assert np.array_equal(mask, env_array.action_masks())
+        action = rng.choice(np.flatnonzero(mask))
+        obs_nx, reward_nx, done, _, _ = env_nx.step(action)
+        obs_array, reward_array, _, _, _ = env_array.step(action)
+        assert reward_nx == reward_array
+        assert np.array_equal(obs_nx["features"], obs_array["features"])
+        assert np.array_equal(obs_nx["edge_index"], obs_array["edge_index"])
+    assert np.array_equal(
+        env_nx.get_solution().schedule, env_array.get_solution().schedule
+    )
+    # whole graph propagations
+    env_nx.state.update_completion_times_in_order()
+    env_array.state.update_completion_times_in_order()
+    assert torch.equal(env_nx.state.features, env_array.state.features)
+    env_nx.state.update_completion_times_from_sinks()
+    env_array.state.update_completion_times_from_sinks()
+    assert torch.equal(env_nx.state.features, env_array.state.features)
+
+
+def test_array_precedence_graph():
+    """Random edge insertions/removals give the same adjacency as networkx."""
+    rng = np.random.default_rng(0)
+    n_jobs, n_machines = 6, 5
+    n_nodes = n_jobs * n_machines
+    edges = [
+        (j * n_machines + i, j * n_machines + i + 1)
+        for i in range(n_machines - 1)
+        for j in range(n_jobs)
+    ]
+    graph_nx = nx.DiGraph(edges)
+    graph_array = ArrayPrecedenceGraph(n_nodes, edges, edge_capacity=4)
+    added_edges = []
+    for _ in range(200):
+        first, second = rng.integers(n_nodes, size=2)
+        if graph_nx.has_edge(first, second) and rng.random() < 0.5:
+            graph_nx.remove_edge(first, second)
+            graph_array.remove_edge(first, second)
+            if (first, second) in added_edges:
+                added_edges.remove((first, second))
+        elif first != second and first not in nx.descendants(graph_nx, second):
+            assert not graph_array.has_path(second, first)
+            graph_nx.add_edge(first, second)
+            graph_array.add_edge(first, second)
+            added_edges.append((first, second))
+        else:
+            assert graph_array.has_path(second, first)
+        for n in range(n_nodes):
+            assert sorted(graph_nx.successors(n)) == sorted(graph_array.successors(n))
+            assert sorted(graph_nx.predecessors(n)) == sorted(
+                graph_array.predecessors(n)
+            )
+        assert nx.descendants(graph_nx, first) == graph_array.descendants(first)
+        assert graph_array.logged_edges().tolist() == [list(e) for e in added_edges]
+    assert graph_nx.number_of_edges() == graph_array.number_of_edges()
+    for root in [None, 0, n_nodes // 2]:
+        order = np.concatenate(list(graph_array.topological_levels(root))).tolist()
+        if root is None:
+            assert sorted(order) == list(range(n_nodes))
+        else:
+            assert set(order) == nx.descendants(graph_nx, root) | {root}
+        assert len(order) == len(set(order))
+        rank = {n: i for i, n in enumerate(order)}
+        for first, second in graph_nx.edges:
+            if first in rank and second in rank:
+                assert rank[first] < rank[second]
+
+
+@pytest.mark.parametrize("observe_conflicts_as_cliques", [False, True])
+def test_pre_features(observe_conflicts_as_cliques: bool):
+    """Machine ids and per machine totals against a task by task computation."""
+    rng = np.random.default_rng(0)
+    n_jobs, n_machines = 7, 5
+    affectations = np.stack([rng.permutation(n_machines) for _ in range(n_jobs)])
+    affectations[rng.random(affectations.shape) < 0.2] = -1
+    durations = rng.integers(1, 99, size=(n_jobs, n_machines, 4)).astype(float)
+    durations[affectations == -1] = -1
+    env_specification = EnvSpecification(
+        max_n_jobs=n_jobs,
+        max_n_machines=n_machines,
+        normalize_input=True,
+        input_list=["duration", "total_machine_time", "machine_completion_percentage"],
+        insertion_mode="no_forced_insertion",
+        max_edges_factor=4,
+        sample_n_jobs=-1,
+        chunk_n_jobs=-1,
+        observe_conflicts_as_cliques=observe_conflicts_as_cliques,
+        observe_real_duration_when_affect=False,
+        do_not_observe_updated_bounds=False,
+    )
+    state = State(
+        affectations,
+        durations,
+        n_jobs,
+        n_machines,
+        env_specification.n_features,
+        deterministic=False,
+        feature_list=env_specification.input_list,
+        observe_conflicts_as_cliques=observe_conflicts_as_cliques,
+    )
+    # all real durations are hidden at reset
+    for machine_id in range(n_machines):
+        on_machine = affectations == machine_id
+        expected = durations[on_machine].sum(axis=0)
+        if on_machine.any():
+            expected[0] = -1
+        assert np.allclose(state.total_machine_time[machine_id].numpy(), expected)
+
+    tmtof = state.features_offset["total_machine_time"]
+    mcpof = state.features_offset["machine_completion_percentage"]
+    for node_id in range(n_jobs * n_machines):
+        machine_id = affectations.flat[node_id]
+        machine_features = state.features[node_id, 6 : 6 + n_machines]
+        if observe_conflicts_as_cliques:
+            assert machine_features.sum() == int(machine_id != -1)
+            if machine_id != -1:
+                assert machine_features[machine_id] == 1
+        else:
+            assert torch.all(machine_features == machine_id)
+        assert torch.equal(
+            state.features[node_id, tmtof[0] : tmtof[1]],
+            state.total_machine_time[machine_id],
+        )
+        assert state.features[node_id, mcpof[0]] == -1
+        assert torch.all(state.features[node_id, mcpof[0] + 1 : mcpof[1]] == 0)
+    selectable = np.zeros_like(affectations)
+    selectable[:, 0] = affectations[:, 0] != -1
+    assert np.array_equal(state.features[:, 5].numpy(), selectable.flatten())
+
+
+def test_conflicts_cliques():
+    """Edges expanded from compact cliques match the pairwise computation."""
+    rng = np.random.default_rng(0)
+    for n_nodes, n_machines in [(1, 1), (12, 3), (35, 5), (60, 10)]:
+        machineid = torch.tensor(rng.integers(-1, n_machines, size=n_nodes))
+        edges, edges_machineid = compute_conflicts_cliques(machineid)
+        cliques = compact_conflicts_cliques(machineid)
+        assert cliques.shape == (2, (machineid != -1).sum())
+        expanded, expanded_machineid = expand_conflicts_cliques(cliques)
+        assert torch.equal(expanded, edges)
+        assert torch.equal(expanded_machineid, edges_machineid)
+
+
+def test_load_problem_cache(tmp_path):
+    for _ in range(2):
+        # parsed then read from the cache
+        n_j, n_m, affectations, durations = load_problem(
+            "./instances/taillard/ta01.txt", True, cache_dir=str(tmp_path)
+        )
+        assert len(list(tmp_path.glob("instance_*.bin"))) == 1
+        ref = load_problem("./instances/taillard/ta01.txt", True)
+        assert (n_j, n_m) == ref[:2]
+        assert np.array_equal(affectations, ref[2])
+        assert np.array_equal(durations, ref[3])
+        # arrays can be modified without changing the cache
+        durations[0] = 0
@@ -14,6 +14,7 @@ from args import argument_parser, parse_args
 from generic.utils import get_path
 from generic.agent_specification import AgentSpecification
 from generic.agent_validator import AgentValidator
+from generic.ortools_store import OrToolsStore
 from generic.training_specification import TrainingSpecification
 from psp.description import Description
 from psp.env.env import Env
@@ -398,24 +399,18 @@ def test_save_ortools(args: list, problem_1: str, problem_2: str):
     """
     args_1 = args + ["--load_problem", problem_1]
     _, _, agent_validator, _, _, _ = instantiate_training_objects(args_1)
-    file_path = agent_validator._ortools_solution_path(0, "realistic")
+    key = agent_validator._ortools_key(0, "realistic")
 
     makespan, schedule, optimal = agent_validator._get_ortools_makespan(0, "realistic")
 
-    assert (
-        agent_validator._ortools_read_solution(
-            file_path, agent_validator.validation_envs[0].problem
-        )
-        is not None
-    ), "Solution should be found"
+    store = OrToolsStore(agent_validator.ortools_store.directory)
+    assert store.get(key) is not None, "Solution should be found"
 
     (
         saved_makespan,
         saved_schedule,
         saved_optimal,
-    ) = agent_validator._ortools_read_solution(
-        file_path, agent_validator.validation_envs[0].problem
-    )
+    ) = store.get(key)
 
     assert makespan == saved_makespan, "Not the same makespan."
     assert optimal == saved_optimal, "Not the same optimal."
@@ -424,12 +419,7 @@ def test_save_ortools(args: list, problem_1: str, problem_2: str):
 
     args_2 = args + ["--load_problem", problem_2]
     _, _, agent_validator, _, _, _ = instantiate_training_objects(args_2)
-    file_path = agent_validator._ortools_solution_path(0, "realistic")
+    key_2 = agent_validator._ortools_key(0, "realistic")
 
-    assert os.path.exists(file_path), "Saving file should exists."
-    assert (
-        agent_validator._ortools_read_solution(
-            file_path, agent_validator.validation_envs[0].problem
-        )
-        is None
-    ), "Solution should not be found"
+    assert key_2 != key, "Different problems should have different keys."
+    assert store.get(key_2) is None, "Solution should not be found"